@@ -1,9 +1,21 @@
-from fastapi import APIRouter, HTTPException, Depends
-from pydantic import BaseModel
-from typing import List, Dict, Any, Optional
+from fastapi import APIRouter, HTTPException, Depends, Request
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+from pydantic import BaseModel, Field
+from typing import List, Dict, Any, Optional, Tuple
+import json
 import os
 
-from core.chat_chain import get_chat_chain
+from core import llm_client
+from core.chat_chain import achat, aget_cached, astream_chat, cached_events, serialize_source
+from core.concurrency import chat_slot, run_blocking
+from core.context import history_compressor
+from core.llm_router import Lease, LLMOverloadedError, llm_router
+from core.query_rewrite import query_rewriter
+from core.rerank import MAX_RERANK_CANDIDATES, reranker
+from core.response_cache import response_cache
+from core.sessions import session_store
+from core.tenants import domain_exists, normalize_domain
 
 router = APIRouter()
 
@@ -11,44 +23,250 @@ class ChatMessage(BaseModel):
     role: str  # "user" or "assistant"
     content: str
 
+class RerankOptions(BaseModel):
+    # Unset fields use the RERANK_* settings
+    enabled: Optional[bool] = None
+    candidates: Optional[int] = Field(None, ge=1, le=MAX_RERANK_CANDIDATES)
+    min_score: Optional[float] = Field(None, ge=0, le=1)
+
 class ChatRequest(BaseModel):
-    messages: List[ChatMessage]
+    # Either the whole conversation, or just the new message with an optional session ID
+    messages: Optional[List[ChatMessage]] = None
+    message: Optional[str] = None
+    session_id: Optional[str] = None
     domain: Optional[str] = None
+    rerank: Optional[RerankOptions] = None
 
 class ChatResponse(BaseModel):
     response: str
     sources: Optional[List[Dict[str, Any]]] = None
+    session_id: Optional[str] = None
+
+class ChatSession(BaseModel):
+    session_id: str
+    turns: List[Tuple[str, str]]
+    summary: str
+
+def _parse_messages(messages: List[ChatMessage]) -> Tuple[str, List[Tuple[str, str]]]:
+    """
+    Split a message list into the user's message and (question, answer) history pairs.
+    """
+    # Get the user's message (last message in the list)
+    if not messages or messages[-1].role != "user":
+        raise HTTPException(status_code=400, detail="Last message must be from user")
+    
+    user_message = messages[-1].content
+    
+    # Pair each assistant message with the user message before it
+    chat_history = []
+    question = None
+    for message in messages[:-1]:
+        if message.role == "user":
+            question = message.content
+        elif message.role == "assistant" and question is not None:
+            chat_history.append((question, message.content))
+            question = None
+    
+    return user_message, chat_history
+
+async def _resolve_request(request: ChatRequest) -> Tuple[str, List[Tuple[str, str]], Optional[str], Optional[str]]:
+    """
+    Get the user's message, chat history, history summary and session ID for a request.
+    Requests with a message use (or start) a server-side session; requests with
+    only a message list are answered from that list and not stored, and have no summary.
+    """
+    if request.message is None:
+        if request.session_id is not None:
+            raise HTTPException(status_code=400, detail="Send the new message as 'message' when using a session")
+        user_message, chat_history = _parse_messages(request.messages)
+        return user_message, chat_history, None, None
+    
+    session_id = request.session_id
+    if session_id is None:
+        session_id = await run_blocking(session_store.create)
+    try:
+        chat_history, summary = await run_blocking(session_store.history, session_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Session {session_id} not found or expired")
+    return request.message, chat_history, summary, session_id
+
+def _acquire_llm() -> Lease:
+    """
+    Route a request to an LLM backend, refusing it with 503 and Retry-After when all are busy.
+    """
+    try:
+        return llm_router.acquire()
+    except LLMOverloadedError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
+def _resolve_domain(request: ChatRequest) -> Optional[str]:
+    """
+    Get the domain a request searches, refusing invalid and unknown ones.
+    """
+    try:
+        domain = normalize_domain(request.domain)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not domain_exists(domain):
+        raise HTTPException(status_code=404, detail=f"Domain {domain} has no documents")
+    return domain
+
+def _rerank_options(request: ChatRequest) -> Optional[Dict[str, Any]]:
+    """
+    Get the rerank options a request overrides.
+    """
+    return request.rerank.model_dump(exclude_none=True) if request.rerank else None
+
+async def _append_turn(session_id: Optional[str], question: str, answer: str, llm) -> Optional[str]:
+    """
+    Add an answered turn to a request's session, if it has one.
+    Returns the session ID, or None if the session was deleted or evicted while
+    the answer was generated; the answer is still sent and the client starts a new session.
+    """
+    if session_id is None:
+        return None
+    try:
+        await session_store.aappend(session_id, question, answer, llm)
+    except KeyError:
+        return None
+    return session_id
+
+def _sse(event: str, data: Any) -> str:
+    """
+    Format a Server-Sent Event.
+    """
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
 
 @router.post("/chat", response_model=ChatResponse)
 async def chat_endpoint(request: ChatRequest):
     """
     Process a chat request and return a response using LangChain.
+    Send "message" (and "session_id" after the first turn) to keep the
+    conversation on the server, or the full "messages" list. "domain"
+    limits the search to that domain's documents, and "rerank" overrides
+    the rerank settings for this request.
     """
     try:
-        # Get the user's message (last message in the list)
-        if not request.messages or request.messages[-1].role != "user":
-            raise HTTPException(status_code=400, detail="Last message must be from user")
+        domain = _resolve_domain(request)
+        user_message, chat_history, summary, session_id = await _resolve_request(request)
         
-        user_message = request.messages[-1].content
+        # Cached answers need no LLM backend, so they never count towards its load
+        result = await aget_cached(user_message, chat_history, summary, _rerank_options(request), domain)
+        if result is not None:
+            llm = llm_client.get_llm()
+        else:
+            # Get response without blocking the event loop
+            with _acquire_llm() as llm:
+                async with chat_slot():
+                    result = await achat(
+                        user_message, chat_history, llm=llm, summary=summary,
+                        rerank=_rerank_options(request), domain=domain, check_cache=False
+                    )
         
-        # Get chat history (all previous messages)
-        chat_history = []
-        for i in range(0, len(request.messages) - 1, 2):
-            if i + 1 < len(request.messages) - 1:
-                if request.messages[i].role == "user" and request.messages[i+1].role == "assistant":
-                    chat_history.append((request.messages[i].content, request.messages[i+1].content))
-        
-        # Get chat chain
-        chat_chain = get_chat_chain()
-        
-        # Get response from chain
-        result = chat_chain({"question": user_message, "chat_history": chat_history})
+        answer = result.get("answer", "I don't know how to respond to that.")
+        session_id = await _append_turn(session_id, user_message, answer, llm)
         
         # Return response
         return ChatResponse(
-            response=result.get("answer", "I don't know how to respond to that."),
-            sources=result.get("source_documents", [])
+            response=answer,
+            sources=[serialize_source(doc) for doc in result.get("source_documents", [])],
+            session_id=session_id
         )
     
+    except HTTPException:
+        raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e)) 
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/chat/stream")
+async def chat_stream_endpoint(request: ChatRequest, http_request: Request):
+    """
+    Stream a chat response as Server-Sent Events.
+    Sends a "sources" event with the retrieved documents, then one "token"
+    event per generated chunk and a final "done" event carrying the session
+    ID (null if the session expired meanwhile). Generation is cancelled as soon as the client disconnects, and only
+    complete answers are added to the session.
+    """
+    domain = _resolve_domain(request)
+    user_message, chat_history, summary, session_id = await _resolve_request(request)
+    # Cached answers need no LLM backend, so they never count towards its load
+    cached = await aget_cached(user_message, chat_history, summary, _rerank_options(request), domain)
+    lease = _acquire_llm() if cached is None else None
+    llm = lease.llm if lease is not None else llm_client.get_llm()
+    
+    async def event_stream():
+        if cached is not None:
+            for event, data in cached_events(cached):
+                yield _sse(event, data)
+            stored_id = await _append_turn(session_id, user_message, cached["answer"], llm)
+            yield _sse("done", {"session_id": stored_id})
+            return
+        
+        async with chat_slot():
+            stream = astream_chat(
+                user_message, chat_history, llm=llm, summary=summary,
+                rerank=_rerank_options(request), domain=domain, check_cache=False
+            )
+            tokens = []
+            try:
+                async for event, data in stream:
+                    if await http_request.is_disconnected():
+                        break
+                    if event == "token":
+                        tokens.append(data)
+                    yield _sse(event, data)
+                else:
+                    stored_id = await _append_turn(session_id, user_message, "".join(tokens), llm)
+                    yield _sse("done", {"session_id": stored_id})
+            except Exception as e:
+                yield _sse("error", {"detail": str(e)})
+            finally:
+                # Closing the stream closes the Ollama request and stops generation
+                await stream.aclose()
+                lease.release()
+    
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    if session_id is not None:
+        headers["X-Session-Id"] = session_id
+    # Also release the backend if the client is gone before the stream starts
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers=headers,
+        background=BackgroundTask(lease.release) if lease is not None else None
+    )
+
+@router.get("/chat/sessions/{session_id}", response_model=ChatSession)
+async def get_session(session_id: str):
+    """
+    Get the turns and summary a session keeps.
+    """
+    try:
+        chat_history, summary = await run_blocking(session_store.history, session_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Session {session_id} not found or expired")
+    return ChatSession(session_id=session_id, turns=chat_history, summary=summary)
+
+@router.delete("/chat/sessions/{session_id}")
+async def delete_session(session_id: str):
+    """
+    Delete a session.
+    """
+    if not await run_blocking(session_store.delete, session_id):
+        raise HTTPException(status_code=404, detail=f"Session {session_id} not found")
+    return {"message": f"Session {session_id} deleted successfully"}
+
+@router.get("/chat/stats")
+async def chat_stats():
+    """
+    Get response cache, history summary, session, query rewrite, rerank, LLM client and routing statistics.
+    """
+    return {
+        "response_cache": response_cache.stats(),
+        "history_summaries": history_compressor.stats(),
+        "sessions": session_store.stats(),
+        "query_rewrite": query_rewriter.stats(),
+        "rerank": reranker.stats(),
+        "llm": llm_client.stats(),
+        "llm_router": llm_router.stats(),
+    }
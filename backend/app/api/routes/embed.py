@@ -1,10 +1,18 @@
 from fastapi import APIRouter, HTTPException, UploadFile, File, Form
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
+import json
 import os
+import shutil
 import tempfile
 
-from core.embeddings import embed_document, get_vectorstore
+from core import registry
+from core.concurrency import run_blocking
+from core.embedding_cache import get_cache
+from core.bulk_ingest import resolve_directory
+from core.embeddings import delete_document, embed_document, get_domain_dedup_index, get_vectorstore
+from core.ingestion import QueueFullError, get_job, submit_bulk_job, submit_file_job
+from core.tenants import domain_exists, list_domains, loaded_domains, normalize_domain
 
 router = APIRouter()
 
@@ -16,14 +24,59 @@ class EmbedResponse(BaseModel):
     success: bool
     message: str
     document_id: Optional[str] = None
+    job_id: Optional[str] = None
+
+class IngestionJob(BaseModel):
+    job_id: str
+    document_id: Optional[str] = None  # None for bulk jobs
+    filename: Optional[str] = None
+    status: str  # "queued", "running", "completed" or "failed"
+    total_chunks: Optional[int] = None
+    processed_chunks: int
+    attempts: int
+    error: Optional[str] = None
+    summary: Optional[dict] = None  # Bulk jobs: file counts, errors, docs/s and chunks/s
+    created_at: str
+    updated_at: str
+
+def _resolve_domain(domain: Optional[str], must_exist: bool = False) -> Optional[str]:
+    """
+    Validate a domain name, refusing unknown domains where they must already exist.
+    """
+    try:
+        domain = normalize_domain(domain)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if must_exist and not domain_exists(domain):
+        raise HTTPException(status_code=404, detail=f"Domain {domain} has no documents")
+    return domain
+
+def _with_domain(meta: dict) -> dict:
+    """
+    Validate the domain in upload metadata and store it in its canonical form.
+    """
+    domain = _resolve_domain(meta.get("domain"))
+    if domain is not None:
+        meta["domain"] = domain
+    return meta
+
+def _save_upload(file: UploadFile) -> str:
+    """
+    Stream an upload to a temporary file, keeping its extension for the loader.
+    """
+    suffix = os.path.splitext(file.filename or "")[1]
+    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as temp_file:
+        shutil.copyfileobj(file.file, temp_file)
+        return temp_file.name
 
 @router.post("/embed/text", response_model=EmbedResponse)
 async def embed_text(request: EmbedTextRequest):
     """
-    Embed a text document into the vector store.
+    Embed a text document into the vector store, in the collection of metadata["domain"] if set.
     """
+    metadata = _with_domain(dict(request.metadata or {}))
     try:
-        doc_id = embed_document(text=request.text, metadata=request.metadata)
+        doc_id = await run_blocking(embed_document, text=request.text, metadata=metadata)
         return EmbedResponse(
             success=True,
             message="Text embedded successfully",
@@ -32,61 +85,162 @@ async def embed_text(request: EmbedTextRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.post("/embed/file", response_model=EmbedResponse)
+@router.post("/embed/file", response_model=EmbedResponse, status_code=202)
 async def embed_file(
     file: UploadFile = File(...),
     metadata: Optional[str] = Form(None)
 ):
     """
-    Embed a file document into the vector store.
+    Queue a file document for embedding into the vector store, in the collection of metadata["domain"] if set.
+    Returns a job ID immediately; poll /embed/jobs/{job_id} for progress.
     """
     try:
-        # Save file temporarily
-        with tempfile.NamedTemporaryFile(delete=False) as temp_file:
-            content = await file.read()
-            temp_file.write(content)
-            temp_path = temp_file.name
-        
         # Process metadata
         meta = {}
         if metadata:
-            import json
             meta = json.loads(metadata)
+        meta = _with_domain(meta)
         
         # Add filename to metadata
         meta["filename"] = file.filename
         
-        # Embed document
-        doc_id = embed_document(file_path=temp_path, metadata=meta)
+        # Save file temporarily without holding it all in memory
+        temp_path = await run_blocking(_save_upload, file)
         
-        # Clean up
-        os.unlink(temp_path)
+        # Queue ingestion job
+        try:
+            job = submit_file_job(temp_path, meta)
+        except QueueFullError:
+            os.unlink(temp_path)
+            raise
         
         return EmbedResponse(
             success=True,
-            message=f"File {file.filename} embedded successfully",
-            document_id=doc_id
+            message=f"File {file.filename} queued for embedding",
+            document_id=job["document_id"],
+            job_id=job["job_id"]
         )
+    except HTTPException:
+        raise
+    except QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "30"})
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/embed/bulk", response_model=EmbedResponse, status_code=202)
+async def embed_bulk(
+    file: Optional[UploadFile] = File(None),
+    directory: Optional[str] = Form(None),
+    metadata: Optional[str] = Form(None)
+):
+    """
+    Queue a zip or tar archive, or a directory under BULK_INGEST_ROOT, for bulk embedding.
+    Files that are unchanged since the last bulk ingestion are skipped, and
+    everything goes into the collection of metadata["domain"] if set.
+    Returns a job ID immediately; poll /embed/jobs/{job_id} for the summary.
+    """
+    if (file is None) == (directory is None):
+        raise HTTPException(status_code=400, detail="Provide either an archive file or a directory")
+    
+    try:
+        meta = _with_domain(json.loads(metadata) if metadata else {})
+        
+        if directory is not None:
+            job = submit_bulk_job(resolve_directory(directory), meta)
+            source_name = directory
+        else:
+            temp_path = await run_blocking(_save_upload, file)
+            try:
+                job = submit_bulk_job(temp_path, meta, owns_source=True)
+            except QueueFullError:
+                os.unlink(temp_path)
+                raise
+            source_name = file.filename
+        
+        return EmbedResponse(
+            success=True,
+            message=f"{source_name} queued for bulk embedding",
+            job_id=job["job_id"]
+        )
+    except HTTPException:
+        raise
+    except PermissionError as e:
+        raise HTTPException(status_code=403, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "30"})
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/embed/jobs/{job_id}", response_model=IngestionJob)
+async def embed_job_status(job_id: str):
+    """
+    Get the progress of a file or bulk embedding job.
+    """
+    job = get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail=f"Job with ID {job_id} not found")
+    return job
+
+@router.delete("/embed/documents/{doc_id}")
+async def delete_embedded_document(doc_id: str, domain: Optional[str] = None):
+    """
+    Delete every chunk of an embedded document from the vector store of a domain.
+    """
+    domain = _resolve_domain(domain, must_exist=True)
+    try:
+        await run_blocking(delete_document, doc_id, domain)
+        return {"message": f"Document with ID {doc_id} deleted successfully"}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+def _dedup_stats(domain: Optional[str]) -> Dict[str, Any]:
+    """
+    Get the dedup index statistics of a domain, opening the index on first use.
+    """
+    return get_domain_dedup_index(domain).stats()
+
 @router.get("/embed/status")
-async def embed_status():
+async def embed_status(domain: Optional[str] = None):
     """
-    Get status of the vector store.
+    Get status of the vector store of a domain (the default one if not given).
     """
+    domain = _resolve_domain(domain, must_exist=True)
     try:
         # Get vector store
-        vectorstore = get_vectorstore()
+        vectorstore = await run_blocking(get_vectorstore, domain)
         
-        # Get collection statistics
+        # Get collection statistics; opening the dedup index may create its database
         collection = vectorstore._collection
-        count = collection.count()
+        count = await run_blocking(collection.count)
+        dedup = await run_blocking(_dedup_stats, domain)
         
         return {
             "status": "operational",
+            "domain": domain,
             "document_count": count,
-            "collection_name": collection.name
+            "collection_name": collection.name,
+            "dedup": dedup
         }
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e)) 
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/embed/domains")
+async def embed_domains():
+    """
+    List the domains with their own collection, and which of them are open.
+    """
+    return {"domains": list_domains(), **loaded_domains.stats()}
+
+@router.get("/embed/stats")
+async def embed_stats():
+    """
+    Get embedding service metrics (batch sizes, queue latency and cache hit rate).
+    Cache hits and misses are counted for the API process only.
+    """
+    cache = get_cache()
+    return {
+        "embedding_models": registry.embedding_stats(),
+        "embedding_cache": cache.stats() if cache else None,
+    }
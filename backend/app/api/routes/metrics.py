@@ -0,0 +1,28 @@
+from fastapi import APIRouter, Query, Request, Response
+from typing import Optional
+
+from core import metrics
+
+router = APIRouter()
+
+@router.get("/metrics")
+async def get_metrics(request: Request):
+    """
+    Prometheus metrics, including per-stage latency histograms.
+    Scrapers that accept OpenMetrics also get trace IDs as exemplars.
+    """
+    body, content_type = metrics.render(request.headers.get("accept", ""))
+    return Response(content=body, media_type=content_type)
+
+@router.get("/metrics/traces")
+async def get_traces(
+    limit: int = Query(50, ge=1, le=metrics.TRACE_BUFFER_SIZE),
+    slowest: bool = False,
+    name: Optional[str] = None
+):
+    """
+    Get recent request traces with the duration of each stage, newest first,
+    or slowest first to see where tail latency comes from.
+    name filters by request, e.g. "POST /api/chat".
+    """
+    return {"traces": metrics.recent_traces(limit=limit, slowest=slowest, name=name)}
@@ -4,7 +4,8 @@ from typing import List, Optional, Dict, Any
 import uuid
 from datetime import datetime
 
-from core.projects import store_project, get_project, get_all_projects, update_project, delete_project
+from core.concurrency import run_blocking
+from core.projects import store_project, get_project, query_projects, search_projects, update_project, delete_project
 
 router = APIRouter()
 
@@ -29,6 +30,9 @@ class Project(ProjectBase):
     created_at: str
     updated_at: str
 
+class ProjectSearchResult(Project):
+    score: float
+
 @router.post("/projects", response_model=Project)
 async def create_project(project: ProjectCreate):
     """
@@ -54,19 +58,38 @@ async def create_project(project: ProjectCreate):
 
 @router.get("/projects", response_model=List[Project])
 async def list_projects(
-    status: Optional[str] = Query(None, description="Filter by project status")
+    status: Optional[str] = Query(None, description="Filter by project status"),
+    limit: Optional[int] = Query(None, ge=1, description="Maximum number of projects to return"),
+    offset: int = Query(0, ge=0, description="Number of projects to skip")
 ):
     """
-    List all projects or filter by status.
+    List all projects or filter by status, optionally paginated.
     """
     try:
-        projects = get_all_projects()
-        
-        # Filter by status if provided
-        if status:
-            projects = [p for p in projects if p.get("status") == status]
-        
-        return projects
+        return query_projects(status=status, limit=limit, offset=offset)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/projects/search", response_model=List[ProjectSearchResult])
+async def search_projects_endpoint(
+    q: str = Query(..., min_length=1, description="Search query"),
+    top_k: int = Query(5, ge=1, le=50, description="Maximum number of projects to return"),
+    score_threshold: Optional[float] = Query(None, ge=-1, le=1, description="Minimum cosine similarity to the query"),
+    status: Optional[str] = Query(None, description="Filter by project status"),
+    technologies: Optional[List[str]] = Query(None, description="Only projects using all of these technologies")
+):
+    """
+    Search projects by semantic similarity to a query.
+    """
+    try:
+        return await run_blocking(
+            search_projects,
+            q,
+            top_k=top_k,
+            score_threshold=score_threshold,
+            status=status,
+            technologies=technologies
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -0,0 +1,297 @@
+import heapq
+import math
+import os
+import pickle
+import re
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from dotenv import load_dotenv
+
+try:
+    import fcntl
+except ImportError:  # Windows: saves by other processes are not locked out
+    fcntl = None
+
+# Load environment variables
+load_dotenv()
+
+# File the keyword index is persisted to, next to the Chroma data by default
+BM25_INDEX_PATH = os.getenv(
+    "BM25_INDEX_PATH",
+    os.path.join(os.getenv("CHROMA_PERSIST_DIRECTORY", "./chroma_db"), "bm25_index.pkl")
+)
+
+# Seconds to wait after a write before saving, so bursts of writes are saved once
+BM25_SAVE_DELAY = float(os.getenv("BM25_SAVE_DELAY", "5"))
+
+# Words, numbers and dotted/dashed identifiers such as "node.js" or project UUIDs
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:[._-][a-z0-9]+)*")
+_PART_RE = re.compile(r"[._-]")
+
+def tokenize(text: str) -> List[str]:
+    """
+    Split text into lowercase terms. Compound tokens such as "node.js" are
+    kept whole and also split into their parts.
+    """
+    terms = []
+    for token in _TOKEN_RE.findall(text.lower()):
+        terms.append(token)
+        if _PART_RE.search(token):
+            terms.extend(part for part in _PART_RE.split(token) if part)
+    return terms
+
+def _file_stamp(path: str) -> Optional[Tuple[int, int, int]]:
+    """
+    Get what identifies a version of a file, or None if it does not exist.
+    """
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+@contextmanager
+def _file_lock(path: str) -> Iterator[None]:
+    """
+    Hold a lock on the index file across processes.
+    """
+    with open(f"{path}.lock", "a") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+class BM25Index:
+    """
+    In-process BM25 inverted index over chunk texts, keyed by chunk id.
+    Chunks can be added, replaced and removed one at a time.
+
+    Other processes (e.g. the management CLI) save the same file, so the
+    ids changed since the last load or save are tracked, and a save first
+    merges them into the file if it changed on disk.
+    """
+
+    def __init__(self, path: Optional[str] = None, k1: float = 1.5, b: float = 0.75):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self._postings: Dict[str, Dict[str, int]] = {}
+        self._doc_terms: Dict[str, Counter] = {}
+        self._lengths: Dict[str, int] = {}
+        self._total_length = 0
+        self._lock = threading.RLock()
+        self._dirty = False
+        self._save_timer: Optional[threading.Timer] = None
+        # Changes since the file was last read or written
+        self._stamp: Optional[Tuple[int, int, int]] = None
+        self._added: Set[str] = set()
+        self._removed: Set[str] = set()
+        self._cleared = False
+
+    def __len__(self) -> int:
+        """Number of indexed chunks."""
+        return len(self._doc_terms)
+
+    def ids(self) -> Set[str]:
+        """
+        Get the ids of the indexed chunks.
+        """
+        with self._lock:
+            return set(self._doc_terms)
+
+    def _insert(self, chunk_id: str, terms: Counter) -> None:
+        """
+        Index one chunk's terms. Caller holds the lock and has removed the chunk.
+        """
+        self._doc_terms[chunk_id] = terms
+        self._lengths[chunk_id] = sum(terms.values())
+        self._total_length += self._lengths[chunk_id]
+        for term, frequency in terms.items():
+            self._postings.setdefault(term, {})[chunk_id] = frequency
+
+    def _remove(self, chunk_id: str) -> None:
+        """
+        Remove one chunk. Caller holds the lock.
+        """
+        terms = self._doc_terms.pop(chunk_id, None)
+        if terms is None:
+            return
+        self._total_length -= self._lengths.pop(chunk_id)
+        for term in terms:
+            postings = self._postings[term]
+            del postings[chunk_id]
+            if not postings:
+                del self._postings[term]
+
+    def add(self, ids: Iterable[str], texts: Iterable[str]) -> None:
+        """
+        Add chunks, replacing any already indexed under the same ids.
+        """
+        with self._lock:
+            for chunk_id, text in zip(ids, texts):
+                self._remove(chunk_id)
+                self._insert(chunk_id, Counter(tokenize(text)))
+                self._added.add(chunk_id)
+                self._removed.discard(chunk_id)
+            self._schedule_save()
+
+    def remove(self, ids: Iterable[str]) -> None:
+        """
+        Remove chunks from the index.
+        """
+        with self._lock:
+            for chunk_id in ids:
+                self._remove(chunk_id)
+                self._removed.add(chunk_id)
+                self._added.discard(chunk_id)
+            self._schedule_save()
+
+    def clear(self) -> None:
+        """
+        Remove every chunk from the index.
+        """
+        with self._lock:
+            self._postings.clear()
+            self._doc_terms.clear()
+            self._lengths.clear()
+            self._total_length = 0
+            self._added.clear()
+            self._removed.clear()
+            self._cleared = True
+            self._schedule_save()
+
+    def search(self, query: str, k: int) -> List[Tuple[str, float]]:
+        """
+        Get the k highest scoring (chunk id, BM25 score) pairs for a query.
+        """
+        with self._lock:
+            count = len(self._doc_terms)
+            if not count:
+                return []
+            average_length = self._total_length / count
+
+            scores: Dict[str, float] = {}
+            for term in set(tokenize(query)):
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for chunk_id, frequency in postings.items():
+                    norm = self.k1 * (1 - self.b + self.b * self._lengths[chunk_id] / average_length)
+                    scores[chunk_id] = scores.get(chunk_id, 0.0) + idf * frequency * (self.k1 + 1) / (frequency + norm)
+
+        return heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+
+    def _schedule_save(self) -> None:
+        """
+        Mark the index as changed and save it after BM25_SAVE_DELAY. Caller holds the lock.
+        """
+        self._dirty = True
+        if self.path and self._save_timer is None:
+            self._save_timer = threading.Timer(BM25_SAVE_DELAY, self.save)
+            self._save_timer.daemon = True
+            self._save_timer.start()
+
+    def _merge_file(self) -> None:
+        """
+        Replace the index with the file's, plus the changes made here since the last load or save.
+        Caller holds the lock.
+        """
+        merged = BM25Index.load(self.path)
+        for chunk_id in self._added | self._removed:
+            merged._remove(chunk_id)
+        for chunk_id in self._added:
+            merged._insert(chunk_id, self._doc_terms[chunk_id])
+        self._postings = merged._postings
+        self._doc_terms = merged._doc_terms
+        self._lengths = merged._lengths
+        self._total_length = merged._total_length
+
+    def save(self) -> None:
+        """
+        Write the index to its path if it changed since the last save, first
+        merging in what other processes saved there since.
+        """
+        with self._lock:
+            self._save_timer = None
+            if not self.path or not self._dirty:
+                return
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with _file_lock(self.path):
+                if not self._cleared and _file_stamp(self.path) != self._stamp:
+                    self._merge_file()
+                state = {
+                    "k1": self.k1,
+                    "b": self.b,
+                    "postings": self._postings,
+                    "doc_terms": self._doc_terms,
+                    "lengths": self._lengths,
+                    "total_length": self._total_length,
+                }
+                temp_path = f"{self.path}.tmp"
+                with open(temp_path, "wb") as f:
+                    pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(temp_path, self.path)
+                self._stamp = _file_stamp(self.path)
+            self._dirty = False
+            self._added.clear()
+            self._removed.clear()
+            self._cleared = False
+
+    def close(self) -> None:
+        """
+        Cancel any pending save and save now.
+        """
+        with self._lock:
+            if self._save_timer is not None:
+                self._save_timer.cancel()
+        self.save()
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Index":
+        """
+        Load an index from path, or return an empty one if the file does not exist.
+        """
+        index = cls(path)
+        index._stamp = _file_stamp(path)
+        if index._stamp is None:
+            return index
+
+        with open(path, "rb") as f:
+            state = pickle.load(f)
+        index.k1 = state["k1"]
+        index.b = state["b"]
+        index._postings = state["postings"]
+        index._doc_terms = state["doc_terms"]
+        index._lengths = state["lengths"]
+        index._total_length = state["total_length"]
+        return index
+
+_indexes: Dict[str, BM25Index] = {}
+_index_lock = threading.Lock()
+
+def get_bm25_index(path: str = BM25_INDEX_PATH) -> BM25Index:
+    """
+    Get the shared keyword index stored at path (BM25_INDEX_PATH by default), loading it on first use.
+    """
+    with _index_lock:
+        if path not in _indexes:
+            _indexes[path] = BM25Index.load(path)
+        return _indexes[path]
+
+def close_bm25_index(path: Optional[str] = None) -> None:
+    """
+    Save and release the keyword index stored at path, or every index if no path is given.
+    """
+    with _index_lock:
+        paths = [path] if path is not None else list(_indexes)
+        for index_path in paths:
+            index = _indexes.pop(index_path, None)
+            if index is not None:
+                index.close()
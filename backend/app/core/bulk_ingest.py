@@ -0,0 +1,266 @@
+import hashlib
+import os
+import shutil
+import tarfile
+import tempfile
+import time
+import zipfile
+from collections import deque
+from concurrent.futures import Executor
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from core import registry
+from core.embeddings import (
+    EMBEDDING_MODEL_NAME,
+    LOADER_MAPPING,
+    add_chunks,
+    batched,
+    chunk_ids,
+    delete_chunks,
+    embed_unique,
+    get_chunks,
+    split_document,
+)
+from core.tenants import normalize_domain
+
+# Load environment variables
+load_dotenv()
+
+# Chunks buffered before they are written to the vector store in one call
+BULK_WRITE_BATCH = int(os.getenv("BULK_WRITE_BATCH", "512"))
+
+# Server-side directory that /api/embed/bulk may read from; unset disables directory ingestion over HTTP
+BULK_INGEST_ROOT = os.getenv("BULK_INGEST_ROOT")
+
+# Files whose stored hash is looked up in one query
+HASH_LOOKUP_BATCH = 256
+
+# Errors kept in the summary
+MAX_REPORTED_ERRORS = 100
+
+def file_hash(file_path: str) -> str:
+    """
+    Get the SHA-256 of a file's contents.
+    """
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def bulk_doc_id(name: str) -> str:
+    """
+    Get the document ID of a bulk-ingested file from its path inside the source.
+    Re-ingesting the same source therefore updates documents in place.
+    """
+    return f"bulk:{name}"
+
+def resolve_directory(directory: str) -> str:
+    """
+    Resolve a server-side directory requested over HTTP.
+    Raises PermissionError unless it is inside BULK_INGEST_ROOT.
+    """
+    if not BULK_INGEST_ROOT:
+        raise PermissionError("Server-side directory ingestion is disabled; set BULK_INGEST_ROOT to enable it")
+
+    root = os.path.realpath(BULK_INGEST_ROOT)
+    path = os.path.realpath(os.path.join(root, directory))
+    if os.path.commonpath([root, path]) != root:
+        raise PermissionError(f"Directory {directory} is outside BULK_INGEST_ROOT")
+    if not os.path.isdir(path):
+        raise ValueError(f"Directory {directory} does not exist")
+    return path
+
+@contextmanager
+def open_source(source: str) -> Iterator[str]:
+    """
+    Get a directory with the contents of a source: the directory itself,
+    or a zip or tar archive extracted to a temporary directory.
+    """
+    if os.path.isdir(source):
+        yield source
+        return
+
+    if zipfile.is_zipfile(source):
+        opener = zipfile.ZipFile
+    elif tarfile.is_tarfile(source):
+        opener = tarfile.open
+    else:
+        raise ValueError(f"{source} is not a directory, zip or tar archive")
+
+    directory = tempfile.mkdtemp(prefix="bulk_ingest_")
+    try:
+        with opener(source) as archive:
+            if isinstance(archive, tarfile.TarFile):
+                # Refuses absolute paths, links out of the directory and special files
+                archive.extractall(directory, filter="data")
+            else:
+                archive.extractall(directory)
+        yield directory
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+def iter_files(directory: str) -> Iterator[Tuple[str, str]]:
+    """
+    Yield (name relative to directory, path) for every file with a supported type.
+    """
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+        for filename in sorted(files):
+            if os.path.splitext(filename)[1].lower() not in LOADER_MAPPING:
+                continue
+            path = os.path.join(root, filename)
+            yield os.path.relpath(path, directory).replace(os.sep, "/"), path
+
+def _stored_hashes(doc_ids: List[str], domain: Optional[str] = None) -> Dict[str, str]:
+    """
+    Get the content hash stored with each already ingested document.
+    Every document has a first chunk, stored or linked, so one lookup by id covers the batch.
+    """
+    first_chunks = [chunk_ids(doc_id, 0, 1)[0] for doc_id in doc_ids]
+    results = get_chunks(ids=first_chunks, domain=domain)
+    return {
+        metadata["doc_id"]: metadata.get("content_hash")
+        for metadata in results["metadatas"] if metadata
+    }
+
+def _process_file(
+    file_path: str,
+    metadata: Dict[str, Any],
+    model_name: str,
+    domain: Optional[str] = None
+) -> Tuple[List[str], List[Dict[str, Any]], List[Optional[List[float]]]]:
+    """
+    Parse, split and embed one file in a worker process.
+    Chunks the domain's dedup index already holds are not embedded; their embedding is None.
+    """
+    documents = split_document(file_path=file_path, metadata=metadata)
+    texts = [doc.page_content for doc in documents]
+    metadatas = [doc.metadata for doc in documents]
+    embeddings = embed_unique(texts, metadatas, registry.get_embeddings(model_name).embed_documents, domain)
+    return texts, metadatas, embeddings
+
+class _ChunkWriter:
+    """
+    Buffers parsed files and writes them to a domain's vector store in large batches.
+    """
+
+    def __init__(self, domain: Optional[str] = None):
+        self.domain = domain
+        self._reset()
+
+    def _reset(self) -> None:
+        """
+        Empty the buffer.
+        """
+        self.ids: List[str] = []
+        self.texts: List[str] = []
+        self.metadatas: List[Dict[str, Any]] = []
+        self.embeddings: List[List[float]] = []
+        self.replaced: List[Tuple[str, str]] = []
+
+    def add(self, doc_id: str, content_hash: str, replaces: bool, texts, metadatas, embeddings) -> None:
+        """
+        Buffer one file's chunks, writing when the buffer is full.
+        """
+        self.ids.extend(chunk_ids(doc_id, 0, len(texts)))
+        self.texts.extend(texts)
+        self.metadatas.extend(metadatas)
+        self.embeddings.extend(embeddings)
+        if replaces:
+            self.replaced.append((doc_id, content_hash))
+        if len(self.ids) >= BULK_WRITE_BATCH:
+            self.flush()
+
+    def flush(self) -> None:
+        """
+        Write buffered chunks, then delete chunks left over from earlier versions of replaced files.
+        """
+        add_chunks(
+            ids=self.ids, texts=self.texts, metadatas=self.metadatas, embeddings=self.embeddings, domain=self.domain
+        )
+        for doc_id, content_hash in self.replaced:
+            delete_chunks(
+                where={"$and": [{"doc_id": doc_id}, {"content_hash": {"$ne": content_hash}}]}, domain=self.domain
+            )
+        self._reset()
+
+def ingest_source(
+    source: str,
+    executor: Executor,
+    workers: int,
+    metadata: Optional[Dict[str, Any]] = None,
+    progress: Optional[Callable[[Dict[str, Any]], None]] = None
+) -> Dict[str, Any]:
+    """
+    Ingest every supported file in a directory, zip or tar archive.
+    Files are parsed and embedded across the executor's workers, files whose
+    content hash matches the stored one are skipped, and chunks are written in
+    batches of BULK_WRITE_BATCH. progress is called with the running summary
+    after each file. Returns the summary, including docs/s and chunks/s.
+    Everything goes into the collection of metadata["domain"], if set.
+    """
+    domain = normalize_domain((metadata or {}).get("domain"))
+    if domain is not None:
+        metadata = dict(metadata, domain=domain)
+    start_time = time.perf_counter()
+    summary: Dict[str, Any] = {
+        "files": 0,
+        "ingested": 0,
+        "skipped": 0,
+        "failed": 0,
+        "chunks": 0,
+        "by_type": {},
+        "errors": [],
+    }
+    writer = _ChunkWriter(domain)
+    in_flight = deque()
+
+    def collect():
+        name, doc_id, content_hash, replaces, future = in_flight.popleft()
+        try:
+            texts, metadatas, embeddings = future.result()
+            writer.add(doc_id, content_hash, replaces, texts, metadatas, embeddings)
+            summary["ingested"] += 1
+            summary["chunks"] += len(texts)
+        except Exception as e:
+            summary["failed"] += 1
+            if len(summary["errors"]) < MAX_REPORTED_ERRORS:
+                summary["errors"].append({"file": name, "error": str(e)})
+        if progress:
+            progress(summary)
+
+    with open_source(source) as directory:
+        for files in batched(iter_files(directory), HASH_LOOKUP_BATCH):
+            hashes = [file_hash(path) for _, path in files]
+            doc_ids = [bulk_doc_id(name) for name, _ in files]
+            stored = _stored_hashes(doc_ids, domain)
+
+            for (name, path), doc_id, content_hash in zip(files, doc_ids, hashes):
+                extension = os.path.splitext(name)[1].lower()
+                summary["files"] += 1
+                summary["by_type"][extension] = summary["by_type"].get(extension, 0) + 1
+                if stored.get(doc_id) == content_hash:
+                    summary["skipped"] += 1
+                    continue
+
+                file_metadata = dict(metadata or {}, doc_id=doc_id, filename=name, source=name, content_hash=content_hash)
+                future = executor.submit(_process_file, path, file_metadata, EMBEDDING_MODEL_NAME, domain)
+                in_flight.append((name, doc_id, content_hash, doc_id in stored, future))
+
+                # Keep every worker busy without parsing far ahead of the writer
+                if len(in_flight) >= workers * 2:
+                    collect()
+
+        while in_flight:
+            collect()
+        writer.flush()
+
+    elapsed = time.perf_counter() - start_time
+    summary["seconds"] = round(elapsed, 3)
+    summary["docs_per_second"] = round(summary["ingested"] / elapsed, 2) if elapsed else 0.0
+    summary["chunks_per_second"] = round(summary["chunks"] / elapsed, 2) if elapsed else 0.0
+    return summary
@@ -1,11 +1,21 @@
-import os
+import json
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 from dotenv import load_dotenv
-from langchain_ollama import OllamaLLM
+from langchain_core.documents import Document
+from langchain_core.language_models import BaseLLM
 from langchain.chains import ConversationalRetrievalChain
 from langchain.memory import ConversationBufferMemory
 from langchain_core.prompts import PromptTemplate
 
-from core.embeddings import get_vectorstore
+from core import llm_client, metrics
+from core.concurrency import run_blocking
+from core.context import assemble_context, estimate_tokens, history_compressor
+from core.embeddings import get_collection_version, get_vectorstore
+from core.llm_client import PooledOllamaLLM
+from core.query_rewrite import query_rewriter
+from core.rerank import reranker, resolve_options
+from core.response_cache import response_cache
+from core.retrieval import retrieve_with_similarities
 
 # Load environment variables
 load_dotenv()
@@ -26,16 +36,236 @@ Question: {question}
 Answer:
 """
 
+# Number of chunks retrieved for each question
+RETRIEVAL_K = 5
+
+PROMPT = PromptTemplate(
+    template=DEFAULT_TEMPLATE,
+    input_variables=["context", "chat_history", "question"]
+)
+
+def get_llm(temperature=0.7, model_name="mistral") -> PooledOllamaLLM:
+    """
+    Get the shared Ollama LLM client for the given model.
+    """
+    return llm_client.get_llm(model_name=model_name, temperature=temperature)
+
+def format_chat_history(chat_history: List[Tuple[str, str]]) -> str:
+    """
+    Format (question, answer) pairs the same way ConversationalRetrievalChain does.
+    """
+    buffer = ""
+    for human, ai in chat_history:
+        buffer += f"\nHuman: {human}\nAssistant: {ai}"
+    return buffer
+
+def serialize_source(doc: Document) -> Dict[str, Any]:
+    """
+    Convert a retrieved document into a JSON-serializable source.
+    """
+    return {"content": doc.page_content, "metadata": doc.metadata}
+
+async def _aretrieve_context(
+    query: str,
+    rerank: Optional[Dict[str, Any]] = None,
+    domain: Optional[str] = None
+) -> Tuple[List[Tuple[Document, float]], Optional[Dict[str, float]], bool]:
+    """
+    Retrieve scored context chunks for a query from a domain, the similarities
+    to cut them off by (None once the cross-encoder has cut them off) and whether they were reranked.
+    With reranking, more candidates are retrieved and the cross-encoder picks
+    the RETRIEVAL_K most relevant of them above the cutoff.
+    rerank overrides the configured options ("enabled", "candidates", "min_score").
+    """
+    options = resolve_options(rerank)
+    if not options["enabled"]:
+        with metrics.stage("retrieval"):
+            scored_docs, similarities = await run_blocking(retrieve_with_similarities, query, RETRIEVAL_K, domain=domain)
+        return scored_docs, similarities, False
+    
+    with metrics.stage("retrieval"):
+        candidates, similarities = await run_blocking(
+            retrieve_with_similarities, query, max(RETRIEVAL_K, options["candidates"]), domain=domain
+        )
+    with metrics.stage("rerank"):
+        scored_docs = await run_blocking(reranker.rerank, query, candidates, RETRIEVAL_K, options["min_score"])
+    if scored_docs is None:
+        # The cross-encoder failed: keep the retrieval order
+        return candidates[:RETRIEVAL_K], similarities, False
+    return scored_docs, None, True
+
+def _cache_history(
+    chat_history: List[Tuple[str, str]],
+    summary: Optional[str],
+    domain: Optional[str] = None
+) -> List[Tuple[str, str]]:
+    """
+    Get the history that query rewrites are cached by, including any session summary
+    and the domain, so nothing cached for one domain is served in another.
+    """
+    prefix = []
+    if domain is not None:
+        prefix.append(("domain", domain))
+    if summary:
+        prefix.append(("", summary))
+    return prefix + list(chat_history) if prefix else chat_history
+
+def _answer_cache_history(
+    chat_history: List[Tuple[str, str]],
+    summary: Optional[str],
+    domain: Optional[str] = None,
+    rerank: Optional[Dict[str, Any]] = None
+) -> List[Tuple[str, str]]:
+    """
+    Get the history that cached answers are keyed by: _cache_history plus the
+    resolved rerank options, which decide the context an answer was generated from.
+    """
+    options = json.dumps(resolve_options(rerank), sort_keys=True)
+    return [("rerank", options)] + list(_cache_history(chat_history, summary, domain))
+
+async def _aprepare(
+    question: str,
+    chat_history: List[Tuple[str, str]],
+    llm: BaseLLM,
+    summary: Optional[str] = None,
+    rerank: Optional[Dict[str, Any]] = None,
+    domain: Optional[str] = None
+) -> Tuple[List[Document], str]:
+    """
+    Rewrite the question for retrieval, retrieve (and rerank) context from the domain and build the prompt.
+    Context and history are fitted to their token budgets.
+    """
+    with metrics.stage("history_compression"):
+        history_text = history_compressor.format(chat_history, llm, summary)
+    with metrics.stage("query_rewrite"):
+        query = await query_rewriter.arewrite(
+            question, chat_history, llm, history_text, _cache_history(chat_history, summary, domain)
+        )
+    scored_docs, similarities, reranked = await _aretrieve_context(query, rerank, domain)
+    
+    with metrics.stage("prompt_assembly"):
+        docs, context = assemble_context(scored_docs, similarities=similarities)
+        prompt = PROMPT.format(
+            context=context,
+            chat_history=history_text,
+            question=question
+        )
+    metrics.observe_prompt_tokens(estimate_tokens(prompt), reranked)
+    return docs, prompt
+
+def cached_events(cached: Dict[str, Any]) -> List[Tuple[str, Any]]:
+    """
+    Get the astream_chat events of a cached answer: its sources and the whole answer as a single token.
+    """
+    return [
+        ("sources", [serialize_source(doc) for doc in cached["source_documents"]]),
+        ("token", cached["answer"]),
+    ]
+
+async def aget_cached(
+    question: str,
+    chat_history: List[Tuple[str, str]],
+    summary: Optional[str] = None,
+    rerank: Optional[Dict[str, Any]] = None,
+    domain: Optional[str] = None
+) -> Optional[Dict[str, Any]]:
+    """
+    Get the cached answer to a question, with the same keys as achat, or None.
+    Needs no LLM, so callers can check it before claiming an LLM backend.
+    """
+    with metrics.stage("response_cache"):
+        return await run_blocking(
+            response_cache.get, question, _answer_cache_history(chat_history, summary, domain, rerank), get_collection_version()
+        )
+
+async def achat(
+    question: str,
+    chat_history: List[Tuple[str, str]],
+    llm: Optional[BaseLLM] = None,
+    summary: Optional[str] = None,
+    rerank: Optional[Dict[str, Any]] = None,
+    domain: Optional[str] = None,
+    check_cache: bool = True
+) -> Dict[str, Any]:
+    """
+    Answer a question without blocking the event loop.
+    summary describes turns before chat_history and is only passed by server-side
+    sessions (see HistoryCompressor.format), rerank overrides the rerank options for this question and domain selects
+    the collection searched (the default one if None). check_cache=False
+    skips the response cache lookup, e.g. after aget_cached missed.
+    Returns the same "answer" and "source_documents" keys as the chat chain.
+    """
+    if llm is None:
+        llm = get_llm()
+    
+    # Serve repeated and near-identical questions from the response cache
+    version = get_collection_version()
+    cache_history = _answer_cache_history(chat_history, summary, domain, rerank)
+    if check_cache:
+        with metrics.stage("response_cache"):
+            cached = await run_blocking(response_cache.get, question, cache_history, version)
+        if cached is not None:
+            return cached
+    
+    docs, prompt = await _aprepare(question, chat_history, llm, summary, rerank, domain)
+    answer = await llm.ainvoke(prompt)
+    
+    result = {"answer": answer, "source_documents": docs}
+    await run_blocking(response_cache.put, question, cache_history, version, result)
+    return result
+
+async def astream_chat(
+    question: str,
+    chat_history: List[Tuple[str, str]],
+    llm: Optional[BaseLLM] = None,
+    summary: Optional[str] = None,
+    rerank: Optional[Dict[str, Any]] = None,
+    domain: Optional[str] = None,
+    check_cache: bool = True
+) -> AsyncIterator[Tuple[str, Any]]:
+    """
+    Answer a question, yielding ("sources", [...]) once retrieval is done
+    and then ("token", text) for each chunk the LLM generates.
+    Pass llm to use a different (e.g. fake streaming) model, a session's summary
+    for turns before chat_history, rerank to override the rerank options and
+    domain to search that domain's collection; check_cache=False skips the
+    response cache lookup, as in achat.
+    Closing the iterator stops the generation.
+    """
+    if llm is None:
+        llm = get_llm()
+    
+    # A cached answer is sent as a single token
+    version = get_collection_version()
+    cache_history = _answer_cache_history(chat_history, summary, domain, rerank)
+    if check_cache:
+        with metrics.stage("response_cache"):
+            cached = await run_blocking(response_cache.get, question, cache_history, version)
+        if cached is not None:
+            for event in cached_events(cached):
+                yield event
+            return
+    
+    # Retrieve context and send it before generation starts
+    docs, prompt = await _aprepare(question, chat_history, llm, summary, rerank, domain)
+    yield "sources", [serialize_source(doc) for doc in docs]
+    
+    # Stream tokens as the model produces them
+    tokens = []
+    async for token in llm.astream(prompt):
+        tokens.append(token)
+        yield "token", token
+    
+    # Only complete answers are cached
+    result = {"answer": "".join(tokens), "source_documents": docs}
+    await run_blocking(response_cache.put, question, cache_history, version, result)
+
 def get_chat_chain(temperature=0.7, model_name="mistral"):
     """
     Create and return a conversational retrieval chain using Ollama with mistral model.
     """
     # Initialize LLM with Ollama using mistral model
-    llm = OllamaLLM(
-        model=model_name,
-        temperature=temperature,
-        base_url=os.getenv("OLLAMA_HOST", "http://localhost:11434")
-    )
+    llm = get_llm(temperature=temperature, model_name=model_name)
     
     # Get vector store
     vectorstore = get_vectorstore()
@@ -43,7 +273,7 @@ def get_chat_chain(temperature=0.7, model_name="mistral"):
     # Create retriever
     retriever = vectorstore.as_retriever(
         search_type="similarity",
-        search_kwargs={"k": 5}
+        search_kwargs={"k": RETRIEVAL_K}
     )
     
     # Create memory
@@ -53,12 +283,6 @@ def get_chat_chain(temperature=0.7, model_name="mistral"):
         output_key="answer"
     )
     
-    # Create prompt
-    prompt = PromptTemplate(
-        template=DEFAULT_TEMPLATE,
-        input_variables=["context", "chat_history", "question"]
-    )
-    
     # Create chain
     qa_chain = ConversationalRetrievalChain.from_llm(
         llm=llm,
@@ -66,7 +290,7 @@ def get_chat_chain(temperature=0.7, model_name="mistral"):
         memory=memory,
         verbose=True,
         return_source_documents=True,
-        combine_docs_chain_kwargs={"prompt": prompt},
+        combine_docs_chain_kwargs={"prompt": PROMPT},
     )
     
     return qa_chain 
\ No newline at end of file
@@ -0,0 +1,44 @@
+import asyncio
+import contextvars
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Optional
+
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Maximum number of chat requests processed at the same time
+MAX_CONCURRENT_CHATS = int(os.getenv("MAX_CONCURRENT_CHATS", "8"))
+
+# Threads available for blocking calls (Chroma queries, embedding) made from async code
+BLOCKING_POOL_SIZE = int(os.getenv("BLOCKING_POOL_SIZE", "8"))
+
+_executor = ThreadPoolExecutor(max_workers=BLOCKING_POOL_SIZE, thread_name_prefix="blocking")
+_chat_semaphore: Optional[asyncio.Semaphore] = None
+
+def chat_slot() -> asyncio.Semaphore:
+    """
+    Get the semaphore that limits concurrent chat requests.
+    """
+    global _chat_semaphore
+    if _chat_semaphore is None:
+        _chat_semaphore = asyncio.Semaphore(MAX_CONCURRENT_CHATS)
+    return _chat_semaphore
+
+async def run_blocking(func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """
+    Run a blocking function on the bounded thread pool without blocking the event loop.
+    The function sees the caller's context variables, such as the request's trace.
+    """
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(_executor, partial(context.run, func, *args, **kwargs))
+
+def shutdown() -> None:
+    """
+    Stop the blocking thread pool, dropping calls that have not started.
+    """
+    _executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,275 @@
+import asyncio
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from dotenv import load_dotenv
+from langchain_core.documents import Document
+from langchain_core.language_models import BaseLLM
+from langchain_core.prompts import PromptTemplate
+
+from core.response_cache import history_digest
+
+# Load environment variables
+load_dotenv()
+
+# Token budget for retrieved chunks in the prompt
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1200"))
+
+# Token budget for the chat history in the prompt
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "400"))
+
+# Most recent turns kept word for word; older turns are summarized
+HISTORY_RECENT_TURNS = int(os.getenv("HISTORY_RECENT_TURNS", "2"))
+
+# "summary" summarizes older turns with the LLM in the background; "truncate" only truncates them
+HISTORY_COMPRESSION = os.getenv("HISTORY_COMPRESSION", "summary")
+
+# Chunks less similar to the question than this fraction of the most similar chunk are dropped
+CONTEXT_MIN_SCORE_RATIO = float(os.getenv("CONTEXT_MIN_SCORE_RATIO", "0.5"))
+
+# Rough size of a Mistral token in characters of English text
+CHARS_PER_TOKEN = 4
+
+# Longest overlap looked for between chunks; the splitter overlaps chunks by up to 200 characters
+MAX_OVERLAP_CHARS = 300
+
+# Chunks cut to fit the budget are left out if less than this many tokens would remain
+MIN_PARTIAL_TOKENS = 50
+
+# Conversation summaries kept
+SUMMARY_CACHE_SIZE = 1024
+
+SUMMARY_TEMPLATE = """Progressively summarize the conversation, adding to the previous summary and returning a new summary.
+Keep names, projects, technologies and facts the user asked about. Reply with the summary only.
+
+Previous summary:
+{summary}
+
+New lines of conversation:
+{new_lines}
+
+New summary:"""
+
+SUMMARY_PROMPT = PromptTemplate(template=SUMMARY_TEMPLATE, input_variables=["summary", "new_lines"])
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimate the number of tokens in a text from its length.
+    """
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+def truncate_tokens(text: str, max_tokens: int, keep_end: bool = False) -> str:
+    """
+    Cut a text to about max_tokens tokens at a word boundary, keeping its start (or end).
+    """
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= max_chars:
+        return text
+    if keep_end:
+        cut = text[-max_chars:]
+        return "..." + cut[cut.find(" ") + 1:] if " " in cut else cut
+    cut = text[:max_chars]
+    return cut[:cut.rfind(" ")] + "..." if " " in cut else cut
+
+def _format_turns(chat_history: List[Tuple[str, str]]) -> str:
+    """
+    Format (question, answer) pairs like chat_chain.format_chat_history.
+    """
+    return "".join(f"\nHuman: {human}\nAssistant: {ai}" for human, ai in chat_history)
+
+def _trim_overlap(selected: List[str], text: str) -> str:
+    """
+    Remove the start of text that repeats the end of an already selected chunk,
+    which is how neighbouring chunks of a document overlap.
+    """
+    for previous in selected:
+        for size in range(min(len(previous), len(text), MAX_OVERLAP_CHARS), 20, -1):
+            if previous.endswith(text[:size]):
+                return text[size:].lstrip()
+    return text
+
+def assemble_context(
+    scored_docs: List[Tuple[Document, float]],
+    budget: int = CONTEXT_TOKEN_BUDGET,
+    similarities: Optional[Dict[str, float]] = None
+) -> Tuple[List[Document], str]:
+    """
+    Pick retrieved chunks for the prompt within a token budget.
+    Chunks are taken best score first. If similarities (cosine similarity to the
+    question by chunk id) are given, chunks less similar than CONTEXT_MIN_SCORE_RATIO
+    of the most similar one are dropped; chunks without one, e.g. keyword-only
+    matches, are kept. Chunks already contained in a picked chunk are skipped,
+    overlap with picked chunks is cut, and the last chunk is truncated to fit the budget.
+    Returns the picked documents and the context text.
+    """
+    if not scored_docs:
+        return [], ""
+
+    # Scores only rank the chunks, so the cutoff compares similarities instead
+    min_similarity = None
+    if similarities:
+        best_similarity = max(similarities.get(doc.id, float("-inf")) for doc, _ in scored_docs)
+        if best_similarity > 0:
+            min_similarity = best_similarity * CONTEXT_MIN_SCORE_RATIO
+
+    used: List[Document] = []
+    texts: List[str] = []
+    remaining = budget
+
+    for doc, _ in sorted(scored_docs, key=lambda item: item[1], reverse=True):
+        if remaining < MIN_PARTIAL_TOKENS:
+            break
+        if min_similarity is not None and similarities.get(doc.id, min_similarity) < min_similarity:
+            continue
+        if any(doc.page_content in text for text in texts):
+            continue
+
+        text = _trim_overlap(texts, doc.page_content)
+        if estimate_tokens(text) > remaining:
+            text = truncate_tokens(text, remaining)
+        used.append(doc)
+        texts.append(text)
+        remaining -= estimate_tokens(text)
+
+    return used, "\n\n".join(texts)
+
+class HistoryCompressor:
+    """
+    Fits chat history into a token budget. The last HISTORY_RECENT_TURNS turns
+    are kept; older turns are replaced by a summary that is extended one turn
+    at a time and cached by a digest of the turns it covers, so each
+    conversation's summary is computed once per turn.
+    Summaries are generated in the background; until one is ready the older
+    turns are truncated instead, so answers never wait for a summary.
+    """
+
+    def __init__(self, max_entries: int = SUMMARY_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._summaries: "OrderedDict[str, str]" = OrderedDict()
+        self._pending: Set[str] = set()
+        self._tasks: Set[asyncio.Task] = set()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def _get(self, turns: List[Tuple[str, str]]) -> Optional[str]:
+        """
+        Get the cached summary of exactly these turns.
+        """
+        key = history_digest(turns)
+        with self._lock:
+            summary = self._summaries.get(key)
+            if summary is not None:
+                self._summaries.move_to_end(key)
+            return summary
+
+    def _put(self, turns: List[Tuple[str, str]], summary: str) -> None:
+        """
+        Cache the summary of these turns, evicting the least recently used summaries.
+        """
+        with self._lock:
+            self._summaries[history_digest(turns)] = summary
+            while len(self._summaries) > self.max_entries:
+                self._summaries.popitem(last=False)
+
+    def _latest_summary(self, turns: List[Tuple[str, str]]) -> Tuple[int, str]:
+        """
+        Get the summary of the longest summarized prefix of the turns, and its length.
+        """
+        for length in range(len(turns), 0, -1):
+            summary = self._get(turns[:length])
+            if summary is not None:
+                return length, summary
+        return 0, ""
+
+    async def _summarize(self, turns: List[Tuple[str, str]], llm: BaseLLM) -> None:
+        """
+        Extend the latest cached summary with the turns after it and cache the result.
+        """
+        key = history_digest(turns)
+        try:
+            covered, summary = self._latest_summary(turns)
+            new_summary = await llm.ainvoke(SUMMARY_PROMPT.format(
+                summary=summary or "(none)",
+                new_lines=_format_turns(turns[covered:])
+            ))
+            self._put(turns, new_summary.strip())
+        except Exception:
+            # The next turn will try again; until then older turns are truncated
+            pass
+        finally:
+            with self._lock:
+                self._pending.discard(key)
+
+    def _schedule(self, turns: List[Tuple[str, str]], llm: BaseLLM) -> None:
+        """
+        Start summarizing the turns in the background unless that is already running.
+        """
+        key = history_digest(turns)
+        with self._lock:
+            if key in self._pending:
+                return
+            self._pending.add(key)
+        # Keep a reference so the task is not garbage collected before it finishes
+        task = asyncio.get_running_loop().create_task(self._summarize(list(turns), llm))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def format(
+        self,
+        chat_history: List[Tuple[str, str]],
+        llm: Optional[BaseLLM] = None,
+        summary: Optional[str] = None
+    ) -> str:
+        """
+        Format the chat history for the prompt within HISTORY_TOKEN_BUDGET.
+        summary describes turns before chat_history and is passed (even if empty)
+        by server-side sessions, which summarize their own older turns; their
+        window slides every turn, so older turns are only truncated then.
+        Must be called from the event loop when an llm is given.
+        """
+        if not chat_history and not summary:
+            return ""
+
+        split = max(0, len(chat_history) - HISTORY_RECENT_TURNS)
+        older, recent = chat_history[:split], chat_history[split:]
+        if not older and not summary:
+            return truncate_tokens(_format_turns(recent), HISTORY_TOKEN_BUDGET, keep_end=True)
+
+        # Leave a quarter of the budget for what came before the recent turns
+        recent_text = truncate_tokens(_format_turns(recent), HISTORY_TOKEN_BUDGET * 3 // 4, keep_end=True)
+        remaining = HISTORY_TOKEN_BUDGET - estimate_tokens(recent_text)
+
+        # Use the newest summary available, and keep the turns it does not cover
+        covered, older_summary = 0, ""
+        if older and summary is None:
+            covered, older_summary = self._latest_summary(older)
+            with self._lock:
+                if covered == len(older):
+                    self._hits += 1
+                else:
+                    self._misses += 1
+            if covered < len(older) and HISTORY_COMPRESSION == "summary" and llm is not None:
+                self._schedule(older, llm)
+
+        older_text = _format_turns(older[covered:])
+        summaries = " ".join(text for text in (summary, older_summary) if text)
+        if summaries:
+            older_text = f"\nSummary of earlier conversation: {summaries}{older_text}"
+        return truncate_tokens(older_text, remaining, keep_end=True) + recent_text
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get summary cache statistics.
+        """
+        with self._lock:
+            return {
+                "summaries": len(self._summaries),
+                "pending": len(self._pending),
+                "hits": self._hits,
+                "misses": self._misses,
+            }
+
+history_compressor = HistoryCompressor()
@@ -0,0 +1,476 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+from collections import Counter
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+from dotenv import load_dotenv
+
+from core.embedding_cache import normalize_text
+
+# Load environment variables
+load_dotenv()
+
+# Whether chunks already stored, exactly or nearly, are linked instead of stored again
+DEDUP_ENABLED = os.getenv("DEDUP_ENABLED", "true").lower() == "true"
+
+# SQLite file holding the dedup index of the default domain, next to the Chroma data by default
+DEDUP_INDEX_PATH = os.getenv(
+    "DEDUP_INDEX_PATH",
+    os.path.join(os.getenv("CHROMA_PERSIST_DIRECTORY", "./chroma_db"), "dedup_index.sqlite3")
+)
+
+# Differing SimHash bits (0-3) below which two chunks are near-duplicates; 0 links exact duplicates only
+DEDUP_MAX_DISTANCE = min(int(os.getenv("DEDUP_MAX_DISTANCE", "3")), 3)
+
+# Words a chunk needs before it is compared by SimHash; shorter chunks are only linked when identical
+DEDUP_MIN_WORDS = int(os.getenv("DEDUP_MIN_WORDS", "30"))
+
+# Words per shingle hashed into the SimHash
+SHINGLE_SIZE = 3
+
+# The 64-bit SimHash is split into 4 bands of 16 bits. Two fingerprints at most
+# 3 bits apart share at least one band, so looking up equal bands finds every candidate.
+_BANDS = 4
+_BAND_BITS = 16
+
+# Candidates compared per band lookup
+_MAX_CANDIDATES = 64
+
+# SQLite limits the number of parameters per statement
+_SQL_BATCH = 500
+
+_WORD_RE = re.compile(r"\w+")
+
+def content_hash(text: str) -> bytes:
+    """
+    Get the hash identifying a chunk's text, ignoring whitespace-only differences.
+    """
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).digest()
+
+def simhash(text: str) -> Optional[int]:
+    """
+    Get the 64-bit SimHash of a text's word shingles, or None if it has fewer than DEDUP_MIN_WORDS words.
+    Texts that share most of their shingles get fingerprints a few bits apart.
+    """
+    words = _WORD_RE.findall(text.lower())
+    if len(words) < max(DEDUP_MIN_WORDS, SHINGLE_SIZE):
+        return None
+
+    shingles = Counter(" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1))
+    hashes = np.array(
+        [hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest() for shingle in shingles],
+        dtype="S8"
+    )
+    bits = np.unpackbits(np.frombuffer(hashes.tobytes(), dtype=np.uint8).reshape(-1, 8), axis=1)
+    weights = np.fromiter(shingles.values(), dtype=np.int64, count=len(shingles))
+    votes = (bits.astype(np.int64) * 2 - 1).T @ weights
+    return int.from_bytes(np.packbits(votes > 0).tobytes(), "big")
+
+def _signed(value: int) -> int:
+    """
+    Store an unsigned 64-bit value in SQLite's signed INTEGER.
+    """
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+def _bands(fingerprint: int) -> List[int]:
+    """
+    Split a SimHash into its bands.
+    """
+    mask = (1 << _BAND_BITS) - 1
+    return [(fingerprint >> (band * _BAND_BITS)) & mask for band in range(_BANDS)]
+
+def _scope(metadata: Optional[Dict[str, Any]]) -> str:
+    """
+    Get the group of chunks a chunk may be linked within. Project chunks only link to
+    chunks of the same project, so project filters still find every project.
+    """
+    project_id = (metadata or {}).get("project_id")
+    return f"project:{project_id}" if project_id else ""
+
+def matches_where(metadata: Dict[str, Any], where: Optional[Dict[str, Any]]) -> bool:
+    """
+    Evaluate a Chroma-style where filter against one chunk's metadata.
+    """
+    if not where:
+        return True
+
+    for key, condition in where.items():
+        if key == "$and":
+            if not all(matches_where(metadata, clause) for clause in condition):
+                return False
+        elif key == "$or":
+            if not any(matches_where(metadata, clause) for clause in condition):
+                return False
+        elif not _match_value(metadata.get(key), condition):
+            return False
+    return True
+
+def _match_value(value: Any, condition: Any) -> bool:
+    """
+    Evaluate one metadata condition, e.g. "active" or {"$ne": "archived"}.
+    """
+    if not isinstance(condition, dict):
+        condition = {"$eq": condition}
+
+    (operator, operand), = condition.items()
+    if operator == "$ne":
+        return value != operand
+    if operator == "$nin":
+        return value not in operand
+    if value is None:
+        return False
+    if operator == "$eq":
+        return value == operand
+    if operator == "$in":
+        return value in operand
+    if operator == "$gt":
+        return value > operand
+    if operator == "$gte":
+        return value >= operand
+    if operator == "$lt":
+        return value < operand
+    if operator == "$lte":
+        return value <= operand
+    raise ValueError(f"Unsupported filter operator: {operator}")
+
+def _filtered_doc_id(where: Optional[Dict[str, Any]]) -> Optional[str]:
+    """
+    Get the doc_id a where filter requires, if any, so references can be looked up by it.
+    """
+    if not where:
+        return None
+    condition = where.get("doc_id")
+    if isinstance(condition, dict) and set(condition) == {"$eq"}:
+        condition = condition["$eq"]
+    if isinstance(condition, str):
+        return condition
+    for clause in where.get("$and", []):
+        doc_id = _filtered_doc_id(clause)
+        if doc_id is not None:
+            return doc_id
+    return None
+
+class DedupIndex:
+    """
+    Content hashes and SimHash fingerprints of the chunks in one domain's vector store.
+
+    Each chunk is either stored (its vector is in the collection) or a reference
+    to a stored chunk with the same or nearly the same text; references keep their
+    own text and metadata here instead of a vector. When a stored chunk is deleted
+    or replaced, one of its references (an exact copy if there is one) is promoted
+    and must be stored in its place; the others are linked again, and any that no
+    longer duplicate a stored chunk are promoted too.
+    """
+
+    def __init__(self, path: str = DEDUP_INDEX_PATH, max_distance: int = DEDUP_MAX_DISTANCE):
+        self.path = path
+        self.max_distance = max_distance
+        self._lock = threading.Lock()
+        self._counts = {"exact": 0, "near": 0, "promoted": 0}
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS chunks ("
+            "chunk_id TEXT PRIMARY KEY, scope TEXT NOT NULL, content_hash BLOB NOT NULL, simhash INTEGER, "
+            + "".join(f"band{band} INTEGER, " for band in range(_BANDS))
+            + "canonical_id TEXT, doc_id TEXT, text TEXT, metadata TEXT)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_chunks_hash ON chunks(scope, content_hash)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_chunks_canonical ON chunks(canonical_id)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_chunks_doc_id ON chunks(doc_id)")
+        for band in range(_BANDS):
+            self._conn.execute(f"CREATE INDEX IF NOT EXISTS idx_chunks_band{band} ON chunks(scope, band{band})")
+        self._conn.commit()
+
+    def _find(self, scope: str, digest: bytes, fingerprint: Optional[int]) -> Tuple[Optional[str], bool]:
+        """
+        Get the stored chunk a text duplicates, and whether it is an exact duplicate. Caller holds the lock.
+        """
+        row = self._conn.execute(
+            "SELECT chunk_id FROM chunks WHERE scope = ? AND content_hash = ? AND canonical_id IS NULL LIMIT 1",
+            (scope, digest)
+        ).fetchone()
+        if row is not None:
+            return row[0], True
+        if fingerprint is None or self.max_distance <= 0:
+            return None, False
+
+        query = " UNION ".join(
+            f"SELECT * FROM (SELECT chunk_id, simhash FROM chunks WHERE scope = ? AND band{band} = ? "
+            f"AND canonical_id IS NULL AND simhash IS NOT NULL LIMIT {_MAX_CANDIDATES})"
+            for band in range(_BANDS)
+        )
+        params = [value for band_value in _bands(fingerprint) for value in (scope, band_value)]
+        best = None
+        for chunk_id, candidate in self._conn.execute(query, params):
+            distance = bin((candidate & ((1 << 64) - 1)) ^ fingerprint).count("1")
+            if distance <= self.max_distance and (best is None or distance < best[1]):
+                best = (chunk_id, distance)
+        return (best[0], False) if best else (None, False)
+
+    def _forget(self, chunk_id: str, exclude: Set[str] = frozenset()) -> List[Tuple[str, str, Dict[str, Any]]]:
+        """
+        Remove a chunk. If it was stored, promote one of its references not in exclude,
+        preferring an exact copy over the oldest, and link the others again as if they
+        were written now; those matching no stored chunk any more are promoted as well.
+        Returns the promoted chunks as (chunk id, text, metadata). Caller holds the lock.
+        """
+        row = self._conn.execute(
+            "SELECT canonical_id, content_hash FROM chunks WHERE chunk_id = ?", (chunk_id,)
+        ).fetchone()
+        if row is None:
+            return []
+        self._conn.execute("DELETE FROM chunks WHERE chunk_id = ?", (chunk_id,))
+        if row[0] is not None:
+            return []
+
+        deleted_digest = row[1]
+        remaining = [
+            reference for reference in self._conn.execute(
+                "SELECT chunk_id, scope, content_hash, simhash, text, metadata FROM chunks "
+                "WHERE canonical_id = ? ORDER BY rowid",
+                (chunk_id,)
+            ).fetchall()
+            if reference[0] not in exclude
+        ]
+
+        promoted = []
+        while remaining:
+            exact = [reference for reference in remaining if reference[2] == deleted_digest]
+            promoted_id, _, _, _, text, metadata = (exact or remaining)[0]
+            self._conn.execute(
+                "UPDATE chunks SET canonical_id = NULL, text = NULL, metadata = NULL WHERE chunk_id = ?", (promoted_id,)
+            )
+            self._counts["promoted"] += 1
+            promoted.append((promoted_id, text, json.loads(metadata)))
+
+            # Each reference must be within max_distance of the chunk it points at, not just of the deleted one
+            unmatched = []
+            for reference in remaining:
+                if reference[0] == promoted_id:
+                    continue
+                fingerprint = reference[3] & ((1 << 64) - 1) if reference[3] is not None else None
+                match, _ = self._find(reference[1], reference[2], fingerprint)
+                if match is None:
+                    unmatched.append(reference)
+                else:
+                    self._conn.execute("UPDATE chunks SET canonical_id = ? WHERE chunk_id = ?", (match, reference[0]))
+            remaining = unmatched
+        return promoted
+
+    def _insert(
+        self,
+        chunk_id: str,
+        scope: str,
+        digest: bytes,
+        fingerprint: Optional[int],
+        canonical_id: Optional[str] = None,
+        text: Optional[str] = None,
+        metadata: Optional[Dict[str, Any]] = None
+    ) -> None:
+        """
+        Record a stored chunk, or a reference with its text and metadata. Caller holds the lock.
+        """
+        bands = _bands(fingerprint) if fingerprint is not None else [None] * _BANDS
+        self._conn.execute(
+            f"INSERT OR REPLACE INTO chunks VALUES ({', '.join('?' * (_BANDS + 8))})",
+            (
+                chunk_id, scope, digest, _signed(fingerprint) if fingerprint is not None else None, *bands,
+                canonical_id, (metadata or {}).get("doc_id"),
+                text if canonical_id else None,
+                json.dumps(metadata) if canonical_id else None,
+            )
+        )
+
+    def lookup(self, texts: List[str], metadatas: List[Dict[str, Any]]) -> List[bool]:
+        """
+        Get, for each chunk, whether it duplicates a stored chunk or an identical chunk
+        earlier in the list, without recording anything. Chunks found here will be
+        linked by assign() unless the index changes in between, so they need no embedding.
+        """
+        found = []
+        seen = set()
+        with self._lock:
+            for text, metadata in zip(texts, metadatas):
+                key = (_scope(metadata), content_hash(text))
+                found.append(key in seen or self._find(key[0], key[1], simhash(text))[0] is not None)
+                seen.add(key)
+        return found
+
+    def assign(
+        self,
+        ids: List[str],
+        texts: List[str],
+        metadatas: List[Dict[str, Any]],
+        link: bool = True
+    ) -> Dict[str, Any]:
+        """
+        Record chunks about to be written, replacing any recorded under the same ids.
+        Returns a dict with:
+          - "canonical": for each chunk, the stored chunk it is linked to, or None if it must be stored
+          - "unstored": ids whose earlier version was stored but which are now references
+          - "promoted": (chunk id, text, metadata) of references that must now be stored
+        With link=False every chunk is stored, and only earlier versions are forgotten.
+        """
+        digests = [content_hash(text) for text in texts]
+        scopes = [_scope(metadata) for metadata in metadatas]
+        canonical: List[Optional[str]] = [None] * len(ids)
+        unstored: List[str] = []
+        promoted: List[Tuple[str, str, Dict[str, Any]]] = []
+
+        with self._lock:
+            previous: Dict[str, Tuple[str, bytes]] = {}
+            stored_before = set()
+            for start in range(0, len(ids), _SQL_BATCH):
+                batch = ids[start:start + _SQL_BATCH]
+                rows = self._conn.execute(
+                    "SELECT chunk_id, scope, content_hash, canonical_id FROM chunks "
+                    f"WHERE chunk_id IN ({','.join('?' * len(batch))})",
+                    batch
+                ).fetchall()
+                for chunk_id, scope, digest, canonical_id in rows:
+                    previous[chunk_id] = (scope, digest)
+                    if canonical_id is None:
+                        stored_before.add(chunk_id)
+
+            # Chunks whose text is unchanged keep their place; the rest are forgotten first
+            kept = {
+                chunk_id for chunk_id, scope, digest in zip(ids, scopes, digests)
+                if link and previous.get(chunk_id) == (scope, digest)
+            }
+            changed = {chunk_id for chunk_id in previous if chunk_id not in kept}
+            for chunk_id in changed:
+                promoted.extend(self._forget(chunk_id, exclude=changed))
+
+            for i, (chunk_id, text, metadata) in enumerate(zip(ids, texts, metadatas)):
+                if chunk_id in kept:
+                    row = self._conn.execute("SELECT canonical_id FROM chunks WHERE chunk_id = ?", (chunk_id,)).fetchone()
+                    canonical[i] = row[0]
+                    if row[0] is not None:
+                        self._conn.execute(
+                            "UPDATE chunks SET doc_id = ?, text = ?, metadata = ? WHERE chunk_id = ?",
+                            (metadata.get("doc_id"), text, json.dumps(metadata), chunk_id)
+                        )
+                    continue
+                if not link:
+                    continue
+
+                fingerprint = simhash(text)
+                match, exact = self._find(scopes[i], digests[i], fingerprint)
+                self._insert(chunk_id, scopes[i], digests[i], fingerprint, match, text, metadata)
+                if match is not None:
+                    canonical[i] = match
+                    self._counts["exact" if exact else "near"] += 1
+                    if chunk_id in stored_before:
+                        unstored.append(chunk_id)
+            self._conn.commit()
+
+        # Chunks of this batch that were promoted are written with it anyway
+        batch_ids = set(ids)
+        promoted = [chunk for chunk in promoted if chunk[0] not in batch_ids]
+        return {"canonical": canonical, "unstored": unstored, "promoted": promoted}
+
+    def release(self, ids: List[str]) -> List[Tuple[str, str, Dict[str, Any]]]:
+        """
+        Forget deleted chunks. Returns the references promoted in place of deleted
+        stored chunks, as (chunk id, text, metadata), which must now be stored.
+        """
+        released = set(ids)
+        with self._lock:
+            promoted = []
+            for chunk_id in released:
+                promoted.extend(self._forget(chunk_id, exclude=released))
+            self._conn.commit()
+        return promoted
+
+    def references(
+        self,
+        where: Optional[Dict[str, Any]] = None,
+        ids: Optional[List[str]] = None
+    ) -> List[Tuple[str, str, Dict[str, Any]]]:
+        """
+        Get the references matching a where filter and/or ids as (chunk id, text, metadata).
+        The metadata includes "duplicate_of", the id of the stored chunk.
+        """
+        doc_id = _filtered_doc_id(where)
+        with self._lock:
+            if ids is not None:
+                rows = []
+                for start in range(0, len(ids), _SQL_BATCH):
+                    batch = ids[start:start + _SQL_BATCH]
+                    rows.extend(self._conn.execute(
+                        "SELECT chunk_id, text, metadata, canonical_id FROM chunks "
+                        f"WHERE canonical_id IS NOT NULL AND chunk_id IN ({','.join('?' * len(batch))})",
+                        batch
+                    ).fetchall())
+            elif doc_id is not None:
+                rows = self._conn.execute(
+                    "SELECT chunk_id, text, metadata, canonical_id FROM chunks WHERE canonical_id IS NOT NULL AND doc_id = ?",
+                    (doc_id,)
+                ).fetchall()
+            else:
+                rows = self._conn.execute(
+                    "SELECT chunk_id, text, metadata, canonical_id FROM chunks WHERE canonical_id IS NOT NULL"
+                ).fetchall()
+
+        references = []
+        for chunk_id, text, metadata, canonical_id in rows:
+            metadata = json.loads(metadata)
+            if matches_where(metadata, where):
+                references.append((chunk_id, text, dict(metadata, duplicate_of=canonical_id)))
+        return references
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get how many chunks are stored and linked, and what this process linked and promoted.
+        """
+        with self._lock:
+            stored, linked = self._conn.execute(
+                "SELECT COUNT(*) - COUNT(canonical_id), COUNT(canonical_id) FROM chunks"
+            ).fetchone()
+            return {
+                "enabled": DEDUP_ENABLED,
+                "max_distance": self.max_distance,
+                "stored_chunks": stored,
+                "linked_chunks": linked,
+                "exact_duplicates": self._counts["exact"],
+                "near_duplicates": self._counts["near"],
+                "promoted": self._counts["promoted"],
+            }
+
+    def close(self) -> None:
+        """
+        Close the database connection.
+        """
+        with self._lock:
+            self._conn.close()
+
+_indexes: Dict[str, DedupIndex] = {}
+_index_lock = threading.Lock()
+
+def get_dedup_index(path: str = DEDUP_INDEX_PATH) -> DedupIndex:
+    """
+    Get the shared dedup index stored at path (DEDUP_INDEX_PATH by default), opening it on first use.
+    """
+    with _index_lock:
+        if path not in _indexes:
+            _indexes[path] = DedupIndex(path)
+        return _indexes[path]
+
+def close_dedup_index(path: Optional[str] = None) -> None:
+    """
+    Close the dedup index stored at path, or every index if no path is given.
+    """
+    with _index_lock:
+        paths = [path] if path is not None else list(_indexes)
+        for index_path in paths:
+            index = _indexes.pop(index_path, None)
+            if index is not None:
+                index.close()
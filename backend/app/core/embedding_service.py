@@ -0,0 +1,217 @@
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from dotenv import load_dotenv
+from langchain_core.embeddings import Embeddings
+
+from core.embedding_cache import EmbeddingCache
+
+# Load environment variables
+load_dotenv()
+
+# Largest number of texts sent to the model in one forward pass
+EMBEDDING_MAX_BATCH_SIZE = int(os.getenv("EMBEDDING_MAX_BATCH_SIZE", "64"))
+
+# Longest time the first request in a batch waits for others to join it
+EMBEDDING_MAX_WAIT_MS = float(os.getenv("EMBEDDING_MAX_WAIT_MS", "5"))
+
+# Number of recent batches kept for the metrics
+_METRICS_WINDOW = 1000
+
+class BatchingEmbeddings(Embeddings):
+    """
+    Embeddings that merge concurrent embed_query/embed_documents calls into
+    micro-batches, so requests arriving together share one forward pass.
+
+    A background thread takes the first waiting request, then keeps adding
+    requests until the batch holds max_batch_size texts or max_wait_ms has
+    passed, and runs the wrapped model once for all of them.
+
+    If a cache is given, texts already embedded with model_name are served
+    from it and only the misses are sent to the model.
+    """
+
+    def __init__(
+        self,
+        model: Embeddings,
+        max_batch_size: int = EMBEDDING_MAX_BATCH_SIZE,
+        max_wait_ms: float = EMBEDDING_MAX_WAIT_MS,
+        model_name: str = "",
+        cache: Optional[EmbeddingCache] = None
+    ):
+        self.model = model
+        self.model_name = model_name
+        self.cache = cache
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue: "queue.Queue" = queue.Queue()
+        # Guards _closed, so nothing is queued after the stop sentinel
+        self._submit_lock = threading.Lock()
+        self._closed = False
+        self._metrics_lock = threading.Lock()
+        self._batch_sizes: deque = deque(maxlen=_METRICS_WINDOW)
+        self._queue_latencies: deque = deque(maxlen=_METRICS_WINDOW)
+        self._total_batches = 0
+        self._total_texts = 0
+        self._thread = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+        self._thread.start()
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """
+        Embed texts, returning a float32 array with one row per text.
+        """
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+
+        if self.cache is None:
+            return self._submit(texts)
+
+        # Only embed the texts the cache does not have
+        vectors = self.cache.get_many(self.model_name, texts)
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            missing_texts = [texts[i] for i in missing]
+            computed = self._submit(missing_texts)
+            self.cache.put_many(self.model_name, missing_texts, computed)
+            for i, vector in zip(missing, computed):
+                vectors[i] = vector
+
+        return np.vstack(vectors)
+
+    def _submit(self, texts: List[str]) -> np.ndarray:
+        """
+        Queue texts for the next batch and wait for their embeddings.
+        Raises RuntimeError once the service is closed.
+        """
+        future: Future = Future()
+        with self._submit_lock:
+            if self._closed:
+                raise RuntimeError("Embedding service is closed")
+            self._queue.put((list(texts), future, time.perf_counter()))
+        return future.result()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed documents through the batch queue.
+        """
+        return self.encode(texts).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        """
+        Embed a query through the batch queue.
+        """
+        return self.encode([text])[0].tolist()
+
+    def _next_batch(self, first):
+        """
+        Collect requests after the first one until the batch is full or the wait is over.
+        Returns the batch and whether the service was asked to stop.
+        """
+        batch = [first]
+        size = len(first[0])
+        deadline = time.perf_counter() + self.max_wait
+
+        while size < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                return batch, True
+            batch.append(item)
+            size += len(item[0])
+
+        return batch, False
+
+    def _run(self) -> None:
+        """
+        Batch loop run by the background thread.
+        """
+        stopping = False
+        while not stopping:
+            first = self._queue.get()
+            if first is None:
+                break
+
+            batch, stopping = self._next_batch(first)
+            texts = [text for item in batch for text in item[0]]
+            started = time.perf_counter()
+
+            try:
+                vectors = np.asarray(self.model.embed_documents(texts), dtype=np.float32)
+            except Exception as e:
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+
+            # Hand each request its own rows
+            offset = 0
+            for item_texts, future, _ in batch:
+                future.set_result(vectors[offset:offset + len(item_texts)])
+                offset += len(item_texts)
+
+            with self._metrics_lock:
+                self._total_batches += 1
+                self._total_texts += len(texts)
+                self._batch_sizes.append(len(texts))
+                self._queue_latencies.extend(started - enqueued for _, _, enqueued in batch)
+
+        # Nothing should be left after the sentinel, but never leave a caller waiting
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                item[1].set_exception(RuntimeError("Embedding service is closed"))
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get batch-size and queue-latency metrics over recent batches.
+        """
+        with self._metrics_lock:
+            sizes = np.array(self._batch_sizes, dtype=np.float64)
+            latencies = np.array(self._queue_latencies, dtype=np.float64) * 1000
+            total_batches = self._total_batches
+            total_texts = self._total_texts
+
+        stats = {
+            "total_batches": total_batches,
+            "total_texts": total_texts,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "pending_requests": self._queue.qsize(),
+        }
+        if len(sizes):
+            stats["batch_size"] = {
+                "mean": float(sizes.mean()),
+                "p50": float(np.percentile(sizes, 50)),
+                "max": float(sizes.max()),
+            }
+            stats["queue_latency_ms"] = {
+                "mean": float(latencies.mean()),
+                "p50": float(np.percentile(latencies, 50)),
+                "p95": float(np.percentile(latencies, 95)),
+                "max": float(latencies.max()),
+            }
+        return stats
+
+    def close(self) -> None:
+        """
+        Stop the batch thread once queued requests are done. Later encode calls raise RuntimeError.
+        """
+        with self._submit_lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(None)
+        self._thread.join(timeout=5)
@@ -1,15 +1,22 @@
+import hashlib
+import json
 import os
+import threading
 import uuid
 from dotenv import load_dotenv
+from langchain_core.documents import Document
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_community.document_loaders import (
     TextLoader,
     PyPDFLoader,
     Docx2txtLoader,
     UnstructuredHTMLLoader
 )
-from langchain_community.vectorstores import Chroma
+
+from core import metrics, registry
+from core.bm25 import BM25Index, get_bm25_index
+from core.dedup import DEDUP_ENABLED, DedupIndex, get_dedup_index
+from core.tenants import dedup_index_path, domain_directory, keyword_index_path, loaded_domains, normalize_domain
 
 # Load environment variables
 load_dotenv()
@@ -17,6 +24,16 @@ load_dotenv()
 # Set up global variables
 CHROMA_PERSIST_DIRECTORY = os.getenv("CHROMA_PERSIST_DIRECTORY", "./chroma_db")
 COLLECTION_NAME = "arun_jayesh_assistant"
+EMBEDDING_MODEL_NAME = os.getenv("EMBEDDING_MODEL_NAME", "all-MiniLM-L6-v2")
+
+# Vector store backend: "chroma" (default) or "numpy" for the in-process index
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "chroma")
+
+# Chunks embedded and written per batch
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "64"))
+
+# Characters read at a time from text files
+STREAM_BLOCK_SIZE = 64 * 1024
 
 # File type to loader mapping
 LOADER_MAPPING = {
@@ -27,23 +44,61 @@ LOADER_MAPPING = {
     ".htm": UnstructuredHTMLLoader,
 }
 
-def get_vectorstore():
+# Bumped on every write so caches built from the collection can tell they are stale
+_collection_version = 0
+_collection_listeners = []
+_version_lock = threading.Lock()
+
+def get_collection_version():
     """
-    Get or create a Chroma vector store.
+    Get a counter that changes whenever the collection is written to.
     """
-    # Create embeddings using HuggingFace model
-    embeddings = HuggingFaceEmbeddings(
-        model_name="all-MiniLM-L6-v2"
-    )
-    
-    # Create or get persistent vector store
-    vectorstore = Chroma(
-        persist_directory=CHROMA_PERSIST_DIRECTORY,
-        embedding_function=embeddings,
-        collection_name=COLLECTION_NAME
-    )
-    
-    return vectorstore
+    return _collection_version
+
+def on_collection_change(callback):
+    """
+    Register a callback run after every write to the collection.
+    """
+    _collection_listeners.append(callback)
+
+def mark_collection_changed():
+    """
+    Bump the collection version and notify listeners.
+    """
+    global _collection_version
+    with _version_lock:
+        _collection_version += 1
+    for callback in _collection_listeners:
+        callback()
+
+def get_vectorstore(domain=None):
+    """
+    Get the shared vector store of a domain (the default one if None) for the configured backend.
+    The embedding model and client are built once per process by the registry;
+    a domain's store is opened on first use and closed again when it goes cold.
+    """
+    with metrics.stage("get_vectorstore"):
+        loaded_domains.touch(domain)
+        return registry.get_vectorstore(
+            collection_name=COLLECTION_NAME,
+            model_name=EMBEDDING_MODEL_NAME,
+            persist_directory=domain_directory(domain),
+            backend=VECTOR_BACKEND
+        )
+
+def get_keyword_index(domain=None) -> BM25Index:
+    """
+    Get the keyword index of a domain (the default one if None).
+    """
+    loaded_domains.touch(domain)
+    return get_bm25_index(keyword_index_path(domain))
+
+def get_domain_dedup_index(domain=None) -> DedupIndex:
+    """
+    Get the dedup index of a domain (the default one if None).
+    """
+    loaded_domains.touch(domain)
+    return get_dedup_index(dedup_index_path(domain))
 
 def get_document_loader(file_path):
     """
@@ -61,66 +116,364 @@ def get_document_loader(file_path):
     # Return loader instance
     return loader_class(file_path)
 
-def embed_document(text=None, file_path=None, metadata=None):
+def get_text_splitter():
+    """
+    Get the text splitter used for all documents.
+    """
+    return RecursiveCharacterTextSplitter(
+        chunk_size=1000,
+        chunk_overlap=200
+    )
+
+def _iter_text_file(file_path, text_splitter):
+    """
+    Split a text file into chunk texts while reading it in blocks.
+    The last chunk of each block is held back and split again with the next
+    block, so chunks do not end at block boundaries.
+    """
+    remainder = ""
+    with open(file_path, encoding="utf-8", errors="replace") as f:
+        while True:
+            with metrics.stage("ingest_load"):
+                block = f.read(STREAM_BLOCK_SIZE)
+            if not block:
+                break
+            buffer = remainder + block
+            with metrics.stage("ingest_split"):
+                chunks = text_splitter.split_text(buffer)
+            if not chunks:
+                remainder = buffer
+                continue
+            # Chunks are stripped, so carry the raw text from the last chunk on
+            remainder = buffer[buffer.rfind(chunks.pop()):]
+            yield from chunks
+    if remainder.strip():
+        yield from text_splitter.split_text(remainder)
+
+def iter_document_chunks(text=None, file_path=None, metadata=None, load_pages=None):
     """
-    Embed a document into the vector store.
+    Load a document and yield its chunks one at a time, carrying the given metadata.
+    Text files are read in blocks and other files page by page where the loader
+    supports it, so large files are never held in memory whole.
+    load_pages(file_path) can replace the loader for non-text files, e.g. to parse in a process pool.
     Either text or file_path must be provided.
     """
-    # Initialize metadata if not provided
     if metadata is None:
         metadata = {}
     
-    # Generate document ID
-    doc_id = str(uuid.uuid4())
-    metadata["doc_id"] = doc_id
-    
-    # Get documents
-    documents = []
+    text_splitter = get_text_splitter()
     
     if text:
-        # Create text splitter
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=200
-        )
-        
-        # Split text into chunks
-        chunks = text_splitter.split_text(text)
-        
-        # Create documents
-        documents = [{"page_content": chunk, "metadata": metadata} for chunk in chunks]
+        with metrics.stage("ingest_split"):
+            documents = text_splitter.create_documents([text], metadatas=[metadata])
+        yield from documents
+        return
     
-    elif file_path:
-        # Get loader
-        loader = get_document_loader(file_path)
-        
-        # Load documents
-        loaded_docs = loader.load()
+    if file_path:
+        if os.path.splitext(file_path)[1].lower() == ".txt":
+            for chunk in _iter_text_file(file_path, text_splitter):
+                yield Document(page_content=chunk, metadata={"source": file_path, **metadata})
+            return
         
-        # Create text splitter
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=200
+        # Loaders yield one document per page (PDF) or per file (DOCX, HTML)
+        pages = load_pages(file_path) if load_pages else get_document_loader(file_path).lazy_load()
+        for page in metrics.timed_iter(pages, "ingest_load"):
+            with metrics.stage("ingest_split"):
+                documents = text_splitter.split_documents([page])
+            for doc in documents:
+                doc.metadata.update(metadata)
+                yield doc
+        return
+    
+    raise ValueError("Either text or file_path must be provided")
+
+def split_document(text=None, file_path=None, metadata=None):
+    """
+    Load a document and split it into chunks carrying the given metadata.
+    Either text or file_path must be provided.
+    """
+    return list(iter_document_chunks(text=text, file_path=file_path, metadata=metadata))
+
+def batched(iterable, size):
+    """
+    Yield lists of up to size items from an iterable.
+    """
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def chunk_ids(doc_id, start, count):
+    """
+    Get the vector store ids for chunks start..start+count of a document.
+    """
+    return [f"{doc_id}:{i}" for i in range(start, start + count)]
+
+def _write_chunks(vectorstore, domain, ids, texts, metadatas, embeddings=None):
+    """
+    Upsert chunks into a domain's vector store and keyword index.
+    Missing embeddings (None, or all of them) are computed with the shared model.
+    """
+    if not ids:
+        return
+    
+    if embeddings is None:
+        embeddings = [None] * len(ids)
+    missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+    if missing:
+        embeddings = list(embeddings)
+        with metrics.stage("ingest_embed"):
+            computed = vectorstore.embeddings.embed_documents([texts[i] for i in missing])
+        for i, embedding in zip(missing, computed):
+            embeddings[i] = embedding
+    
+    with metrics.stage("ingest_write"):
+        vectorstore._collection.upsert(
+            ids=ids,
+            embeddings=embeddings,
+            documents=texts,
+            metadatas=metadatas
         )
         
-        # Split documents
-        documents = text_splitter.split_documents(loaded_docs)
-        
-        # Add metadata to each document
-        for doc in documents:
-            doc.metadata.update(metadata)
+        # Keep the keyword index in sync
+        get_keyword_index(domain).add(ids, texts)
+
+def _write_promoted(vectorstore, domain, promoted):
+    """
+    Store the references promoted in place of deleted or replaced chunks.
+    """
+    if promoted:
+        ids, texts, metadatas = (list(column) for column in zip(*promoted))
+        _write_chunks(vectorstore, domain, ids, texts, metadatas)
+
+def find_duplicates(texts, metadatas, domain=None):
+    """
+    Get, for each chunk, whether add_chunks would link it to a chunk already stored
+    in a domain (or to an identical one earlier in the list) instead of storing it.
+    Callers that embed elsewhere use this to embed only the other chunks.
+    """
+    if not DEDUP_ENABLED:
+        return [False] * len(texts)
+    with metrics.stage("ingest_dedup"):
+        return get_domain_dedup_index(domain).lookup(texts, metadatas)
+
+def embed_unique(texts, metadatas, embed, domain=None):
+    """
+    Embed only the chunks find_duplicates does not report, with embed(texts).
+    Returns one embedding per chunk, None for the duplicates, ready for add_chunks.
+    """
+    duplicates = find_duplicates(texts, metadatas, domain)
+    unique = [text for text, duplicate in zip(texts, duplicates) if not duplicate]
+    embedded = iter(embed(unique) if unique else [])
+    return [None if duplicate else next(embedded) for duplicate in duplicates]
+
+def add_chunks(ids, texts, metadatas, embeddings=None, domain=None):
+    """
+    Write chunks to a domain's vector store, replacing any chunks with the same ids.
+    Chunks whose text is already stored, exactly or nearly, are only linked to
+    the stored chunk in the dedup index, so they are neither embedded nor written.
+    Embeddings that are not given, or None, are computed with the shared model,
+    so callers that embed elsewhere can skip duplicates with embed_unique.
+    """
+    if not ids:
+        return
+    
+    vectorstore = get_vectorstore(domain)
+    
+    with metrics.stage("ingest_dedup"):
+        plan = get_domain_dedup_index(domain).assign(ids, texts, metadatas, link=DEDUP_ENABLED)
+    keep = [i for i, canonical in enumerate(plan["canonical"]) if canonical is None]
+    if len(keep) < len(ids):
+        ids = [ids[i] for i in keep]
+        texts = [texts[i] for i in keep]
+        metadatas = [metadatas[i] for i in keep]
+        if embeddings is not None:
+            embeddings = [embeddings[i] for i in keep]
+    
+    # Chunks that were stored before and are now linked drop their own vectors
+    if plan["unstored"]:
+        vectorstore._collection.delete(ids=plan["unstored"])
+        get_keyword_index(domain).remove(plan["unstored"])
+    
+    _write_chunks(vectorstore, domain, ids, texts, metadatas, embeddings)
+    _write_promoted(vectorstore, domain, plan["promoted"])
+    
+    mark_collection_changed()
+
+def delete_chunks(ids=None, where=None, domain=None):
+    """
+    Delete chunks from a domain's vector store by id or by metadata filter,
+    including chunks stored by reference. A deleted chunk that others were
+    linked to is replaced by one of them.
+    """
+    if not ids and not where:
+        return
     
-    else:
-        raise ValueError("Either text or file_path must be provided")
+    vectorstore = get_vectorstore(domain)
+    dedup_index = get_domain_dedup_index(domain)
     
-    # Get vector store
-    vectorstore = get_vectorstore()
+    # Resolve the filter to ids so the keyword and dedup indexes can drop the same chunks
+    if where:
+        matched = vectorstore._collection.get(where=where, include=[])["ids"]
+        matched += [chunk_id for chunk_id, _, _ in dedup_index.references(where=where)]
+        ids = list(set(ids or []) & set(matched)) if ids else matched
+    if not ids:
+        return
     
-    # Add documents to vector store
-    vectorstore.add_documents(documents)
+    promoted = dedup_index.release(ids)
+    vectorstore._collection.delete(ids=ids)
+    get_keyword_index(domain).remove(ids)
+    _write_promoted(vectorstore, domain, promoted)
     
-    # Persist vector store
-    if hasattr(vectorstore, "_persist"):
-        vectorstore._persist()
+    mark_collection_changed()
+
+def delete_document(doc_id, domain=None):
+    """
+    Delete every chunk of a document from a domain's vector store.
+    """
+    delete_chunks(where={"doc_id": doc_id}, domain=domain)
+
+def get_chunks(where=None, include_documents=False, domain=None, ids=None):
+    """
+    Get the ids and metadata (and optionally text) of chunks matching a filter and/or ids.
+    Chunks stored by reference are included, with the id of the stored chunk as "duplicate_of".
+    """
+    include = ["metadatas", "documents"] if include_documents else ["metadatas"]
+    results = get_vectorstore(domain)._collection.get(ids=ids, where=where, include=include)
+    for chunk_id, text, metadata in get_domain_dedup_index(domain).references(where=where, ids=ids):
+        results["ids"].append(chunk_id)
+        results["metadatas"].append(metadata)
+        if include_documents:
+            results["documents"].append(text)
+    return results
+
+def ensure_keyword_index(batch_size=1000, domain=None):
+    """
+    Bring the keyword index in line with the vector store: index chunks it is missing,
+    e.g. for databases created before the index existed or written while it was not
+    saved, and drop chunks no longer stored. Returns counts of chunks added and removed.
+    """
+    index = get_keyword_index(domain)
+    collection = get_vectorstore(domain)._collection
+    stored = set(collection.get(include=[])["ids"])
+    indexed = index.ids()
+    
+    stale = list(indexed - stored)
+    if stale:
+        index.remove(stale)
+    missing = list(stored - indexed)
+    for batch_ids in batched(missing, batch_size):
+        batch = collection.get(ids=batch_ids, include=["documents"])
+        index.add(batch["ids"], batch["documents"])
+    return {"added": len(missing), "removed": len(stale)}
+
+def deduplicate_stored_chunks(batch_size=1000, domain=None):
+    """
+    Link chunks stored before they were recorded in the dedup index, e.g. before it
+    existed or while it was disabled, to stored chunks with the same or nearly the
+    same text, and remove their vectors. Returns counts of chunks scanned and linked.
+    """
+    vectorstore = get_vectorstore(domain)
+    collection = vectorstore._collection
+    dedup_index = get_domain_dedup_index(domain)
+    
+    scanned = 0
+    linked = 0
+    for batch_ids in batched(collection.get(include=[])["ids"], batch_size):
+        batch = collection.get(ids=batch_ids, include=["documents", "metadatas"])
+        plan = dedup_index.assign(batch["ids"], batch["documents"], [metadata or {} for metadata in batch["metadatas"]])
+        # Every chunk here has a vector, so each one now linked drops it
+        unstored = [chunk_id for chunk_id, canonical in zip(batch["ids"], plan["canonical"]) if canonical is not None]
+        if unstored:
+            collection.delete(ids=unstored)
+            get_keyword_index(domain).remove(unstored)
+        _write_promoted(vectorstore, domain, plan["promoted"])
+        scanned += len(batch["ids"])
+        linked += len(unstored)
+    
+    if linked:
+        mark_collection_changed()
+    return {"scanned": scanned, "linked": linked}
+
+def _chunk_hash(text, metadata):
+    """
+    Hash a chunk's text and metadata, so unchanged chunks can be skipped on re-index.
+    """
+    payload = json.dumps({"text": text, "metadata": metadata}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def sync_document(doc_id, text, metadata=None):
+    """
+    Make the stored chunks of a document match the given text.
+    Chunk ids are deterministic, so only new or changed chunks are embedded
+    and written, and chunks past the new end of the document are deleted.
+    Returns the number of chunks written and deleted.
+    """
+    # Initialize metadata if not provided
+    if metadata is None:
+        metadata = {}
+    metadata["doc_id"] = doc_id
+    
+    # Split into chunks and hash each one
+    documents = split_document(text=text, metadata=metadata)
+    ids = chunk_ids(doc_id, 0, len(documents))
+    for doc in documents:
+        doc.metadata["chunk_hash"] = _chunk_hash(doc.page_content, metadata)
+    
+    # Compare with what is stored
+    existing = get_chunks(where={"doc_id": doc_id})
+    stored_hashes = {
+        chunk_id: (chunk_metadata or {}).get("chunk_hash")
+        for chunk_id, chunk_metadata in zip(existing["ids"], existing["metadatas"])
+    }
+    changed = [
+        i for i, (chunk_id, doc) in enumerate(zip(ids, documents))
+        if stored_hashes.get(chunk_id) != doc.metadata["chunk_hash"]
+    ]
+    current_ids = set(ids)
+    removed = [chunk_id for chunk_id in stored_hashes if chunk_id not in current_ids]
+    
+    # Write changed chunks and delete stale ones
+    add_chunks(
+        ids=[ids[i] for i in changed],
+        texts=[documents[i].page_content for i in changed],
+        metadatas=[documents[i].metadata for i in changed]
+    )
+    delete_chunks(ids=removed)
+    
+    return {"written": len(changed), "deleted": len(removed)}
+
+def embed_document(text=None, file_path=None, metadata=None, doc_id=None):
+    """
+    Embed a document into the vector store, INGEST_BATCH_SIZE chunks at a time.
+    The document goes into the collection of metadata["domain"], if set.
+    Either text or file_path must be provided.
+    """
+    # Initialize metadata if not provided
+    if metadata is None:
+        metadata = {}
+    domain = normalize_domain(metadata.get("domain"))
+    if domain is not None:
+        metadata["domain"] = domain
+    
+    # Generate document ID
+    if doc_id is None:
+        doc_id = str(uuid.uuid4())
+    metadata["doc_id"] = doc_id
+    
+    # Embed and write chunks in batches as the document is read
+    position = 0
+    for batch in batched(iter_document_chunks(text=text, file_path=file_path, metadata=metadata), INGEST_BATCH_SIZE):
+        add_chunks(
+            ids=chunk_ids(doc_id, position, len(batch)),
+            texts=[doc.page_content for doc in batch],
+            metadatas=[doc.metadata for doc in batch],
+            domain=domain
+        )
+        position += len(batch)
     
-    return doc_id 
\ No newline at end of file
+    return doc_id
@@ -0,0 +1,234 @@
+import multiprocessing
+import os
+import threading
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from dotenv import load_dotenv
+
+from core import metrics, registry
+from core.bulk_ingest import ingest_source
+from core.embeddings import (
+    EMBEDDING_MODEL_NAME,
+    INGEST_BATCH_SIZE,
+    add_chunks,
+    batched,
+    chunk_ids,
+    embed_unique,
+    iter_document_chunks,
+)
+from core.parsing import parse_document
+from core.tenants import normalize_domain
+
+# Load environment variables
+load_dotenv()
+
+# Worker processes for embedding, and for parsing files during bulk ingestion
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "2"))
+
+# Jobs that run at the same time; the rest wait in the queue
+INGEST_CONCURRENT_JOBS = int(os.getenv("INGEST_CONCURRENT_JOBS", "2"))
+
+# Maximum number of queued and running jobs before new uploads are refused
+INGEST_MAX_QUEUE = int(os.getenv("INGEST_MAX_QUEUE", "16"))
+
+# Times a failed job is retried before it is marked as failed
+INGEST_MAX_RETRIES = int(os.getenv("INGEST_MAX_RETRIES", "2"))
+
+# Finished jobs kept for status lookups
+INGEST_JOB_HISTORY = 1000
+
+_lock = threading.Lock()
+_jobs: Dict[str, Dict[str, Any]] = {}
+_process_pool: Optional[ProcessPoolExecutor] = None
+_job_runner = ThreadPoolExecutor(max_workers=INGEST_CONCURRENT_JOBS, thread_name_prefix="ingest")
+
+class QueueFullError(Exception):
+    """
+    Raised when the ingestion queue has no room for another job.
+    """
+
+def _get_process_pool() -> ProcessPoolExecutor:
+    """
+    Get the worker process pool, starting it on first use.
+    """
+    global _process_pool
+    with _lock:
+        if _process_pool is None:
+            # Spawn rather than fork so workers do not inherit torch and Chroma threads
+            _process_pool = ProcessPoolExecutor(
+                max_workers=INGEST_WORKERS,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return _process_pool
+
+def _embed_texts(model_name: str, texts: List[str]) -> List[List[float]]:
+    """
+    Embed texts in a worker process. Each worker loads the model once.
+    """
+    return registry.get_embeddings(model_name).embed_documents(texts)
+
+def _update_job(job_id: str, **fields: Any) -> None:
+    """
+    Update a job's fields and timestamp.
+    """
+    with _lock:
+        _jobs[job_id].update(fields, updated_at=datetime.now().isoformat())
+
+def _prune_jobs() -> None:
+    """
+    Forget the oldest finished jobs beyond the history limit. Caller holds the lock.
+    """
+    finished = [job_id for job_id, job in _jobs.items() if job["status"] in ("completed", "failed")]
+    for job_id in finished[:max(0, len(finished) - INGEST_JOB_HISTORY)]:
+        del _jobs[job_id]
+
+def _traced(name: str, func, job_id: str, *args) -> None:
+    """
+    Run a job in its own trace, with the job ID as the trace ID.
+    """
+    with metrics.trace(name, trace_id=job_id):
+        func(job_id, *args)
+
+def _run_job(job_id: str, file_path: str, metadata: Dict[str, Any]) -> None:
+    """
+    Parse, split, embed and store a file, retrying on failure.
+    Batches are written as the file is parsed, so memory use does not grow
+    with the file. total_chunks is set once the whole file is stored.
+    Chunk ids are deterministic, so a retry resumes after the last written batch.
+    The file goes into the collection of metadata["domain"], if set.
+    """
+    job = _jobs[job_id]
+    doc_id = job["document_id"]
+    domain = normalize_domain(metadata.get("domain"))
+    pool = _get_process_pool()
+
+    try:
+        for attempt in range(1, INGEST_MAX_RETRIES + 2):
+            _update_job(job_id, status="running", attempts=attempt)
+            try:
+                # Pages are parsed in the parser pool and arrive in order; each
+                # batch of chunks is embedded in a worker and written before the next
+                chunks = iter_document_chunks(file_path=file_path, metadata=metadata, load_pages=parse_document)
+                start = 0
+                for batch in batched(chunks, INGEST_BATCH_SIZE):
+                    end = start + len(batch)
+                    if end > job["processed_chunks"]:
+                        batch = batch[max(0, job["processed_chunks"] - start):]
+                        texts = [doc.page_content for doc in batch]
+                        metadatas = [doc.metadata for doc in batch]
+                        # Chunks that are already stored are linked by add_chunks, so only the rest go to a worker
+                        with metrics.stage("ingest_embed"):
+                            embeddings = embed_unique(
+                                texts,
+                                metadatas,
+                                lambda unique: pool.submit(_embed_texts, EMBEDDING_MODEL_NAME, unique).result(),
+                                domain
+                            )
+                        add_chunks(
+                            ids=chunk_ids(doc_id, end - len(batch), len(batch)),
+                            texts=texts,
+                            metadatas=metadatas,
+                            embeddings=embeddings,
+                            domain=domain
+                        )
+                        _update_job(job_id, processed_chunks=end)
+                    start = end
+
+                _update_job(job_id, status="completed", total_chunks=job["processed_chunks"], error=None)
+                return
+            except Exception as e:
+                _update_job(job_id, error=str(e))
+
+        _update_job(job_id, status="failed")
+    finally:
+        os.unlink(file_path)
+
+def _create_job(document_id: Optional[str], filename: Optional[str]) -> Dict[str, Any]:
+    """
+    Register a queued job and return a snapshot of it.
+    Raises QueueFullError when INGEST_MAX_QUEUE jobs are already pending.
+    """
+    job_id = str(uuid.uuid4())
+    timestamp = datetime.now().isoformat()
+
+    with _lock:
+        pending = sum(1 for job in _jobs.values() if job["status"] in ("queued", "running"))
+        if pending >= INGEST_MAX_QUEUE:
+            raise QueueFullError(f"Ingestion queue is full ({pending} jobs pending)")
+
+        _prune_jobs()
+        _jobs[job_id] = {
+            "job_id": job_id,
+            "document_id": document_id,
+            "filename": filename,
+            "status": "queued",
+            "total_chunks": None,
+            "processed_chunks": 0,
+            "attempts": 0,
+            "error": None,
+            "summary": None,
+            "created_at": timestamp,
+            "updated_at": timestamp,
+        }
+        return dict(_jobs[job_id])
+
+def submit_file_job(file_path: str, metadata: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Queue a file for background ingestion and return the new job.
+    The job owns file_path and deletes it when done.
+    Raises QueueFullError when INGEST_MAX_QUEUE jobs are already pending.
+    """
+    doc_id = str(uuid.uuid4())
+    metadata["doc_id"] = doc_id
+    job = _create_job(doc_id, metadata.get("filename"))
+
+    _job_runner.submit(_traced, "ingest_job", _run_job, job["job_id"], file_path, metadata)
+    return job
+
+def _run_bulk_job(job_id: str, source: str, metadata: Dict[str, Any], owns_source: bool) -> None:
+    """
+    Ingest a directory or archive, keeping the job's summary up to date.
+    Unchanged files are skipped, so a failed bulk job can simply be submitted again.
+    """
+    def progress(summary):
+        _update_job(job_id, processed_chunks=summary["chunks"], summary=dict(summary))
+
+    try:
+        _update_job(job_id, status="running", attempts=1)
+        summary = ingest_source(source, _get_process_pool(), INGEST_WORKERS, metadata=metadata, progress=progress)
+        _update_job(job_id, status="completed", total_chunks=summary["chunks"], summary=summary)
+    except Exception as e:
+        _update_job(job_id, status="failed", error=str(e))
+    finally:
+        if owns_source:
+            os.unlink(source)
+
+def submit_bulk_job(source: str, metadata: Optional[Dict[str, Any]] = None, owns_source: bool = False) -> Dict[str, Any]:
+    """
+    Queue a directory, zip or tar archive for background bulk ingestion and return the new job.
+    If owns_source is set the job deletes the archive when done.
+    Raises QueueFullError when INGEST_MAX_QUEUE jobs are already pending.
+    """
+    job = _create_job(None, os.path.basename(source.rstrip(os.sep)))
+
+    _job_runner.submit(_traced, "bulk_ingest_job", _run_bulk_job, job["job_id"], source, metadata or {}, owns_source)
+    return job
+
+def get_job(job_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Get a snapshot of a job by ID.
+    """
+    with _lock:
+        job = _jobs.get(job_id)
+        return dict(job) if job else None
+
+def shutdown() -> None:
+    """
+    Stop the job runner and worker processes.
+    """
+    _job_runner.shutdown(wait=False, cancel_futures=True)
+    if _process_pool is not None:
+        _process_pool.shutdown(wait=False, cancel_futures=True)
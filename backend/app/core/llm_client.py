@@ -0,0 +1,432 @@
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Deque, Dict, List, Mapping, Optional, Tuple, Union
+
+import httpx
+from dotenv import load_dotenv
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun
+from langchain_core.outputs import GenerationChunk, LLMResult
+from langchain_ollama import OllamaLLM
+from ollama import AsyncClient
+from pydantic import PrivateAttr
+
+from core import metrics
+
+# Load environment variables
+load_dotenv()
+
+OLLAMA_HOST = os.getenv("OLLAMA_HOST", "http://localhost:11434")
+
+# How long Ollama keeps the model loaded after a request, e.g. "30m"; -1 keeps it loaded
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+
+# Generations sent to one Ollama server at a time; match the server's OLLAMA_NUM_PARALLEL
+OLLAMA_MAX_PARALLEL = int(os.getenv("OLLAMA_MAX_PARALLEL", os.getenv("OLLAMA_NUM_PARALLEL", "4")))
+
+# Pooled HTTP connections per Ollama server
+OLLAMA_MAX_CONNECTIONS = int(os.getenv("OLLAMA_MAX_CONNECTIONS", str(OLLAMA_MAX_PARALLEL * 2)))
+
+# Seconds to wait for Ollama to connect or send the next chunk; 0 waits forever
+OLLAMA_TIMEOUT = float(os.getenv("OLLAMA_TIMEOUT", "300"))
+
+# Load the chat model when the server starts instead of on the first question
+OLLAMA_PRELOAD = os.getenv("OLLAMA_PRELOAD", "true").lower() == "true"
+
+# Seconds of completed calls kept for latency percentiles
+LATENCY_WINDOW_SECONDS = float(os.getenv("LLM_LATENCY_WINDOW_SECONDS", "120"))
+
+DEFAULT_MODEL = "mistral"
+DEFAULT_TEMPERATURE = 0.7
+
+def parse_keep_alive(value: str) -> Union[int, str]:
+    """
+    Convert a keep_alive setting to what Ollama expects: a number of seconds or a duration like "30m".
+    """
+    try:
+        return int(value)
+    except ValueError:
+        return value
+
+class _HostState:
+    """
+    Concurrency limit and counters shared by every client of one Ollama server.
+    """
+
+    def __init__(self, max_parallel: int):
+        self.max_parallel = max_parallel
+        self.semaphore: Optional[asyncio.Semaphore] = None
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.lock = threading.Lock()
+        self.active = 0
+        self.waiting = 0
+        self.generations = 0
+        self.streams = 0
+        self.coalesced = 0
+        self.errors = 0
+        self.wait_seconds = 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get the counters.
+        """
+        with self.lock:
+            started = self.generations + self.streams
+            return {
+                "max_parallel": self.max_parallel,
+                "active": self.active,
+                "waiting": self.waiting,
+                "generations": self.generations,
+                "streams": self.streams,
+                "coalesced": self.coalesced,
+                "errors": self.errors,
+                "avg_wait_ms": round(self.wait_seconds / started * 1000, 1) if started else 0.0,
+            }
+
+class LatencyWindow:
+    """
+    Durations of the calls completed in the last LATENCY_WINDOW_SECONDS,
+    and the calls that failed.
+    """
+
+    def __init__(self, window_seconds: float = LATENCY_WINDOW_SECONDS):
+        self.window_seconds = window_seconds
+        self._samples: Deque[Tuple[float, float]] = deque()
+        self._errors: Deque[float] = deque()
+        self._consecutive_errors = 0
+        self._last_error = 0.0
+        self._lock = threading.Lock()
+
+    def _prune(self, now: float) -> None:
+        """
+        Drop samples and errors older than the window. Caller holds the lock.
+        """
+        while self._samples and self._samples[0][0] < now - self.window_seconds:
+            self._samples.popleft()
+        while self._errors and self._errors[0] < now - self.window_seconds:
+            self._errors.popleft()
+
+    def add(self, seconds: float) -> None:
+        """
+        Record a completed call.
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._samples.append((now, seconds))
+            self._consecutive_errors = 0
+            self._prune(now)
+
+    def add_error(self) -> None:
+        """
+        Record a failed call.
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._errors.append(now)
+            self._consecutive_errors += 1
+            self._last_error = now
+            self._prune(now)
+
+    def summary(self) -> Dict[str, float]:
+        """
+        Get the number of recent calls and their mean and 95th percentile duration in seconds,
+        the recent failures, the failures since the last completed call and the seconds since the last failure.
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._prune(now)
+            durations = sorted(seconds for _, seconds in self._samples)
+            errors = {
+                "errors": len(self._errors),
+                "consecutive_errors": self._consecutive_errors,
+                "since_error": now - self._last_error if self._last_error else float("inf"),
+            }
+        if not durations:
+            return {"count": 0, "mean": 0.0, "p95": 0.0, **errors}
+        return {
+            "count": len(durations),
+            "mean": sum(durations) / len(durations),
+            "p95": durations[min(len(durations) - 1, int(len(durations) * 0.95))],
+            **errors,
+        }
+
+_lock = threading.Lock()
+_hosts: Dict[str, _HostState] = {}
+_clients: Dict[Tuple[str, str, float], "PooledOllamaLLM"] = {}
+
+def _host_state(base_url: str) -> _HostState:
+    """
+    Get the shared state of an Ollama server.
+    """
+    with _lock:
+        if base_url not in _hosts:
+            _hosts[base_url] = _HostState(OLLAMA_MAX_PARALLEL)
+        return _hosts[base_url]
+
+class _Slot:
+    """
+    Holds one of an Ollama server's generation slots.
+    """
+
+    def __init__(self, state: _HostState, streaming: bool, latency: LatencyWindow):
+        self.state = state
+        self.streaming = streaming
+        self.latency = latency
+        self.semaphore: Optional[asyncio.Semaphore] = None
+        self.start_time = 0.0
+
+    async def __aenter__(self):
+        state = self.state
+        # Semaphores belong to one event loop; a new loop (e.g. in tests) gets a new one
+        loop = asyncio.get_running_loop()
+        if state.loop is not loop:
+            state.semaphore = asyncio.Semaphore(state.max_parallel)
+            state.loop = loop
+        with state.lock:
+            state.waiting += 1
+        self.start_time = time.perf_counter()
+        try:
+            self.semaphore = state.semaphore
+            await self.semaphore.acquire()
+        finally:
+            with state.lock:
+                state.waiting -= 1
+        waited = time.perf_counter() - self.start_time
+        metrics.observe("llm_slot_wait", waited, self.start_time)
+        with state.lock:
+            state.wait_seconds += waited
+            state.active += 1
+            if self.streaming:
+                state.streams += 1
+            else:
+                state.generations += 1
+
+    async def __aexit__(self, exc_type, exc, tb):
+        failed = exc_type is not None and not issubclass(exc_type, (asyncio.CancelledError, GeneratorExit))
+        # Latency includes the wait for the slot, which is what callers see
+        if exc_type is None:
+            self.latency.add(time.perf_counter() - self.start_time)
+        elif failed:
+            self.latency.add_error()
+        with self.state.lock:
+            self.state.active -= 1
+            if failed:
+                self.state.errors += 1
+        self.semaphore.release()
+
+class PooledOllamaLLM(OllamaLLM):
+    """
+    OllamaLLM for clients shared across requests.
+    Async calls reuse the client's pooled HTTP connections, wait for one of
+    the server's OLLAMA_MAX_PARALLEL generation slots instead of queueing
+    inside Ollama, and identical prompts already being generated share that
+    generation instead of starting another one. Streams are not shared.
+    """
+
+    _inflight: Dict[str, List[Any]] = PrivateAttr(default_factory=dict)
+    _latency: LatencyWindow = PrivateAttr(default_factory=LatencyWindow)
+    _loop: Optional[asyncio.AbstractEventLoop] = PrivateAttr(default=None)
+
+    @property
+    def _host(self) -> _HostState:
+        """The shared state of this client's Ollama server."""
+        return _host_state(self.base_url or OLLAMA_HOST)
+
+    @property
+    def latency(self) -> LatencyWindow:
+        """Durations of this client's recent calls."""
+        return self._latency
+
+    async def _bind_loop(self) -> None:
+        """
+        Connections and in-flight generations belong to one event loop;
+        give a new loop (e.g. a script calling asyncio.run twice) its own HTTP client
+        and close the old one's connections.
+        """
+        loop = asyncio.get_running_loop()
+        if self._loop is loop:
+            return
+        previous = self._loop
+        self._loop = loop
+        if previous is None:
+            return
+
+        old_client = self._async_client
+        self._async_client = AsyncClient(
+            host=self.base_url,
+            **{**(self.client_kwargs or {}), **(self.async_client_kwargs or {})}
+        )
+        self._inflight = {}
+        try:
+            await old_client._client.aclose()
+        except Exception:
+            # Its connections may belong to a loop that is already closed
+            pass
+
+    async def _acreate_generate_stream(
+        self,
+        prompt: str,
+        stop: Optional[List[str]] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[Union[Mapping[str, Any], str]]:
+        started = time.perf_counter()
+        first = True
+        async for part in super()._acreate_generate_stream(prompt, stop, **kwargs):
+            if first:
+                metrics.observe("llm_first_token", time.perf_counter() - started, started)
+                first = False
+            yield part
+        metrics.observe("llm_generation", time.perf_counter() - started, started)
+
+    def _prompt_key(self, prompt: str, stop: Optional[List[str]], kwargs: Dict[str, Any]) -> str:
+        """
+        Get the key identical generations are shared by.
+        """
+        payload = json.dumps([prompt, stop, kwargs], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    async def _agenerate_shared(
+        self,
+        prompt: str,
+        stop: Optional[List[str]],
+        run_manager: Optional[AsyncCallbackManagerForLLMRun],
+        **kwargs: Any
+    ) -> GenerationChunk:
+        """
+        Generate a completion, joining an identical generation already in flight.
+        The generation runs as its own task and is cancelled once every caller waiting for it is gone.
+        """
+        await self._bind_loop()
+        key = self._prompt_key(prompt, stop, kwargs)
+        entry = self._inflight.get(key)
+        if entry is None:
+            async def generate() -> GenerationChunk:
+                async with _Slot(self._host, streaming=False, latency=self._latency):
+                    return await self._astream_with_aggregation(
+                        prompt, stop=stop, run_manager=run_manager, verbose=self.verbose, **kwargs
+                    )
+
+            task = asyncio.get_running_loop().create_task(generate())
+            entry = [task, 0]
+            self._inflight[key] = entry
+            task.add_done_callback(lambda _: self._forget(key, entry))
+        else:
+            with self._host.lock:
+                self._host.coalesced += 1
+
+        task = entry[0]
+        entry[1] += 1
+        try:
+            return await asyncio.shield(task)
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0 and not task.done():
+                # Forget it now, so a new caller starts a new generation instead of joining a cancelled one
+                self._forget(key, entry)
+                task.cancel()
+
+    def _forget(self, key: str, entry: List[Any]) -> None:
+        """
+        Stop sharing a generation, unless a newer one has taken its key.
+        """
+        if self._inflight.get(key) is entry:
+            del self._inflight[key]
+
+    async def _agenerate(
+        self,
+        prompts: List[str],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> LLMResult:
+        generations = []
+        for prompt in prompts:
+            chunk = await self._agenerate_shared(prompt, stop, run_manager, **kwargs)
+            generations.append([chunk])
+        return LLMResult(generations=generations)
+
+    async def _astream(
+        self,
+        prompt: str,
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[GenerationChunk]:
+        await self._bind_loop()
+        async with _Slot(self._host, streaming=True, latency=self._latency):
+            async for chunk in super()._astream(prompt, stop=stop, run_manager=run_manager, **kwargs):
+                yield chunk
+
+def _client_kwargs() -> Dict[str, Any]:
+    """
+    Get the HTTP client settings for Ollama clients.
+    """
+    return {
+        "limits": httpx.Limits(
+            max_connections=OLLAMA_MAX_CONNECTIONS,
+            max_keepalive_connections=OLLAMA_MAX_CONNECTIONS
+        ),
+        "timeout": httpx.Timeout(OLLAMA_TIMEOUT or None),
+    }
+
+def get_llm(
+    model_name: str = DEFAULT_MODEL,
+    temperature: float = DEFAULT_TEMPERATURE,
+    base_url: Optional[str] = None
+) -> PooledOllamaLLM:
+    """
+    Get the shared client for a model and temperature on an Ollama server, creating it on first use.
+    """
+    base_url = base_url or OLLAMA_HOST
+    key = (base_url, model_name, temperature)
+    llm = _clients.get(key)
+    if llm is not None:
+        return llm
+
+    with _lock:
+        if key not in _clients:
+            _clients[key] = PooledOllamaLLM(
+                model=model_name,
+                temperature=temperature,
+                base_url=base_url,
+                keep_alive=parse_keep_alive(OLLAMA_KEEP_ALIVE),
+                client_kwargs=_client_kwargs()
+            )
+        return _clients[key]
+
+async def preload(model_name: str = DEFAULT_MODEL, base_url: Optional[str] = None) -> bool:
+    """
+    Ask Ollama to load a model and keep it loaded for OLLAMA_KEEP_ALIVE.
+    Returns whether the model was loaded; failures are ignored, as Ollama may not be running yet.
+    """
+    llm = get_llm(model_name, base_url=base_url)
+    await llm._bind_loop()
+    try:
+        # A request without a prompt only loads the model
+        await llm._async_client.generate(model=model_name, prompt="", keep_alive=llm.keep_alive)
+        return True
+    except Exception:
+        return False
+
+def stats() -> Dict[str, Dict[str, Any]]:
+    """
+    Get generation counters for every Ollama server in use.
+    """
+    with _lock:
+        hosts = dict(_hosts)
+    return {base_url: state.stats() for base_url, state in hosts.items()}
+
+async def aclose() -> None:
+    """
+    Close the pooled connections of every shared client.
+    """
+    with _lock:
+        clients = list(_clients.values())
+        _clients.clear()
+    for llm in clients:
+        await llm._async_client._client.aclose()
+        llm._client._client.close()
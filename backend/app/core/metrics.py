@@ -0,0 +1,196 @@
+import os
+import re
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Deque, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from dotenv import load_dotenv
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Histogram, generate_latest
+from prometheus_client.openmetrics.exposition import CONTENT_TYPE_LATEST as OPENMETRICS_CONTENT_TYPE
+from prometheus_client.openmetrics.exposition import generate_latest as generate_openmetrics
+
+# Load environment variables
+load_dotenv()
+
+# Recent traces kept for /metrics/traces
+TRACE_BUFFER_SIZE = int(os.getenv("TRACE_BUFFER_SIZE", "500"))
+
+# Header that carries a request's trace ID, in both directions
+TRACE_HEADER = "X-Trace-Id"
+
+# Histogram buckets in seconds, from cache lookups to slow generations
+LATENCY_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+    1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0, 300.0,
+)
+
+# Histogram buckets for prompt sizes in estimated tokens
+TOKEN_BUCKETS = (128, 256, 512, 768, 1024, 1536, 2048, 3072, 4096, 8192)
+
+# Trace IDs accepted from clients
+_TRACE_ID_PATTERN = re.compile(r"^[A-Za-z0-9_.-]{1,64}$")
+
+STAGE_SECONDS = Histogram(
+    "rag_stage_seconds",
+    "Time spent in each stage of chat and ingestion requests",
+    ["stage"],
+    buckets=LATENCY_BUCKETS
+)
+
+REQUEST_SECONDS = Histogram(
+    "rag_http_request_seconds",
+    "HTTP request time, including streamed response bodies",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS
+)
+
+PROMPT_TOKENS = Histogram(
+    "rag_prompt_tokens",
+    "Estimated tokens in chat prompts sent to the LLM, by whether the context was reranked",
+    ["reranked"],
+    buckets=TOKEN_BUCKETS
+)
+
+_current_trace: ContextVar[Optional[Dict[str, Any]]] = ContextVar("current_trace", default=None)
+_traces: Deque[Dict[str, Any]] = deque(maxlen=TRACE_BUFFER_SIZE)
+_lock = threading.Lock()
+
+def new_trace_id(candidate: Optional[str] = None) -> str:
+    """
+    Use a client's trace ID if it is well formed, otherwise make a new one.
+    """
+    if candidate and _TRACE_ID_PATTERN.match(candidate):
+        return candidate
+    return uuid.uuid4().hex
+
+def current_trace_id() -> Optional[str]:
+    """
+    Get the trace ID of the request being handled, if any.
+    """
+    current = _current_trace.get()
+    return current["trace_id"] if current else None
+
+def start_trace(name: str, trace_id: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Start a trace for the current context and keep it in the recent traces.
+    Stages observed in this context, and in tasks and threads started from it
+    (see concurrency.run_blocking), are added to it. Call finish_trace when done.
+    """
+    current = {
+        "trace_id": new_trace_id(trace_id),
+        "name": name,
+        "started_at": time.time(),
+        "ms": None,
+        "stages": [],
+        "_start": time.perf_counter(),
+    }
+    _current_trace.set(current)
+    with _lock:
+        _traces.append(current)
+    return current
+
+def finish_trace(current: Dict[str, Any]) -> float:
+    """
+    Record a trace's total duration and return it in seconds.
+    """
+    seconds = time.perf_counter() - current["_start"]
+    current["ms"] = round(seconds * 1000, 2)
+    return seconds
+
+@contextmanager
+def trace(name: str, trace_id: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Trace a block of work that is not an HTTP request, such as an ingestion job.
+    """
+    token = _current_trace.set(None)
+    current = start_trace(name, trace_id)
+    try:
+        yield current
+    finally:
+        finish_trace(current)
+        _current_trace.reset(token)
+
+def observe(stage_name: str, seconds: float, started: Optional[float] = None) -> None:
+    """
+    Record the duration of a stage, linking the histogram to the current trace.
+    started is the stage's perf_counter() start, used to place it within the trace.
+    """
+    current = _current_trace.get()
+    if current is None:
+        STAGE_SECONDS.labels(stage=stage_name).observe(seconds)
+        return
+
+    STAGE_SECONDS.labels(stage=stage_name).observe(seconds, exemplar={"trace_id": current["trace_id"]})
+    offset = (started if started is not None else time.perf_counter() - seconds) - current["_start"]
+    current["stages"].append({
+        "stage": stage_name,
+        "start_ms": round(offset * 1000, 2),
+        "ms": round(seconds * 1000, 2),
+    })
+
+@contextmanager
+def stage(stage_name: str) -> Iterator[None]:
+    """
+    Time a block as a stage of the current request.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(stage_name, time.perf_counter() - started, started)
+
+def timed_iter(iterable: Iterable[Any], stage_name: str) -> Iterator[Any]:
+    """
+    Yield from an iterable, timing each step as a stage, e.g. each page a loader reads.
+    """
+    iterator = iter(iterable)
+    while True:
+        started = time.perf_counter()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            return
+        finally:
+            observe(stage_name, time.perf_counter() - started, started)
+        yield item
+
+def observe_prompt_tokens(tokens: int, reranked: bool) -> None:
+    """
+    Record the estimated size of a chat prompt.
+    """
+    PROMPT_TOKENS.labels(reranked=str(reranked).lower()).observe(tokens)
+
+def finish_request(current: Dict[str, Any], method: str, route: str, status: int) -> None:
+    """
+    Finish an HTTP request's trace and record its duration.
+    """
+    current["name"] = f"{method} {route}"
+    seconds = finish_trace(current)
+    REQUEST_SECONDS.labels(method=method, route=route, status=str(status)).observe(
+        seconds, exemplar={"trace_id": current["trace_id"]}
+    )
+
+def recent_traces(limit: int = 50, slowest: bool = False, name: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Get finished traces, newest (or slowest) first.
+    """
+    with _lock:
+        traces = [t for t in _traces if t["ms"] is not None and (name is None or t["name"] == name)]
+    traces = sorted(traces, key=lambda t: t["ms"], reverse=True) if slowest else traces[::-1]
+    return [
+        {key: value for key, value in t.items() if not key.startswith("_")}
+        for t in traces[:limit]
+    ]
+
+def render(accept: str = "") -> Tuple[bytes, str]:
+    """
+    Render every metric in the Prometheus text format, or in OpenMetrics
+    (which carries the trace IDs of sampled observations as exemplars) when the scraper accepts it.
+    """
+    if "application/openmetrics-text" in accept:
+        return generate_openmetrics(REGISTRY), OPENMETRICS_CONTENT_TYPE
+    return generate_latest(), CONTENT_TYPE_LATEST
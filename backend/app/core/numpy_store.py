@@ -0,0 +1,768 @@
+import json
+import os
+import pickle
+import struct
+import threading
+import uuid
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+from dotenv import load_dotenv
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+try:
+    import fcntl
+except ImportError:  # Windows: writers in other processes are not locked out
+    fcntl = None
+
+# Load environment variables
+load_dotenv()
+
+# Number of IVF partitions; 0 searches every vector
+NUMPY_IVF_LISTS = int(os.getenv("NUMPY_IVF_LISTS", "0"))
+
+# Partitions searched per query when IVF is enabled
+NUMPY_IVF_PROBES = int(os.getenv("NUMPY_IVF_PROBES", "8"))
+
+# Collections smaller than this are always searched exhaustively
+NUMPY_IVF_MIN_SIZE = int(os.getenv("NUMPY_IVF_MIN_SIZE", "20000"))
+
+# "int8" scans int8-quantized vectors and re-scores the best candidates in float32
+NUMPY_QUANTIZATION = os.getenv("NUMPY_QUANTIZATION", "none")
+
+# Rows appended since the last compaction, as a fraction of the compacted rows, before compacting again
+NUMPY_COMPACT_RATIO = float(os.getenv("NUMPY_COMPACT_RATIO", "1.0"))
+
+# Appended or deleted rows always tolerated before compacting
+_COMPACT_MIN_ROWS = 4096
+
+# Candidates re-scored in float32 per result when quantization is on
+_RESCORE_FACTOR = 4
+
+_INCLUDE_DEFAULT = ["documents", "metadatas"]
+
+# Length prefix of each log record
+_RECORD_HEADER = struct.Struct("<Q")
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    """
+    L2-normalize rows so dot products are cosine similarities.
+    """
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return vectors / norms
+
+def _compare(values: List[Any], test: Callable[[Any], bool]) -> np.ndarray:
+    """
+    Apply a test to every value of a metadata column, treating missing values as no match.
+    """
+    return np.fromiter((value is not None and test(value) for value in values), dtype=bool, count=len(values))
+
+class _Rows:
+    """
+    Append-only array that doubles its capacity as it grows, so appending is amortized O(rows appended).
+    """
+
+    def __init__(self, dtype: Any, width: Optional[int] = None):
+        self._data = np.empty((0,) if width is None else (0, width), dtype=dtype)
+        self._size = 0
+
+    def __len__(self) -> int:
+        """Number of rows."""
+        return self._size
+
+    @property
+    def view(self) -> np.ndarray:
+        """The rows, without spare capacity. Writes go to the buffer."""
+        return self._data[:self._size]
+
+    def append(self, rows: np.ndarray) -> None:
+        """Append rows."""
+        rows = np.asarray(rows, dtype=self._data.dtype)
+        needed = self._size + len(rows)
+        if needed > len(self._data):
+            grown = np.empty((max(needed, 2 * len(self._data), 64),) + self._data.shape[1:], dtype=self._data.dtype)
+            grown[:self._size] = self._data[:self._size]
+            self._data = grown
+        self._data[self._size:needed] = rows
+        self._size = needed
+
+class NumpyCollection:
+    """
+    In-process vector collection with the subset of the Chroma collection API
+    used by this app (add, upsert, get, delete, query, count).
+
+    Vectors are a normalized float32 matrix saved as .npy and memory-mapped
+    on load, so startup does not read the whole file. Metadata lives in a
+    columnar side table (one list per key) used to evaluate Chroma-style
+    where filters. Large collections can be split into IVF partitions and
+    scanned as int8 codes.
+
+    Writes append their vectors to a tail file and their rows to an operation
+    log instead of rewriting the matrix; replaced and deleted rows are only
+    marked dead. Once the tail outgrows NUMPY_COMPACT_RATIO of the matrix, or
+    half the rows are dead, both are compacted into a new matrix, so writing
+    N rows costs O(N) overall. Writers hold a file lock, and every operation
+    first replays what other processes appended to the log.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        name: str,
+        ivf_lists: int = NUMPY_IVF_LISTS,
+        ivf_probes: int = NUMPY_IVF_PROBES,
+        ivf_min_size: int = NUMPY_IVF_MIN_SIZE,
+        quantization: str = NUMPY_QUANTIZATION
+    ):
+        self.path = path
+        self.name = name
+        self.ivf_lists = ivf_lists
+        self.ivf_probes = ivf_probes
+        self.ivf_min_size = ivf_min_size
+        self.quantization = quantization
+        self._lock = threading.RLock()
+        self._trained_size = 0
+        self._centroids: Optional[np.ndarray] = None
+        self._load()
+
+    # Persistence
+
+    def _file(self, kind: str, generation: Optional[int] = None) -> str:
+        """
+        Path of one of a generation's files: "vectors", "table", "tail" or "log".
+        Generation 0 uses the names of the original single-file layout.
+        """
+        generation = self._generation if generation is None else generation
+        names = {"vectors": "vectors.npy", "table": "table.pkl", "tail": "tail.f32", "log": "log.bin"}
+        name = names[kind]
+        if generation:
+            stem, extension = os.path.splitext(name)
+            name = f"{stem}-{generation}{extension}"
+        return os.path.join(self.path, name)
+
+    @property
+    def _manifest_path(self) -> str:
+        """Path of the file naming the current generation."""
+        return os.path.join(self.path, "manifest.json")
+
+    def _read_manifest(self) -> Dict[str, Any]:
+        """
+        Get the current generation and vector dimension.
+        """
+        try:
+            with open(self._manifest_path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {"generation": 0, "dimension": None}
+
+    def _write_manifest(self, generation: int, dimension: Optional[int]) -> None:
+        """
+        Atomically switch to a generation.
+        """
+        temp_path = f"{self._manifest_path}.tmp"
+        with open(temp_path, "w") as f:
+            json.dump({"generation": generation, "dimension": dimension}, f)
+        os.replace(temp_path, self._manifest_path)
+
+    @contextmanager
+    def _file_lock(self) -> Iterator[None]:
+        """
+        Hold the collection's write lock across processes.
+        """
+        os.makedirs(self.path, exist_ok=True)
+        with open(os.path.join(self.path, "lock"), "a") as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _load(self) -> None:
+        """
+        Load the collection from disk, memory-mapping the vectors, and replay the log.
+        A compaction by another process can remove the files being opened, so retry then.
+        """
+        for attempt in range(3):
+            try:
+                self._load_generation()
+                return
+            except FileNotFoundError:
+                if attempt == 2:
+                    raise
+
+    def _load_generation(self) -> None:
+        """
+        Load the current generation's matrix, table, tail and log.
+        """
+        manifest = self._read_manifest()
+        self._generation = manifest["generation"]
+        self._dimension = manifest["dimension"]
+        self._ids: List[Optional[str]] = []
+        self._documents: List[Optional[str]] = []
+        self._columns: Dict[str, List[Any]] = {}
+        self._base = np.empty((0, self._dimension or 0), dtype=np.float32)
+
+        if os.path.exists(self._file("table")):
+            with open(self._file("table"), "rb") as f:
+                table = pickle.load(f)
+            self._ids = table["ids"]
+            self._documents = table["documents"]
+            self._columns = table["columns"]
+            self._base = np.load(self._file("vectors"), mmap_mode="r")
+            self._dimension = self._dimension or self._base.shape[1]
+        self._base_count = len(self._ids)
+        self._positions: Dict[str, int] = {chunk_id: i for i, chunk_id in enumerate(self._ids)}
+        self._alive = _Rows(bool)
+        self._alive.append(np.ones(self._base_count, dtype=bool))
+        self._codes: Optional[_Rows] = None
+        self._assignments: Optional[_Rows] = None
+
+        self._map_tail()
+        self._log_offset = 0
+        self._replay(index=False)
+        self._build_index()
+
+    def _map_tail(self) -> None:
+        """
+        Memory-map the vectors appended since the last compaction.
+        """
+        path = self._file("tail")
+        rows = os.path.getsize(path) // (4 * self._dimension) if self._dimension and os.path.exists(path) else 0
+        if rows:
+            self._tail = np.memmap(path, dtype=np.float32, mode="r", shape=(rows, self._dimension))
+        else:
+            self._tail = np.empty((0, self._dimension or 0), dtype=np.float32)
+
+    def _read_records(self) -> List[Dict[str, Any]]:
+        """
+        Read the log records appended since the last read. A record still being written is left for later.
+        """
+        path = self._file("log")
+        if not os.path.exists(path) or os.path.getsize(path) <= self._log_offset:
+            return []
+
+        records = []
+        with open(path, "rb") as f:
+            f.seek(self._log_offset)
+            while True:
+                header = f.read(_RECORD_HEADER.size)
+                if len(header) < _RECORD_HEADER.size:
+                    break
+                payload = f.read(_RECORD_HEADER.unpack(header)[0])
+                if len(payload) < _RECORD_HEADER.unpack(header)[0]:
+                    break
+                records.append(pickle.loads(payload))
+                self._log_offset += _RECORD_HEADER.size + len(payload)
+        return records
+
+    def _append_record(self, record: Dict[str, Any]) -> None:
+        """
+        Append a record to the log. Caller holds the file lock and has replayed the log.
+        """
+        payload = pickle.dumps(record, protocol=pickle.HIGHEST_PROTOCOL)
+        with open(self._file("log"), "ab") as f:
+            f.write(_RECORD_HEADER.pack(len(payload)) + payload)
+        self._log_offset += _RECORD_HEADER.size + len(payload)
+
+    def _replay(self, index: bool = True) -> None:
+        """
+        Apply the log records written since the last replay, e.g. by another process.
+        """
+        records = self._read_records()
+        if records:
+            self._dimension = self._dimension or self._read_manifest()["dimension"]
+            self._map_tail()
+        for record in records:
+            if record["op"] == "upsert":
+                self._apply_upsert(record["ids"], record["documents"], record["metadatas"], record["start"], index)
+            else:
+                self._apply_delete(record["ids"])
+        if records and index:
+            self._maybe_rebuild_ivf()
+
+    def _refresh(self) -> None:
+        """
+        Catch up with writes by other processes: reload after a compaction, otherwise replay the log.
+        """
+        if self._read_manifest()["generation"] != self._generation:
+            self._load()
+        else:
+            self._replay()
+
+    def _apply_upsert(self, ids, documents, metadatas, start: int, index: bool = True) -> None:
+        """
+        Add rows for vectors at tail rows start.., marking earlier rows with the same ids dead.
+        """
+        first = self._base_count + start
+        # Rows of a write that never reached the log stay dead
+        if first > len(self._ids):
+            self._add_rows(first - len(self._ids), index)
+
+        for chunk_id, document, metadata in zip(ids, documents, metadatas):
+            previous = self._positions.get(chunk_id)
+            if previous is not None:
+                self._alive.view[previous] = False
+            position = len(self._ids)
+            self._positions[chunk_id] = position
+            self._ids.append(chunk_id)
+            self._documents.append(document)
+            for column in self._columns.values():
+                column.append(None)
+            for key, value in (metadata or {}).items():
+                self._columns.setdefault(key, [None] * len(self._ids))[position] = value
+            self._alive.append([True])
+
+        if index:
+            self._index_rows(self._tail[start:start + len(ids)])
+
+    def _add_rows(self, count: int, index: bool) -> None:
+        """
+        Add dead placeholder rows.
+        """
+        self._ids.extend([None] * count)
+        self._documents.extend([None] * count)
+        for column in self._columns.values():
+            column.extend([None] * count)
+        self._alive.append(np.zeros(count, dtype=bool))
+        if index:
+            self._index_rows(np.zeros((count, self._dimension), dtype=np.float32))
+
+    def _apply_delete(self, ids: List[str]) -> None:
+        """
+        Mark rows dead.
+        """
+        for chunk_id in ids:
+            position = self._positions.pop(chunk_id, None)
+            if position is not None:
+                self._alive.view[position] = False
+
+    def _write(self, record: Dict[str, Any], vectors: Optional[np.ndarray] = None) -> None:
+        """
+        Persist and apply one write: vectors go to the tail first, then the record to the log.
+        """
+        with self._file_lock():
+            self._refresh()
+            if vectors is not None:
+                if not self._dimension:
+                    self._dimension = vectors.shape[1]
+                    self._write_manifest(self._generation, self._dimension)
+                    self._map_tail()
+                record["start"] = len(self._tail)
+                with open(self._file("tail"), "ab") as f:
+                    f.write(np.ascontiguousarray(vectors, dtype=np.float32).tobytes())
+                self._map_tail()
+            self._append_record(record)
+
+            if record["op"] == "upsert":
+                self._apply_upsert(record["ids"], record["documents"], record["metadatas"], record["start"])
+                self._maybe_rebuild_ivf()
+            else:
+                self._apply_delete(record["ids"])
+
+            total = len(self._ids)
+            dead = total - len(self._positions)
+            appended = total - self._base_count
+            if (appended > max(_COMPACT_MIN_ROWS, NUMPY_COMPACT_RATIO * self._base_count)
+                    or dead > max(_COMPACT_MIN_ROWS, total // 2)):
+                self._compact()
+
+    def _compact(self) -> None:
+        """
+        Write the live rows as the next generation's matrix and table and switch to it.
+        Caller holds the file lock.
+        """
+        live = np.flatnonzero(self._alive.view)
+        generation = self._generation + 1
+
+        # Copy the live vectors in blocks, so compaction never holds the whole matrix in memory
+        temp_vectors = f"{self._file('vectors', generation)}.tmp.npy"
+        if len(live):
+            matrix = np.lib.format.open_memmap(
+                temp_vectors, mode="w+", dtype=np.float32, shape=(len(live), self._dimension)
+            )
+            for start in range(0, len(live), 65536):
+                matrix[start:start + 65536] = self._gather(live[start:start + 65536])
+            matrix.flush()
+            del matrix
+        else:
+            np.save(temp_vectors, np.empty((0, self._dimension), dtype=np.float32))
+        os.replace(temp_vectors, self._file("vectors", generation))
+
+        temp_table = f"{self._file('table', generation)}.tmp"
+        with open(temp_table, "wb") as f:
+            pickle.dump(
+                {
+                    "ids": [self._ids[i] for i in live],
+                    "documents": [self._documents[i] for i in live],
+                    "columns": {key: [column[i] for i in live] for key, column in self._columns.items()},
+                },
+                f,
+                protocol=pickle.HIGHEST_PROTOCOL
+            )
+        os.replace(temp_table, self._file("table", generation))
+
+        previous = self._generation
+        self._write_manifest(generation, self._dimension)
+        for kind in ("vectors", "table", "tail", "log"):
+            try:
+                os.remove(self._file(kind, previous))
+            except FileNotFoundError:
+                pass
+        self._load()
+
+    # Indexing
+
+    def _gather(self, rows: np.ndarray) -> np.ndarray:
+        """
+        Get the float32 vectors of rows from the matrix and the tail.
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        vectors = np.empty((len(rows), self._dimension or 0), dtype=np.float32)
+        in_base = rows < self._base_count
+        if in_base.any():
+            vectors[in_base] = self._base[rows[in_base]]
+        if not in_base.all():
+            vectors[~in_base] = self._tail[rows[~in_base] - self._base_count]
+        return vectors
+
+    def _build_index(self) -> None:
+        """
+        Build the int8 codes and IVF partitions for every row.
+        """
+        count = len(self._ids)
+        self._codes = None
+        self._assignments = None
+        if not count:
+            return
+
+        if self.quantization == "int8":
+            self._codes = _Rows(np.int8, self._dimension)
+            for start in range(0, count, 65536):
+                self._codes.append(self._quantize(self._gather(np.arange(start, min(count, start + 65536)))))
+        self._maybe_rebuild_ivf(force=True)
+
+    def _maybe_rebuild_ivf(self, force: bool = False) -> None:
+        """
+        Train IVF partitions once the collection is large enough and retrain them
+        once it has doubled since; rows added in between join the existing partitions.
+        With force, every row is reassigned even if the partitions are kept.
+        """
+        count = len(self._positions)
+        if not self.ivf_lists or count < max(self.ivf_min_size, self.ivf_lists):
+            self._centroids = None
+            self._assignments = None
+            return
+        retrain = self._centroids is None or count > 2 * self._trained_size
+        if not retrain and not force and self._assignments is not None:
+            return
+
+        if retrain:
+            self._centroids = self._train_ivf(np.flatnonzero(self._alive.view))
+            self._trained_size = count
+        self._assignments = _Rows(np.int32)
+        for start in range(0, len(self._ids), 65536):
+            rows = np.arange(start, min(len(self._ids), start + 65536))
+            self._assignments.append(self._assign(self._gather(rows), self._centroids))
+
+    def _index_rows(self, vectors: np.ndarray) -> None:
+        """
+        Add the codes and partition assignments of rows just appended.
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if self._codes is not None:
+            self._codes.append(self._quantize(vectors))
+        elif self.quantization == "int8":
+            self._build_index()
+            return
+        if self._assignments is not None:
+            self._assignments.append(self._assign(vectors, self._centroids))
+
+    def _quantize(self, vectors: np.ndarray) -> np.ndarray:
+        """
+        Get the int8 codes of normalized vectors.
+        """
+        return np.round(vectors * 127).astype(np.int8)
+
+    def _train_ivf(self, live: np.ndarray, iterations: int = 10) -> np.ndarray:
+        """
+        Cluster a sample of the live vectors with spherical k-means.
+        """
+        rng = np.random.default_rng(0)
+        sample = self._gather(np.sort(rng.choice(live, size=min(len(live), self.ivf_lists * 64), replace=False)))
+        centroids = sample[rng.choice(len(sample), size=self.ivf_lists, replace=False)].copy()
+
+        for _ in range(iterations):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            for i in range(self.ivf_lists):
+                members = sample[labels == i]
+                if len(members):
+                    centroids[i] = members.mean(axis=0)
+            centroids = _normalize(centroids)
+        return centroids
+
+    def _assign(self, vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+        """
+        Assign each vector to its nearest centroid, in blocks to bound the similarity matrix.
+        """
+        assignments = np.empty(len(vectors), dtype=np.int32)
+        for start in range(0, len(vectors), 65536):
+            assignments[start:start + 65536] = np.argmax(vectors[start:start + 65536] @ centroids.T, axis=1)
+        return assignments
+
+    # Metadata filtering
+
+    def _column(self, key: str) -> List[Any]:
+        """Get a metadata column, all None if no row has the key."""
+        return self._columns.get(key) or [None] * len(self._ids)
+
+    def _mask(self, where: Optional[Dict[str, Any]]) -> np.ndarray:
+        """
+        Evaluate a Chroma-style where filter to a boolean row mask of live rows.
+        """
+        return self._alive.view & self._filter(where)
+
+    def _filter(self, where: Optional[Dict[str, Any]]) -> np.ndarray:
+        """
+        Evaluate a Chroma-style where filter to a boolean row mask.
+        """
+        count = len(self._ids)
+        if not where:
+            return np.ones(count, dtype=bool)
+
+        mask = np.ones(count, dtype=bool)
+        for key, condition in where.items():
+            if key == "$and":
+                for clause in condition:
+                    mask &= self._filter(clause)
+            elif key == "$or":
+                either = np.zeros(count, dtype=bool)
+                for clause in condition:
+                    either |= self._filter(clause)
+                mask &= either
+            else:
+                mask &= self._match(self._column(key), condition)
+        return mask
+
+    def _match(self, values: List[Any], condition: Any) -> np.ndarray:
+        """
+        Evaluate one column condition, e.g. "active" or {"$ne": "archived"}.
+        """
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+
+        (operator, operand), = condition.items()
+        if operator == "$eq":
+            return _compare(values, lambda value: value == operand)
+        if operator == "$ne":
+            return ~_compare(values, lambda value: value == operand)
+        if operator == "$in":
+            allowed = set(operand)
+            return _compare(values, lambda value: value in allowed)
+        if operator == "$nin":
+            excluded = set(operand)
+            return ~_compare(values, lambda value: value in excluded)
+        if operator == "$gt":
+            return _compare(values, lambda value: value > operand)
+        if operator == "$gte":
+            return _compare(values, lambda value: value >= operand)
+        if operator == "$lt":
+            return _compare(values, lambda value: value < operand)
+        if operator == "$lte":
+            return _compare(values, lambda value: value <= operand)
+        raise ValueError(f"Unsupported filter operator: {operator}")
+
+    # Collection API
+
+    def count(self) -> int:
+        """Number of rows."""
+        with self._lock:
+            self._refresh()
+            return len(self._positions)
+
+    def add(self, ids, embeddings=None, documents=None, metadatas=None) -> None:
+        """Same as upsert."""
+        self.upsert(ids, embeddings=embeddings, documents=documents, metadatas=metadatas)
+
+    def upsert(self, ids, embeddings=None, documents=None, metadatas=None) -> None:
+        """
+        Insert or replace rows. Embeddings are required.
+        """
+        if embeddings is None:
+            raise ValueError("NumpyCollection needs precomputed embeddings")
+        if not len(ids):
+            return
+
+        vectors = _normalize(np.asarray(embeddings, dtype=np.float32))
+        record = {
+            "op": "upsert",
+            "ids": list(ids),
+            "documents": list(documents or [None] * len(ids)),
+            "metadatas": list(metadatas or [None] * len(ids)),
+        }
+        with self._lock:
+            self._write(record, vectors)
+
+    def delete(self, ids=None, where=None) -> None:
+        """
+        Delete rows by id and/or where filter.
+        """
+        with self._lock:
+            self._refresh()
+            if where:
+                matched = [self._ids[i] for i in np.flatnonzero(self._mask(where))]
+                if ids:
+                    wanted = set(ids)
+                    ids = [chunk_id for chunk_id in matched if chunk_id in wanted]
+                else:
+                    ids = matched
+            ids = [chunk_id for chunk_id in ids or [] if chunk_id in self._positions]
+            if not ids:
+                return
+            self._write({"op": "delete", "ids": ids})
+
+    def _result(self, rows: Iterable[int], include: List[str]) -> Dict[str, Any]:
+        """
+        Build a Chroma-style get() result for rows.
+        """
+        rows = list(rows)
+        return {
+            "ids": [self._ids[i] for i in rows],
+            "documents": [self._documents[i] for i in rows] if "documents" in include else None,
+            "metadatas": [self._metadata(i) for i in rows] if "metadatas" in include else None,
+            "embeddings": self._gather(rows) if "embeddings" in include else None,
+        }
+
+    def _metadata(self, row: int) -> Dict[str, Any]:
+        """
+        Rebuild the metadata dict of a row from the columnar table.
+        """
+        return {key: column[row] for key, column in self._columns.items() if column[row] is not None}
+
+    def get(self, ids=None, where=None, limit=None, offset=None, include=None) -> Dict[str, Any]:
+        """
+        Get rows by id and/or where filter.
+        """
+        include = _INCLUDE_DEFAULT if include is None else include
+        with self._lock:
+            self._refresh()
+            mask = self._mask(where)
+            if ids is not None:
+                rows = [self._positions[chunk_id] for chunk_id in ids if chunk_id in self._positions]
+                rows = [row for row in rows if mask[row]]
+            else:
+                rows = np.flatnonzero(mask).tolist()
+            start = offset or 0
+            rows = rows[start:start + limit if limit is not None else None]
+            return self._result(rows, include)
+
+    def _candidates(self, query: np.ndarray, mask: np.ndarray) -> np.ndarray:
+        """
+        Get the rows worth scoring: matching rows in the nearest IVF partitions, or all matching rows.
+        """
+        if self._centroids is not None and self._assignments is not None:
+            probes = np.argsort(self._centroids @ query)[-self.ivf_probes:]
+            mask = mask & np.isin(self._assignments.view, probes)
+        return np.flatnonzero(mask)
+
+    def query(self, query_embeddings, n_results=10, where=None, include=None) -> Dict[str, Any]:
+        """
+        Get the nearest rows to each query embedding by cosine similarity.
+        Distances are cosine distances (1 - similarity).
+        """
+        include = _INCLUDE_DEFAULT if include is None else include
+        queries = _normalize(np.asarray(query_embeddings, dtype=np.float32))
+        results = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+
+        with self._lock:
+            self._refresh()
+            mask = self._mask(where)
+            for query in queries:
+                rows = self._candidates(query, mask)
+                if not len(rows):
+                    top, similarities = np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+                else:
+                    top, similarities = self._top(query, rows, n_results)
+
+                result = self._result(top, include)
+                results["ids"].append(result["ids"])
+                results["documents"].append(result["documents"])
+                results["metadatas"].append(result["metadatas"])
+                results["distances"].append((1 - similarities).tolist())
+        return results
+
+    def _top(self, query: np.ndarray, rows: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Score candidate rows and return the best k rows with their similarities.
+        """
+        if self._codes is not None:
+            # Scan the int8 codes, then re-score a shortlist in float32
+            approximate = self._codes.view[rows].astype(np.float32) @ query
+            shortlist = min(len(rows), k * _RESCORE_FACTOR)
+            rows = rows[np.argpartition(-approximate, shortlist - 1)[:shortlist]]
+
+        similarities = self._gather(rows) @ query
+        k = min(k, len(rows))
+        best = np.argpartition(-similarities, k - 1)[:k]
+        best = best[np.argsort(-similarities[best])]
+        return rows[best], similarities[best]
+
+class NumpyVectorStore(VectorStore):
+    """
+    LangChain vector store backed by a NumpyCollection.
+    """
+
+    def __init__(self, path: str, collection_name: str, embedding_function: Embeddings):
+        self._embedding_function = embedding_function
+        self._collection = NumpyCollection(os.path.join(path, collection_name), collection_name)
+
+    @property
+    def embeddings(self) -> Embeddings:
+        """The embedding function."""
+        return self._embedding_function
+
+    def add_texts(self, texts, metadatas=None, ids=None, **kwargs) -> List[str]:
+        """Embed and upsert texts."""
+        texts = list(texts)
+        ids = list(ids) if ids else [str(uuid.uuid4()) for _ in texts]
+        self._collection.upsert(
+            ids=ids,
+            embeddings=self._embedding_function.embed_documents(texts),
+            documents=texts,
+            metadatas=metadatas
+        )
+        return ids
+
+    def similarity_search_with_score(self, query: str, k: int = 4, filter: Optional[dict] = None, **kwargs) -> List[Tuple[Document, float]]:
+        """Get the k nearest documents with their cosine distances."""
+        results = self._collection.query(
+            query_embeddings=[self._embedding_function.embed_query(query)],
+            n_results=k,
+            where=filter
+        )
+        return [
+            (Document(page_content=text, metadata=metadata, id=chunk_id), distance)
+            for chunk_id, text, metadata, distance in zip(
+                results["ids"][0], results["documents"][0], results["metadatas"][0], results["distances"][0]
+            )
+        ]
+
+    def similarity_search(self, query: str, k: int = 4, filter: Optional[dict] = None, **kwargs) -> List[Document]:
+        """Get the k nearest documents."""
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, filter=filter)]
+
+    def _select_relevance_score_fn(self) -> Callable[[float], float]:
+        """Convert cosine distances to 0-1 relevance scores."""
+        return lambda distance: 1.0 - distance
+
+    @classmethod
+    def from_texts(cls, texts, embedding, metadatas=None, ids=None, path="./numpy_store", collection_name="default", **kwargs):
+        """Create a store and add texts to it."""
+        store = cls(path, collection_name, embedding)
+        store.add_texts(texts, metadatas=metadatas, ids=ids)
+        return store
@@ -0,0 +1,263 @@
+import itertools
+import multiprocessing
+import os
+import signal
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from typing import Iterator, List, Optional, Tuple
+
+from dotenv import load_dotenv
+from langchain_core.documents import Document
+
+from core.embeddings import get_document_loader
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Load environment variables
+load_dotenv()
+
+# Worker processes that run document loaders
+PARSER_WORKERS = int(os.getenv("PARSER_WORKERS", "2"))
+
+# Seconds a single parse task may run before it is abandoned
+PARSER_TIMEOUT = float(os.getenv("PARSER_TIMEOUT", "120"))
+
+# Address space limit per worker in MB; 0 disables the limit
+PARSER_MEMORY_LIMIT_MB = int(os.getenv("PARSER_MEMORY_LIMIT_MB", "2048"))
+
+# PDF pages parsed per task, so large PDFs are spread over the workers
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "50"))
+
+# Extra seconds the caller waits past a task's own PARSER_TIMEOUT before killing the workers
+KILL_GRACE_SECONDS = 5
+
+_lock = threading.Lock()
+_pool: Optional[ProcessPoolExecutor] = None
+_manager = None
+# Task id -> time a worker started it, shared with the workers through _manager
+_starts = None
+# Worker side: the proxy of _starts passed in by _init_worker
+_worker_starts = None
+_task_ids = itertools.count()
+
+class ParseError(Exception):
+    """
+    Raised when a document cannot be parsed, takes longer than PARSER_TIMEOUT
+    or exceeds PARSER_MEMORY_LIMIT_MB.
+    """
+
+def _init_worker(memory_limit_mb: int, starts) -> None:
+    """
+    Cap the worker's address space so a malformed file fails with MemoryError
+    instead of exhausting the machine, and keep the dict task start times go to.
+    """
+    global _worker_starts
+    _worker_starts = starts
+    if memory_limit_mb and resource is not None:
+        limit = memory_limit_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+def _on_alarm(signum, frame):
+    """
+    Interrupt a parse task that ran past PARSER_TIMEOUT.
+    """
+    raise ParseError(f"Parsing took longer than {PARSER_TIMEOUT:g} s")
+
+def _run_with_alarm(func, *args):
+    """
+    Run func in a worker, interrupting it after PARSER_TIMEOUT where SIGALRM is available.
+    Tasks run on the worker's main thread, so the signal handler can be installed.
+    """
+    if not hasattr(signal, "SIGALRM") or not PARSER_TIMEOUT:
+        return func(*args)
+
+    signal.signal(signal.SIGALRM, _on_alarm)
+    signal.setitimer(signal.ITIMER_REAL, PARSER_TIMEOUT)
+    try:
+        return func(*args)
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+
+def _count_pdf_pages(file_path: str) -> int:
+    """
+    Get the number of pages in a PDF.
+    """
+    from pypdf import PdfReader
+
+    return len(PdfReader(file_path).pages)
+
+def _load_pdf_pages(file_path: str, start: int, end: int) -> List[Document]:
+    """
+    Extract the text of pages start..end of a PDF, one document per page like PyPDFLoader.
+    """
+    from pypdf import PdfReader
+
+    reader = PdfReader(file_path)
+    total_pages = len(reader.pages)
+    return [
+        Document(
+            page_content=reader.pages[page].extract_text(),
+            metadata={"source": file_path, "page": page, "total_pages": total_pages}
+        )
+        for page in range(start, min(end, total_pages))
+    ]
+
+def _load_file(file_path: str) -> List[Document]:
+    """
+    Load a whole file with its LOADER_MAPPING loader.
+    """
+    return list(get_document_loader(file_path).lazy_load())
+
+def _task(task_id: int, name: str, *args):
+    """
+    Entry point for every parse task in a worker process.
+    Records when the task started, so the caller only counts time the task really ran.
+    """
+    _worker_starts[task_id] = time.time()
+    func = {"count_pdf_pages": _count_pdf_pages, "load_pdf_pages": _load_pdf_pages, "load_file": _load_file}[name]
+    return _run_with_alarm(func, *args)
+
+def _get_pool() -> ProcessPoolExecutor:
+    """
+    Get the parser pool, starting it on first use.
+    """
+    global _pool, _manager, _starts
+    with _lock:
+        if _pool is None:
+            # Spawn rather than fork so workers do not inherit torch and Chroma threads
+            context = multiprocessing.get_context("spawn")
+            if _manager is None:
+                # Outlives pools killed by _reset_pool
+                _manager = context.Manager()
+                _starts = _manager.dict()
+            _pool = ProcessPoolExecutor(
+                max_workers=PARSER_WORKERS,
+                mp_context=context,
+                initializer=_init_worker,
+                initargs=(PARSER_MEMORY_LIMIT_MB, _starts)
+            )
+        return _pool
+
+def _forget_start(task_id: int) -> None:
+    """
+    Drop a finished task's start time.
+    """
+    starts = _starts
+    if starts is not None:
+        try:
+            starts.pop(task_id, None)
+        except (OSError, EOFError):  # the manager was shut down
+            pass
+
+def _submit(pool: ProcessPoolExecutor, name: str, *args) -> Tuple[Future, int]:
+    """
+    Submit a parse task, returning its future and the id its start time is recorded under.
+    """
+    task_id = next(_task_ids)
+    future = pool.submit(_task, task_id, name, *args)
+    future.add_done_callback(lambda _: _forget_start(task_id))
+    return future, task_id
+
+def _reset_pool(pool: ProcessPoolExecutor) -> None:
+    """
+    Kill a stuck or broken pool; the next task starts a fresh one.
+    Other documents being parsed at the time fail with ParseError and are retried by their jobs.
+    """
+    global _pool
+    with _lock:
+        if _pool is pool:
+            _pool = None
+    # The executor has no public way to stop a task that is already running
+    for process in list((pool._processes or {}).values()):
+        process.kill()
+    pool.shutdown(wait=False, cancel_futures=True)
+
+def _result(pool: ProcessPoolExecutor, task: Tuple[Future, int], file_path: str):
+    """
+    Wait for a parse task, turning loader errors, timeouts, memory errors and
+    crashed workers into ParseError.
+    The workers are only killed once the task itself ran KILL_GRACE_SECONDS past
+    PARSER_TIMEOUT without SIGALRM stopping it; time spent queued behind other
+    tasks does not count, even once the executor reports the task as running.
+    """
+    future, task_id = task
+    timeout = PARSER_TIMEOUT + KILL_GRACE_SECONDS if PARSER_TIMEOUT else None
+    try:
+        while True:
+            try:
+                return future.result(timeout=timeout)
+            except FutureTimeoutError:
+                # The task itself raised TimeoutError
+                if future.done():
+                    raise
+            started = _starts.get(task_id)
+            if started is None:
+                # No worker has picked the task up yet
+                continue
+            timeout = started + PARSER_TIMEOUT + KILL_GRACE_SECONDS - time.time()
+            if timeout <= 0:
+                _reset_pool(pool)
+                _forget_start(task_id)
+                raise ParseError(f"Parsing {file_path} did not finish within {PARSER_TIMEOUT:g} s")
+    except ParseError:
+        raise
+    except BrokenProcessPool as e:
+        _reset_pool(pool)
+        raise ParseError(f"Parser worker crashed while parsing {file_path}") from e
+    except Exception as e:
+        raise ParseError(f"Could not parse {file_path}: {e or type(e).__name__}") from e
+
+def _page_ranges(page_count: int) -> Iterator[Tuple[int, int]]:
+    """
+    Split a PDF's pages into (start, end) ranges of PDF_PAGES_PER_TASK pages.
+    """
+    for start in range(0, page_count, PDF_PAGES_PER_TASK):
+        yield start, min(start + PDF_PAGES_PER_TASK, page_count)
+
+def parse_document(file_path: str) -> Iterator[Document]:
+    """
+    Load a document in the parser pool, yielding its pages in order.
+    PDFs are split into page ranges that are parsed by several workers at once;
+    at most two ranges per worker are in flight, so memory does not grow with the file.
+    Raises ParseError if a worker times out, runs out of memory or crashes.
+    """
+    pool = _get_pool()
+
+    if os.path.splitext(file_path)[1].lower() != ".pdf":
+        yield from _result(pool, _submit(pool, "load_file", file_path), file_path)
+        return
+
+    page_count = _result(pool, _submit(pool, "count_pdf_pages", file_path), file_path)
+    in_flight = deque()
+    try:
+        for start, end in _page_ranges(page_count):
+            in_flight.append(_submit(pool, "load_pdf_pages", file_path, start, end))
+            if len(in_flight) >= PARSER_WORKERS * 2:
+                yield from _result(pool, in_flight.popleft(), file_path)
+        while in_flight:
+            yield from _result(pool, in_flight.popleft(), file_path)
+    finally:
+        # Ranges nobody will read, e.g. when the caller stopped early or a range failed
+        for future, _ in in_flight:
+            future.cancel()
+
+def shutdown() -> None:
+    """
+    Stop the parser pool.
+    """
+    global _pool, _manager, _starts
+    with _lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+        if _manager is not None:
+            _manager.shutdown()
+            _manager = None
+            _starts = None
@@ -1,77 +1,34 @@
-import os
-import json
+import re
 from typing import Dict, List, Optional, Any
-import uuid
 
-from core.embeddings import embed_document, get_vectorstore
+from core.embeddings import delete_chunks, get_chunks, get_vectorstore, sync_document
+from core.retrieval import similarity_fn
+from db.projects import get_project_store
 
-# Path to JSON file that stores projects
-PROJECTS_FILE = os.path.join(os.path.dirname(__file__), "../../data/projects.json")
-
-# Ensure data directory exists
-os.makedirs(os.path.dirname(PROJECTS_FILE), exist_ok=True)
-
-def _load_projects() -> List[Dict[str, Any]]:
+def get_all_projects() -> List[Dict[str, Any]]:
     """
-    Load projects from JSON file.
+    Get all projects.
     """
-    if not os.path.exists(PROJECTS_FILE):
-        # Create empty projects file
-        with open(PROJECTS_FILE, "w") as f:
-            json.dump([], f)
-        return []
-    
-    with open(PROJECTS_FILE, "r") as f:
-        try:
-            return json.load(f)
-        except json.JSONDecodeError:
-            return []
+    return get_project_store().list()
 
-def _save_projects(projects: List[Dict[str, Any]]) -> None:
+def query_projects(status: Optional[str] = None, limit: Optional[int] = None, offset: int = 0) -> List[Dict[str, Any]]:
     """
-    Save projects to JSON file.
+    List projects, optionally filtered by status and paginated.
     """
-    with open(PROJECTS_FILE, "w") as f:
-        json.dump(projects, f, indent=2)
-
-def get_all_projects() -> List[Dict[str, Any]]:
-    """
-    Get all projects.
-    """
-    return _load_projects()
+    return get_project_store().list(status=status, limit=limit, offset=offset)
 
 def get_project(project_id: str) -> Optional[Dict[str, Any]]:
     """
     Get a project by ID.
     """
-    projects = _load_projects()
-    for project in projects:
-        if project.get("id") == project_id:
-            return project
-    return None
+    return get_project_store().get(project_id)
 
 def store_project(project: Dict[str, Any]) -> str:
     """
     Store a project and embed it in the vector store.
     """
-    # Load existing projects
-    projects = _load_projects()
-    
-    # Check if project already exists
-    for i, p in enumerate(projects):
-        if p.get("id") == project["id"]:
-            # Update existing project
-            projects[i] = project
-            _save_projects(projects)
-            
-            # Embed in vector store
-            _embed_project(project)
-            
-            return project["id"]
-    
-    # Add new project
-    projects.append(project)
-    _save_projects(projects)
+    # Insert or replace the project
+    get_project_store().upsert(project)
     
     # Embed in vector store
     _embed_project(project)
@@ -88,21 +45,28 @@ def delete_project(project_id: str) -> None:
     """
     Delete a project.
     """
-    # Load existing projects
-    projects = _load_projects()
+    get_project_store().delete(project_id)
     
-    # Filter out project to delete
-    projects = [p for p in projects if p.get("id") != project_id]
-    
-    # Save projects
-    _save_projects(projects)
-    
-    # TODO: Remove from vector store (not directly supported by Chroma)
-    # For now, we'll leave it in the vector store, as deleting is complex
+    # Remove every vector of the project, including copies left by older versions
+    delete_chunks(where={"project_id": project_id})
+
+def _technology_key(technology: str) -> str:
+    """
+    Get the metadata key flagging a technology, e.g. "Node.js" -> "tech_node_js".
+    Chroma metadata cannot hold lists, so each technology is its own boolean key.
+    """
+    return "tech_" + re.sub(r"[^a-z0-9]+", "_", technology.lower()).strip("_")
+
+def _project_doc_id(project_id: str) -> str:
+    """
+    Get the deterministic vector store document ID of a project.
+    """
+    return f"project:{project_id}"
 
 def _embed_project(project: Dict[str, Any]) -> None:
     """
     Embed a project in the vector store.
+    Re-embedding an unchanged project writes nothing; only changed chunks are embedded.
     """
     # Convert project to text
     project_text = f"""
@@ -124,32 +88,95 @@ def _embed_project(project: Dict[str, Any]) -> None:
         "project_name": project["name"],
         "project_status": project["status"],
     }
+    for technology in project["technologies"]:
+        metadata[_technology_key(technology)] = True
+    
+    # Sync the project's chunks under its deterministic document ID
+    doc_id = _project_doc_id(project["id"])
+    sync_document(doc_id, project_text, metadata)
     
-    # Embed document
-    embed_document(text=project_text, metadata=metadata)
+    # Remove copies embedded under random document IDs by older versions
+    delete_chunks(where={"$and": [{"project_id": project["id"]}, {"doc_id": {"$ne": doc_id}}]})
 
-def search_projects(query: str, top_k: int = 5) -> List[Dict[str, Any]]:
+def compact_project_vectors(dry_run: bool = False) -> Dict[str, int]:
     """
-    Search projects by query.
+    Remove orphaned and duplicated project vectors from the vector store.
+    Projects still in the store are re-synced under their deterministic ID,
+    vectors of deleted projects and older duplicate copies are removed.
+    Returns counts of what was (or, with dry_run, would be) removed.
     """
-    # Get vector store
-    vectorstore = get_vectorstore()
+    projects = {project["id"]: project for project in get_all_projects()}
+    stored = get_chunks(where={"source": "project"})
     
-    # Search for documents
-    results = vectorstore.similarity_search(
+    orphaned = []
+    duplicates = []
+    for chunk_id, metadata in zip(stored["ids"], stored["metadatas"]):
+        project_id = (metadata or {}).get("project_id")
+        if project_id not in projects:
+            orphaned.append(chunk_id)
+        elif metadata.get("doc_id") != _project_doc_id(project_id):
+            duplicates.append(chunk_id)
+    
+    if not dry_run:
+        # Re-sync first so a project never loses its last copy
+        for project in projects.values():
+            _embed_project(project)
+        delete_chunks(ids=orphaned)
+    
+    return {
+        "projects": len(projects),
+        "vectors_scanned": len(stored["ids"]),
+        "orphaned_removed": len(orphaned),
+        "duplicates_removed": len(duplicates),
+    }
+
+def search_projects(
+    query: str,
+    top_k: int = 5,
+    score_threshold: Optional[float] = None,
+    status: Optional[str] = None,
+    technologies: Optional[List[str]] = None
+) -> List[Dict[str, Any]]:
+    """
+    Search projects by query.
+    Status and technology filters run inside the vector store. Each project
+    appears once, scored by the cosine similarity to the query of its best
+    matching chunk, whichever vector store backend is used.
+    """
+    # Build metadata filter
+    conditions = [{"source": "project"}]
+    if status:
+        conditions.append({"project_status": status})
+    for technology in technologies or []:
+        conditions.append({_technology_key(technology): True})
+    where = conditions[0] if len(conditions) == 1 else {"$and": conditions}
+    
+    # Projects can have several chunks, so fetch extra hits to fill top_k after dedupe
+    vectorstore = get_vectorstore()
+    results = vectorstore.similarity_search_with_score(
         query=query,
-        k=top_k,
-        filter={"source": "project"}
+        k=top_k * 3,
+        filter=where
     )
+    similarity = similarity_fn(vectorstore)
     
-    # Extract project IDs from results
-    project_ids = [doc.metadata.get("project_id") for doc in results if doc.metadata.get("project_id")]
-    
-    # Get projects by IDs
-    projects = []
-    for project_id in project_ids:
-        project = get_project(project_id)
-        if project and project not in projects:
-            projects.append(project)
+    # Keep the best score per project, in rank order
+    scores: Dict[str, float] = {}
+    for doc, distance in results:
+        score = similarity(distance)
+        project_id = doc.metadata.get("project_id")
+        if not project_id or project_id in scores:
+            continue
+        if score_threshold is not None and score < score_threshold:
+            break
+        scores[project_id] = score
+        if len(scores) == top_k:
+            break
     
-    return projects 
\ No newline at end of file
+    # Resolve all projects in one lookup
+    projects = get_project_store().get_many(scores)
+    return [
+        {**projects[project_id], "score": score}
+        for project_id, score in scores.items()
+        if project_id in projects
+    ]
@@ -0,0 +1,230 @@
+import hashlib
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+from langchain.chains.conversational_retrieval.prompts import CONDENSE_QUESTION_PROMPT
+from langchain_core.language_models import BaseLLM
+
+from core.response_cache import history_digest, normalize_question
+
+# Load environment variables
+load_dotenv()
+
+# How follow-up questions are turned into retrieval queries:
+# "none" searches with the question as asked, "heuristic" adds topic words from
+# the previous question when the question refers back to it, and "llm" asks the
+# LLM for a standalone question, but only when the question refers back
+QUERY_REWRITE_MODE = os.getenv("QUERY_REWRITE_MODE", "llm")
+
+# LLM rewrites kept
+QUERY_REWRITE_CACHE_SIZE = int(os.getenv("QUERY_REWRITE_CACHE_SIZE", "1024"))
+
+# Topic words taken from the previous question by the heuristic rewrite
+HEURISTIC_TOPIC_WORDS = 8
+
+# Pronouns that only make sense with the earlier conversation, unless the question names their subject first
+REFERENCE_WORDS = {
+    "it", "its", "itself", "they", "them", "their", "theirs", "themselves", "those",
+    "he", "him", "his", "himself", "she", "her", "hers", "herself", "former", "latter",
+}
+
+# Openings of elliptical follow-ups such as "and the second one?" or "why?"
+FOLLOW_UP_PREFIXES = ("and ", "also ", "but ", "so ", "what about", "how about", "why", "how come", "and?")
+
+# Questions this short are follow-ups unless they name their subject
+MIN_STANDALONE_WORDS = 3
+
+STOP_WORDS = {
+    "a", "an", "the", "and", "or", "but", "of", "to", "in", "on", "for", "with", "at", "by", "from",
+    "about", "as", "into", "is", "are", "was", "were", "be", "been", "do", "does", "did", "can",
+    "could", "would", "should", "will", "what", "which", "who", "whom", "whose", "when", "where",
+    "why", "how", "tell", "me", "you", "your", "i", "my", "we", "our", "please", "any", "some",
+    "has", "have", "had", "there", "give", "show", "list", "describe", "explain", "know",
+    "this", "that", "these", "then", "above", "same", "one", "ones", "else", "other", "another",
+    "more", "previous", "earlier",
+} | REFERENCE_WORDS
+
+_WORD_PATTERN = re.compile(r"[a-z0-9][a-z0-9+#.\-]*")
+
+# Clause boundaries, e.g. in "what is X, and who maintains it?"
+_CLAUSE_PATTERN = re.compile(r"[,;:?!]|\band\b")
+
+def _words(text: str) -> List[str]:
+    """
+    Split text into lowercase words.
+    """
+    return [word.rstrip(".-") for word in _WORD_PATTERN.findall(text.lower())]
+
+def _refers_back(question: str) -> bool:
+    """
+    Whether a question has a pronoun whose subject no earlier clause of the question names,
+    so "what is Kubernetes and who maintains it?" does not count but "who maintains it?" does.
+    """
+    named = False
+    for clause in _CLAUSE_PATTERN.split(question.lower()):
+        words = _words(clause)
+        if not named and any(word in REFERENCE_WORDS for word in words):
+            return True
+        named = named or any(word not in STOP_WORDS for word in words)
+    return False
+
+def needs_context(question: str) -> bool:
+    """
+    Whether a question refers to the earlier conversation, through a pronoun
+    whose subject it does not name, an elliptical opening like "what about",
+    or by being too short to stand alone.
+    """
+    if _refers_back(question):
+        return True
+    if question.strip().lower().startswith(FOLLOW_UP_PREFIXES):
+        return True
+    return len(_words(question)) < MIN_STANDALONE_WORDS
+
+def heuristic_rewrite(question: str, chat_history: List[Tuple[str, str]]) -> str:
+    """
+    Add the topic words of the most recent earlier question that has any,
+    so "what about its tech stack?" is searched together with what "it" was.
+    """
+    seen = set(_words(question))
+    for previous, _ in reversed(chat_history):
+        topic = []
+        for word in _words(previous):
+            if word not in STOP_WORDS and word not in seen:
+                seen.add(word)
+                topic.append(word)
+        if topic:
+            return f"{question} {' '.join(topic[:HEURISTIC_TOPIC_WORDS])}"
+    return question
+
+class QueryRewriter:
+    """
+    Turns follow-up questions into retrieval queries.
+    In "llm" mode the LLM is only asked when the question refers back to the
+    conversation; otherwise the question is searched as asked. LLM rewrites
+    are cached by (history digest, normalized question), so retried and
+    regenerated turns do not pay for the rewrite again.
+    """
+
+    def __init__(self, mode: str = QUERY_REWRITE_MODE, max_entries: int = QUERY_REWRITE_CACHE_SIZE):
+        if mode not in ("none", "heuristic", "llm"):
+            raise ValueError(f"Unknown query rewrite mode: {mode}")
+        self.mode = mode
+        self.max_entries = max_entries
+        self._rewrites: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counts = {
+            "questions": 0,
+            "no_history": 0,
+            "standalone": 0,
+            "heuristic": 0,
+            "cache_hits": 0,
+            "llm_calls": 0,
+            "llm_errors": 0,
+        }
+        self._llm_seconds = 0.0
+
+    def _count(self, name: str) -> None:
+        """
+        Increment a counter.
+        """
+        with self._lock:
+            self._counts[name] += 1
+
+    def _key(self, question: str, history: List[Tuple[str, str]]) -> str:
+        """
+        Get the cache key of a question in a conversation.
+        """
+        return hashlib.sha256(f"{history_digest(history)}\0{normalize_question(question)}".encode("utf-8")).hexdigest()
+
+    def _get(self, key: str) -> Optional[str]:
+        """
+        Get a cached rewrite.
+        """
+        with self._lock:
+            rewrite = self._rewrites.get(key)
+            if rewrite is not None:
+                self._rewrites.move_to_end(key)
+                self._counts["cache_hits"] += 1
+            return rewrite
+
+    def _put(self, key: str, rewrite: str) -> None:
+        """
+        Cache a rewrite, evicting the least recently used ones.
+        """
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._rewrites[key] = rewrite
+            while len(self._rewrites) > self.max_entries:
+                self._rewrites.popitem(last=False)
+
+    async def arewrite(
+        self,
+        question: str,
+        chat_history: List[Tuple[str, str]],
+        llm: BaseLLM,
+        history_text: str,
+        cache_history: Optional[List[Tuple[str, str]]] = None
+    ) -> str:
+        """
+        Get the retrieval query for a question.
+        history_text is the history shown to the LLM; cache_history is what the
+        rewrite is cached by and defaults to chat_history.
+        Falls back to the heuristic rewrite if the LLM call fails.
+        """
+        self._count("questions")
+        if self.mode == "none":
+            return question
+        if not history_text:
+            self._count("no_history")
+            return question
+        if not needs_context(question):
+            self._count("standalone")
+            return question
+        if self.mode == "heuristic":
+            self._count("heuristic")
+            return heuristic_rewrite(question, chat_history)
+
+        key = self._key(question, cache_history if cache_history is not None else chat_history)
+        rewrite = self._get(key)
+        if rewrite is not None:
+            return rewrite
+
+        start_time = time.perf_counter()
+        try:
+            standalone = await llm.ainvoke(
+                CONDENSE_QUESTION_PROMPT.format(chat_history=history_text, question=question)
+            )
+        except Exception:
+            self._count("llm_errors")
+            return heuristic_rewrite(question, chat_history)
+        finally:
+            with self._lock:
+                self._counts["llm_calls"] += 1
+                self._llm_seconds += time.perf_counter() - start_time
+
+        rewrite = standalone.strip() or question
+        self._put(key, rewrite)
+        return rewrite
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get rewrite counts, including how often the LLM was called.
+        """
+        with self._lock:
+            questions = self._counts["questions"]
+            llm_calls = self._counts["llm_calls"]
+            return {
+                "mode": self.mode,
+                **self._counts,
+                "cached_rewrites": len(self._rewrites),
+                "llm_call_rate": round(llm_calls / questions, 4) if questions else 0.0,
+                "llm_avg_ms": round(self._llm_seconds / llm_calls * 1000, 1) if llm_calls else 0.0,
+            }
+
+query_rewriter = QueryRewriter()
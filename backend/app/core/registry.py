@@ -0,0 +1,166 @@
+import os
+import threading
+from typing import Any, Dict, Optional, Tuple, Union
+
+import chromadb
+from chromadb.api import ClientAPI
+from chromadb.api.client import SharedSystemClient
+from langchain_huggingface import HuggingFaceEmbeddings
+from langchain_community.vectorstores import Chroma
+
+from core.embedding_cache import close_cache, get_cache
+from core.embedding_service import BatchingEmbeddings
+from core.numpy_store import NumpyVectorStore
+
+# Registry state, shared by every request in the process
+_lock = threading.RLock()
+_embeddings: Dict[str, BatchingEmbeddings] = {}
+_clients: Dict[str, ClientAPI] = {}
+_vectorstores: Dict[Tuple[str, str, str, str], Union[Chroma, NumpyVectorStore]] = {}
+_cross_encoders: Dict[str, Any] = {}
+
+def get_embeddings(model_name: str) -> BatchingEmbeddings:
+    """
+    Get the batching embedding service for a model name, loading the model on first use.
+    """
+    embeddings = _embeddings.get(model_name)
+    if embeddings is not None:
+        return embeddings
+
+    with _lock:
+        # Another thread may have loaded it while we waited for the lock
+        if model_name not in _embeddings:
+            _embeddings[model_name] = BatchingEmbeddings(
+                HuggingFaceEmbeddings(model_name=model_name),
+                model_name=model_name,
+                cache=get_cache()
+            )
+        return _embeddings[model_name]
+
+def get_cross_encoder(model_name: str) -> Any:
+    """
+    Get the sentence-transformers CrossEncoder for a model name, loading it on first use.
+    """
+    cross_encoder = _cross_encoders.get(model_name)
+    if cross_encoder is not None:
+        return cross_encoder
+
+    with _lock:
+        if model_name not in _cross_encoders:
+            # Imported here so processes that never rerank do not pay for it
+            from sentence_transformers import CrossEncoder
+            _cross_encoders[model_name] = CrossEncoder(model_name)
+        return _cross_encoders[model_name]
+
+def get_client(persist_directory: str) -> ClientAPI:
+    """
+    Get the persistent Chroma client for a directory, opening it on first use.
+    """
+    client = _clients.get(persist_directory)
+    if client is not None:
+        return client
+
+    with _lock:
+        if persist_directory not in _clients:
+            _clients[persist_directory] = chromadb.PersistentClient(path=persist_directory)
+        return _clients[persist_directory]
+
+def get_vectorstore(
+    collection_name: str,
+    model_name: str,
+    persist_directory: str,
+    backend: str = "chroma"
+) -> Union[Chroma, NumpyVectorStore]:
+    """
+    Get the vector store for a collection and embedding model.
+    backend is "chroma" or "numpy" (an in-process index stored under persist_directory/numpy).
+    """
+    key = (persist_directory, collection_name, model_name, backend)
+    vectorstore = _vectorstores.get(key)
+    if vectorstore is not None:
+        return vectorstore
+
+    with _lock:
+        if key not in _vectorstores:
+            if backend == "chroma":
+                _vectorstores[key] = Chroma(
+                    client=get_client(persist_directory),
+                    embedding_function=get_embeddings(model_name),
+                    collection_name=collection_name
+                )
+            elif backend == "numpy":
+                _vectorstores[key] = NumpyVectorStore(
+                    path=os.path.join(persist_directory, "numpy"),
+                    collection_name=collection_name,
+                    embedding_function=get_embeddings(model_name)
+                )
+            else:
+                raise ValueError(f"Unsupported vector backend: {backend}")
+        return _vectorstores[key]
+
+def reload(model_name: Optional[str] = None) -> None:
+    """
+    Drop cached models and vector stores so they are rebuilt on next use.
+    If model_name is given, only entries using that model are dropped.
+    """
+    with _lock:
+        if model_name is None:
+            for embeddings in _embeddings.values():
+                embeddings.close()
+            _embeddings.clear()
+            _vectorstores.clear()
+            _cross_encoders.clear()
+            return
+
+        _cross_encoders.pop(model_name, None)
+        embeddings = _embeddings.pop(model_name, None)
+        if embeddings is not None:
+            embeddings.close()
+        for key in [k for k in _vectorstores if k[2] == model_name]:
+            del _vectorstores[key]
+
+def close_directory(persist_directory: str) -> None:
+    """
+    Release the vector stores and Chroma client of one directory, freeing the
+    indexes Chroma keeps in memory for it. They are reopened on next use.
+    """
+    # Chroma shares one system per path in a private class attribute (chromadb 1.0.x, as
+    # pinned in requirements.txt). If an upgrade renames it, fail here instead of leaking
+    # the systems of every closed directory.
+    systems = getattr(SharedSystemClient, "_identifier_to_system", None)
+    if not isinstance(systems, dict):
+        raise RuntimeError(
+            "chromadb no longer has SharedSystemClient._identifier_to_system; "
+            "update registry.close_directory for this chromadb version"
+        )
+
+    with _lock:
+        for key in [k for k in _vectorstores if k[0] == persist_directory]:
+            del _vectorstores[key]
+        if _clients.pop(persist_directory, None) is not None:
+            # Stopping the path's system drops its loaded indexes
+            system = systems.pop(persist_directory, None)
+            if system is not None:
+                system.stop()
+
+def embedding_stats() -> Dict[str, Dict]:
+    """
+    Get batching metrics for every loaded embedding model.
+    """
+    return {model_name: embeddings.stats() for model_name, embeddings in list(_embeddings.items())}
+
+def shutdown() -> None:
+    """
+    Release every model, vector store and Chroma client held by the registry.
+    """
+    with _lock:
+        _vectorstores.clear()
+        for embeddings in _embeddings.values():
+            embeddings.close()
+        _embeddings.clear()
+        _cross_encoders.clear()
+        _clients.clear()
+        close_cache()
+
+        # Chroma keeps one system per path alive until its cache is cleared
+        SharedSystemClient.clear_system_cache()
@@ -0,0 +1,194 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+from langchain_core.documents import Document
+
+from core import registry
+from core.context import estimate_tokens
+from core.response_cache import normalize_question
+
+# Load environment variables
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Whether chat requests rerank retrieved chunks unless the request says otherwise
+RERANK_ENABLED = os.getenv("RERANK_ENABLED", "true").lower() == "true"
+
+# Small cross-encoder that scores (question, chunk) pairs on the CPU
+RERANK_MODEL_NAME = os.getenv("RERANK_MODEL_NAME", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+
+# Chunks retrieved for the cross-encoder to choose from
+RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", "30"))
+
+# Chunks scoring below this relevance (0-1, the sigmoid of the cross-encoder's logit) are left out of the prompt
+RERANK_MIN_SCORE = float(os.getenv("RERANK_MIN_SCORE", "0.1"))
+
+# Pairs scored per forward pass
+RERANK_BATCH_SIZE = int(os.getenv("RERANK_BATCH_SIZE", "32"))
+
+# (question, chunk) scores kept
+RERANK_CACHE_SIZE = int(os.getenv("RERANK_CACHE_SIZE", "8192"))
+
+# Most candidates a request may ask for
+MAX_RERANK_CANDIDATES = 100
+
+def resolve_options(options: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Fill a request's rerank options ("enabled", "candidates", "min_score") with the configured defaults.
+    """
+    options = {key: value for key, value in (options or {}).items() if value is not None}
+    return {
+        "enabled": options.get("enabled", RERANK_ENABLED),
+        "candidates": min(options.get("candidates", RERANK_CANDIDATES), MAX_RERANK_CANDIDATES),
+        "min_score": options.get("min_score", RERANK_MIN_SCORE),
+    }
+
+class Reranker:
+    """
+    Reorders retrieved chunks by a cross-encoder's relevance score and drops
+    chunks below a cutoff, so only relevant context reaches the prompt.
+
+    Retrieval over-fetches candidates; their scores are looked up in an LRU
+    cache keyed by (question, chunk text) and only the misses are sent to the
+    model, in batches of batch_size pairs. If the model fails, rerank returns
+    None so the caller keeps the retrieval order.
+    """
+
+    def __init__(
+        self,
+        model_name: str = RERANK_MODEL_NAME,
+        batch_size: int = RERANK_BATCH_SIZE,
+        cache_size: int = RERANK_CACHE_SIZE
+    ):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.cache_size = cache_size
+        self._scores: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.Lock()
+        # One forward pass at a time; the model already uses every core
+        self._model_lock = threading.Lock()
+        self._counts = {
+            "requests": 0,
+            "candidates": 0,
+            "kept": 0,
+            "below_cutoff": 0,
+            "cache_hits": 0,
+            "scored": 0,
+            "errors": 0,
+        }
+        self._seconds = 0.0
+        self._tokens_before = 0
+        self._tokens_after = 0
+
+    def _key(self, query: str, text: str) -> str:
+        """
+        Get the cache key of a (question, chunk) pair.
+        """
+        return hashlib.sha256(f"{self.model_name}\0{normalize_question(query)}\0{text}".encode("utf-8")).hexdigest()
+
+    def score(self, query: str, texts: List[str]) -> List[float]:
+        """
+        Score each text's relevance (0-1) to a query. Blocks while the model runs.
+        The model's logits go through a sigmoid whatever activation its config
+        names, so RERANK_MIN_SCORE means the same for every model.
+        """
+        keys = [self._key(query, text) for text in texts]
+        scores: List[Optional[float]] = []
+        with self._lock:
+            for key in keys:
+                score = self._scores.get(key)
+                if score is not None:
+                    self._scores.move_to_end(key)
+                scores.append(score)
+
+        missing = [i for i, score in enumerate(scores) if score is None]
+        if missing:
+            from torch.nn import Sigmoid
+
+            model = registry.get_cross_encoder(self.model_name)
+            with self._model_lock:
+                computed = model.predict(
+                    [(query, texts[i]) for i in missing],
+                    batch_size=self.batch_size,
+                    show_progress_bar=False,
+                    activation_fn=Sigmoid(),
+                    convert_to_numpy=True
+                )
+            with self._lock:
+                for i, score in zip(missing, computed.tolist()):
+                    scores[i] = score
+                    if self.cache_size > 0:
+                        self._scores[keys[i]] = score
+                while len(self._scores) > self.cache_size:
+                    self._scores.popitem(last=False)
+
+        with self._lock:
+            self._counts["cache_hits"] += len(texts) - len(missing)
+            self._counts["scored"] += len(missing)
+        return scores
+
+    def rerank(
+        self,
+        query: str,
+        scored_docs: List[Tuple[Document, float]],
+        top_k: int,
+        min_score: float = RERANK_MIN_SCORE
+    ) -> Optional[List[Tuple[Document, float]]]:
+        """
+        Get the top_k candidates by cross-encoder score as (document, score),
+        best first, leaving out those scoring below min_score.
+        Returns None if the model fails.
+        """
+        if not scored_docs:
+            return []
+
+        start_time = time.perf_counter()
+        try:
+            scores = self.score(query, [doc.page_content for doc, _ in scored_docs])
+        except Exception:
+            logger.exception("Reranking with %s failed, keeping the retrieval order", self.model_name)
+            with self._lock:
+                self._counts["errors"] += 1
+            return None
+
+        ranked = sorted(zip((doc for doc, _ in scored_docs), scores), key=lambda item: item[1], reverse=True)
+        relevant = [(doc, score) for doc, score in ranked if score >= min_score]
+        kept = relevant[:top_k]
+
+        with self._lock:
+            self._counts["requests"] += 1
+            self._counts["candidates"] += len(scored_docs)
+            self._counts["kept"] += len(kept)
+            self._counts["below_cutoff"] += len(ranked) - len(relevant)
+            self._seconds += time.perf_counter() - start_time
+            # What the prompt would have held without reranking, and what it holds now
+            self._tokens_before += sum(estimate_tokens(doc.page_content) for doc, _ in scored_docs[:top_k])
+            self._tokens_after += sum(estimate_tokens(doc.page_content) for doc, _ in kept)
+        return kept
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get rerank counts, mean latency and the context size before and after reranking.
+        """
+        with self._lock:
+            requests = self._counts["requests"]
+            lookups = self._counts["cache_hits"] + self._counts["scored"]
+            return {
+                "enabled": RERANK_ENABLED,
+                "model": self.model_name,
+                **self._counts,
+                "cached_scores": len(self._scores),
+                "cache_hit_rate": round(self._counts["cache_hits"] / lookups, 4) if lookups else 0.0,
+                "avg_ms": round(self._seconds / requests * 1000, 1) if requests else 0.0,
+                "avg_context_tokens_before": round(self._tokens_before / requests, 1) if requests else 0.0,
+                "avg_context_tokens_after": round(self._tokens_after / requests, 1) if requests else 0.0,
+            }
+
+reranker = Reranker()
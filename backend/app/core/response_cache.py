@@ -0,0 +1,184 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from dotenv import load_dotenv
+
+from core import registry
+from core.embeddings import EMBEDDING_MODEL_NAME, on_collection_change
+
+# Load environment variables
+load_dotenv()
+
+# Maximum number of cached answers; 0 disables the cache
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "256"))
+
+# Seconds before a cached answer expires
+RESPONSE_CACHE_TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "3600"))
+
+# Cosine similarity above which a different question reuses a cached answer;
+# set above 1 to only serve exact matches
+RESPONSE_CACHE_SIMILARITY = float(os.getenv("RESPONSE_CACHE_SIMILARITY", "0.95"))
+
+def normalize_question(question: str) -> str:
+    """
+    Normalize a question for exact matching: lowercase, single spaces, no trailing punctuation.
+    """
+    return " ".join(question.lower().split()).rstrip("?!. ")
+
+def history_digest(chat_history: List[Tuple[str, str]]) -> str:
+    """
+    Get a digest of the chat history, so answers are only shared between identical conversations.
+    """
+    return hashlib.sha256(json.dumps(chat_history).encode("utf-8")).hexdigest()
+
+class ResponseCache:
+    """
+    LRU cache of chat answers with a TTL.
+
+    Answers are found by exact match on (normalized question, history digest,
+    collection version), or failing that by the cosine similarity of the
+    question embedding to cached questions with the same history and version.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = RESPONSE_CACHE_MAX_ENTRIES,
+        ttl_seconds: float = RESPONSE_CACHE_TTL_SECONDS,
+        similarity_threshold: float = RESPONSE_CACHE_SIMILARITY
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        """Whether answers are cached at all."""
+        return self.max_entries > 0
+
+    @property
+    def semantic(self) -> bool:
+        """Whether similar (not only identical) questions are matched."""
+        return self.similarity_threshold <= 1
+
+    def _key(self, question: str, digest: str, version: int) -> str:
+        """
+        Get the exact-match key for a question.
+        """
+        return hashlib.sha256(f"{normalize_question(question)}\0{digest}\0{version}".encode("utf-8")).hexdigest()
+
+    def _embed(self, question: str) -> np.ndarray:
+        """
+        Embed and L2-normalize a question.
+        """
+        vector = registry.get_embeddings(EMBEDDING_MODEL_NAME).encode([question])[0]
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _evict_expired(self, now: float) -> None:
+        """
+        Drop expired entries. Caller holds the lock.
+        """
+        expired = [key for key, entry in self._entries.items() if now - entry["created_at"] > self.ttl_seconds]
+        for key in expired:
+            del self._entries[key]
+
+    def get(self, question: str, chat_history: List[Tuple[str, str]], version: int) -> Optional[Dict[str, Any]]:
+        """
+        Get a cached result for a question, or None. Blocks while embedding the question.
+        """
+        if not self.enabled:
+            return None
+
+        digest = history_digest(chat_history)
+        key = self._key(question, digest, version)
+        now = time.time()
+
+        with self._lock:
+            self._evict_expired(now)
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.exact_hits += 1
+                return entry["result"]
+
+            candidates = [
+                (cached_key, entry) for cached_key, entry in self._entries.items()
+                if entry["history_digest"] == digest and entry["version"] == version
+            ]
+
+        if self.semantic and candidates:
+            query = self._embed(question)
+            similarities = np.vstack([entry["embedding"] for _, entry in candidates]) @ query
+            best = int(np.argmax(similarities))
+            if similarities[best] >= self.similarity_threshold:
+                cached_key, entry = candidates[best]
+                with self._lock:
+                    if cached_key in self._entries:
+                        self._entries.move_to_end(cached_key)
+                    self.semantic_hits += 1
+                return entry["result"]
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, question: str, chat_history: List[Tuple[str, str]], version: int, result: Dict[str, Any]) -> None:
+        """
+        Cache a result for a question. Blocks while embedding the question.
+        """
+        if not self.enabled:
+            return
+
+        digest = history_digest(chat_history)
+        entry = {
+            "result": result,
+            "history_digest": digest,
+            "version": version,
+            "embedding": self._embed(question) if self.semantic else None,
+            "created_at": time.time(),
+        }
+
+        with self._lock:
+            key = self._key(question, digest, version)
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """
+        Drop every cached answer.
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get hit/miss counts and the cache size.
+        """
+        with self._lock:
+            lookups = self.exact_hits + self.semantic_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "exact_hits": self.exact_hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "hit_rate": (self.exact_hits + self.semantic_hits) / lookups if lookups else 0.0,
+            }
+
+response_cache = ResponseCache()
+
+# Answers may cite documents that changed, so drop them on every write
+on_collection_change(response_cache.clear)
@@ -0,0 +1,141 @@
+import os
+from typing import Callable, Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+from langchain_core.documents import Document
+
+from core import metrics
+from core.embeddings import get_keyword_index, get_vectorstore
+from core.numpy_store import NumpyVectorStore
+
+# Load environment variables
+load_dotenv()
+
+# "hybrid" runs BM25 alongside the vector search; "vector" uses the vector search only
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "hybrid")
+
+# Candidates taken from each retriever before fusion
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "20"))
+
+# Reciprocal rank fusion constant; larger values flatten the weight of top ranks
+RRF_K = 60
+
+def vector_search(
+    query: str,
+    k: int,
+    where: Optional[dict] = None,
+    domain: Optional[str] = None
+) -> List[Tuple[str, Document, float]]:
+    """
+    Get the k nearest chunks to a query in a domain as (chunk id, document, distance).
+    """
+    vectorstore = get_vectorstore(domain)
+    with metrics.stage("query_embedding"):
+        query_embedding = vectorstore.embeddings.embed_query(query)
+    with metrics.stage("vector_search"):
+        results = vectorstore._collection.query(
+            query_embeddings=[query_embedding],
+            n_results=k,
+            where=where,
+            include=["documents", "metadatas", "distances"]
+        )
+    return [
+        (chunk_id, Document(page_content=text, metadata=metadata or {}, id=chunk_id), distance)
+        for chunk_id, text, metadata, distance in zip(
+            results["ids"][0], results["documents"][0], results["metadatas"][0], results["distances"][0]
+        )
+    ]
+
+def keyword_search(query: str, k: int, domain: Optional[str] = None) -> List[Tuple[str, float]]:
+    """
+    Get the k best BM25 matches for a query in a domain as (chunk id, score).
+    """
+    with metrics.stage("keyword_search"):
+        return get_keyword_index(domain).search(query, k)
+
+def reciprocal_rank_fusion(rankings: List[List[str]], k: int = RRF_K) -> List[Tuple[str, float]]:
+    """
+    Merge ranked id lists, scoring each id by the sum of 1 / (k + rank) over the lists it appears in.
+    """
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, chunk_id in enumerate(ranking, start=1):
+            scores[chunk_id] = scores.get(chunk_id, 0.0) + 1 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+def _get_documents(ids: List[str], domain: Optional[str] = None) -> Dict[str, Document]:
+    """
+    Fetch chunks by id from a domain's vector store.
+    """
+    if not ids:
+        return {}
+    with metrics.stage("fetch_documents"):
+        results = get_vectorstore(domain)._collection.get(ids=ids, include=["documents", "metadatas"])
+    return {
+        chunk_id: Document(page_content=text, metadata=metadata or {}, id=chunk_id)
+        for chunk_id, text, metadata in zip(results["ids"], results["documents"], results["metadatas"])
+    }
+
+def similarity_fn(vectorstore) -> Callable[[float], float]:
+    """
+    Get the function turning a vector store's distances into cosine similarities.
+    Chroma defaults to squared L2 distance, which is 2 - 2 * cosine for normalized embeddings.
+    """
+    if isinstance(vectorstore, NumpyVectorStore):
+        return lambda distance: 1.0 - distance
+    if (vectorstore._collection.metadata or {}).get("hnsw:space", "l2") == "l2":
+        return lambda distance: 1.0 - distance / 2
+    return lambda distance: 1.0 - distance
+
+def retrieve_with_similarities(
+    query: str,
+    k: int,
+    mode: str = RETRIEVAL_MODE,
+    domain: Optional[str] = None
+) -> Tuple[List[Tuple[Document, float]], Dict[str, float]]:
+    """
+    Retrieve the k most relevant chunks for a query as (document, score), best first,
+    and the cosine similarity to the query of each chunk the vector search found, by chunk id.
+    Only the domain's collection (the default one if None) is searched.
+    In hybrid mode, vector and BM25 results are merged with reciprocal rank fusion,
+    so exact matches on names, technologies and IDs are not missed.
+    Scores are reciprocal rank fusion scores in both modes: they order the chunks
+    but say nothing about how relevant they are, which the similarities do.
+    """
+    candidates = k if mode == "vector" else max(k, HYBRID_CANDIDATES)
+    vector_hits = vector_search(query, candidates, domain=domain)
+    similarity = similarity_fn(get_vectorstore(domain))
+    similarities = {chunk_id: similarity(distance) for chunk_id, _, distance in vector_hits}
+
+    if mode == "vector":
+        return [(doc, 1 / (RRF_K + rank)) for rank, (_, doc, _) in enumerate(vector_hits, start=1)], similarities
+
+    keyword_hits = keyword_search(query, candidates, domain=domain)
+
+    fused = reciprocal_rank_fusion([
+        [chunk_id for chunk_id, _, _ in vector_hits],
+        [chunk_id for chunk_id, _ in keyword_hits],
+    ])[:k]
+
+    # Keyword-only hits still need their text and metadata
+    documents = {chunk_id: doc for chunk_id, doc, _ in vector_hits}
+    documents.update(_get_documents([chunk_id for chunk_id, _ in fused if chunk_id not in documents], domain))
+
+    return [(documents[chunk_id], score) for chunk_id, score in fused if chunk_id in documents], similarities
+
+def retrieve_with_scores(
+    query: str,
+    k: int,
+    mode: str = RETRIEVAL_MODE,
+    domain: Optional[str] = None
+) -> List[Tuple[Document, float]]:
+    """
+    Retrieve the k most relevant chunks for a query in a domain as (document, reciprocal rank fusion score), best first.
+    """
+    return retrieve_with_similarities(query, k, mode, domain)[0]
+
+def retrieve(query: str, k: int, mode: str = RETRIEVAL_MODE, domain: Optional[str] = None) -> List[Document]:
+    """
+    Retrieve the k most relevant chunks for a query in a domain.
+    """
+    return [doc for doc, _ in retrieve_with_scores(query, k, mode, domain)]
@@ -0,0 +1,313 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from dotenv import load_dotenv
+from langchain_core.language_models import BaseLLM
+
+from core.concurrency import run_blocking
+from core.context import SUMMARY_PROMPT
+
+# Load environment variables
+load_dotenv()
+
+# "window" keeps only the latest turns; "summary" also folds older turns into a running summary
+SESSION_MEMORY = os.getenv("SESSION_MEMORY", "summary")
+
+# Turns kept word for word per session
+SESSION_WINDOW_TURNS = int(os.getenv("SESSION_WINDOW_TURNS", "6"))
+
+# Sessions kept in memory; the least recently used are evicted first
+SESSION_MAX_SESSIONS = int(os.getenv("SESSION_MAX_SESSIONS", "1000"))
+
+# Total characters of conversation kept in memory across sessions
+SESSION_MAX_CHARS = int(os.getenv("SESSION_MAX_CHARS", str(20 * 1024 * 1024)))
+
+# Sessions idle for longer than this are deleted
+SESSION_IDLE_SECONDS = int(os.getenv("SESSION_IDLE_SECONDS", "3600"))
+
+# Optional SQLite file that keeps sessions across restarts and memory evictions
+SESSION_DB = os.getenv("SESSION_DB")
+
+# Seconds between sweeps for idle sessions
+_SWEEP_INTERVAL = 60
+
+def _session_size(session: Dict[str, Any]) -> int:
+    """
+    Get the number of characters of conversation a session holds.
+    """
+    turns = session["turns"] + session["unsummarized"]
+    return len(session["summary"]) + sum(len(question) + len(answer) for question, answer in turns)
+
+class SessionStore:
+    """
+    Server-side conversation memory keyed by session ID.
+    Sessions live in an in-memory LRU bounded by count and total size, and
+    are optionally written through to SQLite so evicted sessions can be
+    reloaded. Each session keeps its last SESSION_WINDOW_TURNS turns; in
+    summary mode older turns are folded into a running summary by the LLM in
+    the background, and are kept as "unsummarized" turns until that is done.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = SESSION_DB,
+        memory: str = SESSION_MEMORY,
+        window_turns: int = SESSION_WINDOW_TURNS,
+        max_sessions: int = SESSION_MAX_SESSIONS,
+        max_chars: int = SESSION_MAX_CHARS,
+        idle_seconds: int = SESSION_IDLE_SECONDS
+    ):
+        self.memory = memory
+        self.window_turns = window_turns
+        self.max_sessions = max_sessions
+        self.max_chars = max_chars
+        self.idle_seconds = idle_seconds
+        self._sessions: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._chars = 0
+        self._lock = threading.RLock()
+        self._summarizing: Set[str] = set()
+        self._tasks: Set[asyncio.Task] = set()
+        self._last_sweep = time.time()
+        self._evictions = 0
+        self._expirations = 0
+
+        self._conn = None
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                "id TEXT PRIMARY KEY, data TEXT NOT NULL, updated_at REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_updated_at ON sessions(updated_at)")
+            self._conn.commit()
+
+    def _cache(self, session: Dict[str, Any]) -> None:
+        """
+        Put a session at the front of the LRU, evicting others over the limits. Caller holds the lock.
+        """
+        previous = self._sessions.pop(session["id"], None)
+        if previous is not None:
+            self._chars -= previous["size"]
+        session["size"] = _session_size(session)
+        self._sessions[session["id"]] = session
+        self._chars += session["size"]
+
+        while len(self._sessions) > 1 and (len(self._sessions) > self.max_sessions or self._chars > self.max_chars):
+            _, evicted = self._sessions.popitem(last=False)
+            self._chars -= evicted["size"]
+            self._evictions += 1
+
+    def _save(self, session: Dict[str, Any]) -> None:
+        """
+        Write a session through to SQLite. Caller holds the lock.
+        """
+        if self._conn is None:
+            return
+        data = {key: session[key] for key in ("id", "turns", "unsummarized", "summary", "created_at")}
+        self._conn.execute(
+            "INSERT OR REPLACE INTO sessions (id, data, updated_at) VALUES (?, ?, ?)",
+            (session["id"], json.dumps(data), session["updated_at"])
+        )
+        self._conn.commit()
+
+    def _sweep(self) -> None:
+        """
+        Delete sessions idle for longer than idle_seconds. Caller holds the lock.
+        """
+        now = time.time()
+        if now - self._last_sweep < _SWEEP_INTERVAL:
+            return
+        self._last_sweep = now
+
+        cutoff = now - self.idle_seconds
+        for session_id in [key for key, session in self._sessions.items() if session["updated_at"] < cutoff]:
+            self._chars -= self._sessions.pop(session_id)["size"]
+            self._expirations += 1
+        if self._conn is not None:
+            self._conn.execute("DELETE FROM sessions WHERE updated_at < ?", (cutoff,))
+            self._conn.commit()
+
+    def _load(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Get a session from memory or SQLite. Caller holds the lock.
+        """
+        self._sweep()
+        session = self._sessions.get(session_id)
+        if session is None and self._conn is not None:
+            row = self._conn.execute(
+                "SELECT data, updated_at FROM sessions WHERE id = ? AND updated_at >= ?",
+                (session_id, time.time() - self.idle_seconds)
+            ).fetchone()
+            if row:
+                session = dict(json.loads(row[0]), updated_at=row[1])
+                session["turns"] = [tuple(turn) for turn in session["turns"]]
+                session["unsummarized"] = [tuple(turn) for turn in session["unsummarized"]]
+        if session is not None and session["updated_at"] < time.time() - self.idle_seconds:
+            return None
+        return session
+
+    def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Get a snapshot of a session, or None if it does not exist or has expired.
+        """
+        with self._lock:
+            session = self._load(session_id)
+            if session is None:
+                return None
+            self._cache(session)
+            return {key: value for key, value in session.items() if key != "size"}
+
+    def create(self) -> str:
+        """
+        Start an empty session and return its ID.
+        """
+        now = time.time()
+        session = {
+            "id": str(uuid.uuid4()),
+            "turns": [],
+            "unsummarized": [],
+            "summary": "",
+            "created_at": now,
+            "updated_at": now,
+        }
+        with self._lock:
+            self._sweep()
+            self._cache(session)
+            self._save(session)
+        return session["id"]
+
+    def history(self, session_id: str) -> Tuple[List[Tuple[str, str]], str]:
+        """
+        Get a session's (question, answer) turns and the summary of turns before them.
+        Raises KeyError if the session does not exist.
+        """
+        session = self.get(session_id)
+        if session is None:
+            raise KeyError(session_id)
+        return session["unsummarized"] + session["turns"], session["summary"]
+
+    def append(self, session_id: str, question: str, answer: str) -> bool:
+        """
+        Add a turn to a session. Turns that leave the window are dropped, or in
+        summary mode kept as unsummarized turns.
+        Returns whether the session has turns waiting to be summarized.
+        Raises KeyError if the session does not exist.
+        """
+        with self._lock:
+            session = self._load(session_id)
+            if session is None:
+                raise KeyError(session_id)
+
+            session["turns"] = session["turns"] + [(question, answer)]
+            overflow = session["turns"][:-self.window_turns] if self.window_turns else session["turns"]
+            session["turns"] = session["turns"][len(overflow):]
+            if self.memory == "summary":
+                session["unsummarized"] = session["unsummarized"] + overflow
+            session["updated_at"] = time.time()
+            self._cache(session)
+            self._save(session)
+            return bool(session["unsummarized"])
+
+    async def aappend(self, session_id: str, question: str, answer: str, llm: BaseLLM) -> None:
+        """
+        Add a turn to a session without blocking the event loop, and fold
+        turns that left the window into the summary in the background.
+        Raises KeyError if the session does not exist.
+        """
+        if not await run_blocking(self.append, session_id, question, answer):
+            return
+
+        with self._lock:
+            if session_id in self._summarizing:
+                return
+            self._summarizing.add(session_id)
+        # Keep a reference so the task is not garbage collected before it finishes
+        task = asyncio.get_running_loop().create_task(self._summarize(session_id, llm))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _summarize(self, session_id: str, llm: BaseLLM) -> None:
+        """
+        Fold a session's unsummarized turns into its summary.
+        """
+        try:
+            session = await run_blocking(self.get, session_id)
+            if session is None or not session["unsummarized"]:
+                return
+            turns = session["unsummarized"]
+            summary = await llm.ainvoke(SUMMARY_PROMPT.format(
+                summary=session["summary"] or "(none)",
+                new_lines="".join(f"\nHuman: {human}\nAssistant: {ai}" for human, ai in turns)
+            ))
+
+            await run_blocking(self._fold, session_id, len(turns), summary.strip())
+        except Exception:
+            # Unsummarized turns are kept and retried after the next turn
+            pass
+        finally:
+            with self._lock:
+                self._summarizing.discard(session_id)
+
+    def _fold(self, session_id: str, count: int, summary: str) -> None:
+        """
+        Replace a session's summary with one that covers its first count unsummarized turns.
+        """
+        with self._lock:
+            session = self._load(session_id)
+            if session is None:
+                return
+            # Turns added while the LLM was running stay for the next fold
+            session["unsummarized"] = session["unsummarized"][count:]
+            session["summary"] = summary
+            self._cache(session)
+            self._save(session)
+
+    def delete(self, session_id: str) -> bool:
+        """
+        Delete a session. Returns whether it existed.
+        """
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+            if session is not None:
+                self._chars -= session["size"]
+            deleted = session is not None
+            if self._conn is not None:
+                cursor = self._conn.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+                self._conn.commit()
+                deleted = deleted or cursor.rowcount > 0
+            return deleted
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get session store statistics.
+        """
+        with self._lock:
+            return {
+                "memory": self.memory,
+                "sessions_in_memory": len(self._sessions),
+                "chars_in_memory": self._chars,
+                "summarizing": len(self._summarizing),
+                "evictions": self._evictions,
+                "expirations": self._expirations,
+                "persistent": self._conn is not None,
+            }
+
+    def close(self) -> None:
+        """
+        Close the SQLite connection.
+        """
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+session_store = SessionStore()
@@ -0,0 +1,146 @@
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from dotenv import load_dotenv
+
+from core import registry
+from core.bm25 import BM25_INDEX_PATH, close_bm25_index
+from core.dedup import DEDUP_INDEX_PATH, close_dedup_index
+
+# Load environment variables
+load_dotenv()
+
+# Documents without a domain, and projects, live in the collection in this directory
+CHROMA_PERSIST_DIRECTORY = os.getenv("CHROMA_PERSIST_DIRECTORY", "./chroma_db")
+
+# Each other domain gets its own Chroma directory and keyword index under here
+DOMAINS_DIRECTORY = os.getenv("DOMAINS_DIRECTORY", os.path.join(CHROMA_PERSIST_DIRECTORY, "domains"))
+
+# Domains kept open at once; beyond this the least recently used idle ones are closed
+TENANT_MAX_LOADED = int(os.getenv("TENANT_MAX_LOADED", "8"))
+
+# Seconds a domain must go unused before it can be closed, so requests never lose their store mid-way
+TENANT_MIN_IDLE_SECONDS = float(os.getenv("TENANT_MIN_IDLE_SECONDS", "60"))
+
+# Lowercase letters, digits, "-" and "_", so a domain is always a safe directory name
+_DOMAIN_PATTERN = re.compile(r"^[a-z0-9][a-z0-9_-]{0,63}$")
+
+def normalize_domain(domain: Optional[str]) -> Optional[str]:
+    """
+    Get the canonical form of a domain name, or None for the default domain.
+    Raises ValueError for names that are not allowed.
+    """
+    if domain is None or not domain.strip():
+        return None
+    domain = domain.strip().lower()
+    if not _DOMAIN_PATTERN.match(domain):
+        raise ValueError(f"Invalid domain {domain!r}: use up to 64 letters, digits, '-' and '_'")
+    return domain
+
+def domain_directory(domain: Optional[str]) -> str:
+    """
+    Get the Chroma directory of a domain.
+    """
+    return CHROMA_PERSIST_DIRECTORY if domain is None else os.path.join(DOMAINS_DIRECTORY, domain)
+
+def keyword_index_path(domain: Optional[str]) -> str:
+    """
+    Get the keyword index file of a domain.
+    """
+    return BM25_INDEX_PATH if domain is None else os.path.join(domain_directory(domain), "bm25_index.pkl")
+
+def dedup_index_path(domain: Optional[str]) -> str:
+    """
+    Get the dedup index file of a domain.
+    """
+    return DEDUP_INDEX_PATH if domain is None else os.path.join(domain_directory(domain), "dedup_index.sqlite3")
+
+def domain_exists(domain: Optional[str]) -> bool:
+    """
+    Whether anything was ever stored in a domain. The default domain always exists.
+    """
+    return domain is None or os.path.isdir(domain_directory(domain))
+
+def list_domains() -> List[str]:
+    """
+    Get the names of every domain with stored documents, besides the default one.
+    """
+    if not os.path.isdir(DOMAINS_DIRECTORY):
+        return []
+    return sorted(name for name in os.listdir(DOMAINS_DIRECTORY) if _DOMAIN_PATTERN.match(name))
+
+class LoadedDomains:
+    """
+    Tracks which domains have their vector store and keyword index open, and
+    closes the least recently used ones when more than max_loaded are open.
+
+    Only domains unused for min_idle_seconds are closed, so a busy set of
+    domains can briefly exceed the budget. The default domain stays open.
+    """
+
+    def __init__(self, max_loaded: int = TENANT_MAX_LOADED, min_idle_seconds: float = TENANT_MIN_IDLE_SECONDS):
+        self.max_loaded = max_loaded
+        self.min_idle_seconds = min_idle_seconds
+        self._last_used: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._opened = 0
+        self._evicted = 0
+
+    def touch(self, domain: Optional[str]) -> None:
+        """
+        Record that a domain is being used, closing idle domains over the budget.
+        """
+        if domain is None:
+            return
+
+        now = time.monotonic()
+        with self._lock:
+            if domain not in self._last_used:
+                self._opened += 1
+            self._last_used[domain] = now
+            self._last_used.move_to_end(domain)
+
+            excess = len(self._last_used) - self.max_loaded
+            evicted = []
+            for name, last_used in list(self._last_used.items()):
+                if excess <= 0 or now - last_used < self.min_idle_seconds:
+                    break
+                del self._last_used[name]
+                evicted.append(name)
+                excess -= 1
+            self._evicted += len(evicted)
+
+        for name in evicted:
+            self.close(name)
+
+    def close(self, domain: str) -> None:
+        """
+        Save and release a domain's keyword index, dedup index and vector store.
+        """
+        with self._lock:
+            self._last_used.pop(domain, None)
+        close_bm25_index(keyword_index_path(domain))
+        close_dedup_index(dedup_index_path(domain))
+        registry.close_directory(domain_directory(domain))
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get the open domains, most recently used first, and how many were opened and closed.
+        """
+        now = time.monotonic()
+        with self._lock:
+            return {
+                "max_loaded": self.max_loaded,
+                "loaded": [
+                    {"domain": name, "idle_seconds": round(now - last_used, 1)}
+                    for name, last_used in reversed(self._last_used.items())
+                ],
+                "opened": self._opened,
+                "evicted": self._evicted,
+            }
+
+loaded_domains = LoadedDomains()
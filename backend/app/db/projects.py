@@ -0,0 +1,224 @@
+import json
+import os
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Iterable, List, Optional
+
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+DATA_DIRECTORY = os.path.join(os.path.dirname(__file__), "../../data")
+
+# Path to the JSON file used by the original store, migrated into SQLite on first use
+PROJECTS_FILE = os.path.join(DATA_DIRECTORY, "projects.json")
+
+# Storage backend for projects: "sqlite" (default) or "json"
+PROJECT_STORE_BACKEND = os.getenv("PROJECT_STORE_BACKEND", "sqlite")
+
+# Path to the SQLite project database
+PROJECTS_DB = os.getenv("PROJECTS_DB", os.path.join(DATA_DIRECTORY, "projects.sqlite3"))
+
+# SQLite limits the number of parameters per statement
+_SQL_BATCH = 500
+
+class ProjectStore(ABC):
+    """
+    Storage backend for project records.
+    """
+
+    @abstractmethod
+    def get(self, project_id: str) -> Optional[Dict[str, Any]]:
+        """Get a project by ID."""
+
+    @abstractmethod
+    def get_many(self, project_ids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """Get several projects by ID in one lookup, keyed by ID. Missing IDs are left out."""
+
+    @abstractmethod
+    def list(self, status: Optional[str] = None, limit: Optional[int] = None, offset: int = 0) -> List[Dict[str, Any]]:
+        """List projects in insertion order, optionally filtered by status and paginated."""
+
+    @abstractmethod
+    def upsert(self, project: Dict[str, Any]) -> None:
+        """Insert a project or replace the one with the same ID."""
+
+    @abstractmethod
+    def delete(self, project_id: str) -> bool:
+        """Delete a project, returning whether it existed."""
+
+    def upsert_many(self, projects: Iterable[Dict[str, Any]]) -> None:
+        """Insert or replace several projects."""
+        for project in projects:
+            self.upsert(project)
+
+class JSONProjectStore(ProjectStore):
+    """
+    Projects kept in a single JSON file, read and rewritten in full on every call.
+    """
+
+    def __init__(self, path: str = PROJECTS_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    def _load(self) -> List[Dict[str, Any]]:
+        """Read every project from the file."""
+        if not os.path.exists(self.path):
+            return []
+        with open(self.path, "r") as f:
+            try:
+                return json.load(f)
+            except json.JSONDecodeError:
+                return []
+
+    def _save(self, projects: List[Dict[str, Any]]) -> None:
+        """Rewrite the file with the given projects."""
+        with open(self.path, "w") as f:
+            json.dump(projects, f, indent=2)
+
+    def get(self, project_id):
+        return self.get_many([project_id]).get(project_id)
+
+    def get_many(self, project_ids):
+        wanted = set(project_ids)
+        with self._lock:
+            return {p["id"]: p for p in self._load() if p.get("id") in wanted}
+
+    def list(self, status=None, limit=None, offset=0):
+        with self._lock:
+            projects = self._load()
+        if status:
+            projects = [p for p in projects if p.get("status") == status]
+        return projects[offset:offset + limit if limit is not None else None]
+
+    def upsert(self, project):
+        self.upsert_many([project])
+
+    def upsert_many(self, projects):
+        with self._lock:
+            stored = self._load()
+            index = {p.get("id"): i for i, p in enumerate(stored)}
+            for project in projects:
+                if project["id"] in index:
+                    stored[index[project["id"]]] = project
+                else:
+                    index[project["id"]] = len(stored)
+                    stored.append(project)
+            self._save(stored)
+
+    def delete(self, project_id):
+        with self._lock:
+            stored = self._load()
+            remaining = [p for p in stored if p.get("id") != project_id]
+            self._save(remaining)
+            return len(remaining) != len(stored)
+
+class SQLiteProjectStore(ProjectStore):
+    """
+    Projects kept in SQLite in WAL mode, indexed by ID and status.
+    Each thread gets its own connection; writes are single transactions.
+    """
+
+    def __init__(self, path: str = PROJECTS_DB):
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+        with self._connection() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS projects ("
+                "id TEXT PRIMARY KEY, status TEXT, data TEXT NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_projects_status ON projects(status)")
+
+    def _connection(self) -> sqlite3.Connection:
+        """
+        Get this thread's connection, opening it on first use.
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, project_id):
+        row = self._connection().execute("SELECT data FROM projects WHERE id = ?", (project_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def get_many(self, project_ids):
+        project_ids = list(dict.fromkeys(project_ids))
+        found = {}
+        for start in range(0, len(project_ids), _SQL_BATCH):
+            batch = project_ids[start:start + _SQL_BATCH]
+            placeholders = ",".join("?" * len(batch))
+            rows = self._connection().execute(
+                f"SELECT id, data FROM projects WHERE id IN ({placeholders})", batch
+            ).fetchall()
+            found.update((project_id, json.loads(data)) for project_id, data in rows)
+        return found
+
+    def list(self, status=None, limit=None, offset=0):
+        query = "SELECT data FROM projects"
+        params: List[Any] = []
+        if status:
+            query += " WHERE status = ?"
+            params.append(status)
+        query += " ORDER BY rowid LIMIT ? OFFSET ?"
+        params.extend([limit if limit is not None else -1, offset])
+        return [json.loads(data) for (data,) in self._connection().execute(query, params)]
+
+    def upsert(self, project):
+        self.upsert_many([project])
+
+    def upsert_many(self, projects):
+        rows = [(p["id"], p.get("status"), json.dumps(p)) for p in projects]
+        with self._connection() as conn:
+            conn.executemany(
+                "INSERT INTO projects (id, status, data) VALUES (?, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET status = excluded.status, data = excluded.data",
+                rows
+            )
+
+    def delete(self, project_id):
+        with self._connection() as conn:
+            return conn.execute("DELETE FROM projects WHERE id = ?", (project_id,)).rowcount > 0
+
+    def is_empty(self) -> bool:
+        """Whether the store holds no projects."""
+        return self._connection().execute("SELECT 1 FROM projects LIMIT 1").fetchone() is None
+
+def migrate_json_projects(store: ProjectStore, json_path: str = PROJECTS_FILE) -> int:
+    """
+    Copy projects from the JSON file into a store. Returns the number copied.
+    Projects already in the store with the same ID are replaced.
+    """
+    projects = JSONProjectStore(json_path).list()
+    store.upsert_many(projects)
+    return len(projects)
+
+_store: Optional[ProjectStore] = None
+_store_lock = threading.Lock()
+
+def get_project_store() -> ProjectStore:
+    """
+    Get the configured project store.
+    A new SQLite store is seeded from the JSON file if one exists.
+    """
+    global _store
+    with _store_lock:
+        if _store is None:
+            if PROJECT_STORE_BACKEND == "json":
+                _store = JSONProjectStore()
+            elif PROJECT_STORE_BACKEND == "sqlite":
+                store = SQLiteProjectStore()
+                if store.is_empty() and os.path.exists(PROJECTS_FILE):
+                    migrate_json_projects(store)
+                _store = store
+            else:
+                raise ValueError(f"Unsupported project store backend: {PROJECT_STORE_BACKEND}")
+        return _store
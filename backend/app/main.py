@@ -1,4 +1,6 @@
-from fastapi import FastAPI
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 import os
 from dotenv import load_dotenv
@@ -6,11 +8,38 @@ from dotenv import load_dotenv
 # Load environment variables
 load_dotenv()
 
+from core import concurrency, ingestion, llm_client, metrics, parsing, registry
+from core.bm25 import close_bm25_index
+from core.dedup import close_dedup_index
+from core.embeddings import ensure_keyword_index
+from core.sessions import session_store
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Build the embedding model, vector store and keyword index once before serving requests,
+    and start loading the chat model in Ollama.
+    """
+    ensure_keyword_index()
+    preload = asyncio.create_task(llm_client.preload()) if llm_client.OLLAMA_PRELOAD else None
+    yield
+    if preload is not None:
+        preload.cancel()
+    await llm_client.aclose()
+    ingestion.shutdown()
+    parsing.shutdown()
+    concurrency.shutdown()
+    close_bm25_index()
+    close_dedup_index()
+    session_store.close()
+    registry.shutdown()
+
 # Create FastAPI app
 app = FastAPI(
     title="Conversational AI Chatbot with RAG",
     description="A domain-specific assistant chatbot using LangChain and ChromaDB",
     version="0.1.0",
+    lifespan=lifespan,
 )
 
 # Add CORS middleware
@@ -22,12 +51,51 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+def _route_path(request: Request) -> str:
+    """
+    Get the path template of the route that handled a request, so metrics are not split by IDs in the URL.
+    """
+    route = request.scope.get("route")
+    return route.path if route is not None else "unmatched"
+
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    """
+    Give each request a trace ID (taken from X-Trace-Id if the client sent one)
+    and record its duration, including streamed response bodies.
+    """
+    if request.url.path.startswith("/metrics"):
+        return await call_next(request)
+    
+    current = metrics.start_trace(request.url.path, request.headers.get(metrics.TRACE_HEADER))
+    try:
+        response = await call_next(request)
+    except Exception:
+        # Errors that escape the app are sent as a 500 by the server; record them as one
+        metrics.finish_request(current, request.method, _route_path(request), 500)
+        raise
+    response.headers[metrics.TRACE_HEADER] = current["trace_id"]
+    
+    route_path = _route_path(request)
+    body = response.body_iterator
+    
+    async def traced_body():
+        try:
+            async for chunk in body:
+                yield chunk
+        finally:
+            metrics.finish_request(current, request.method, route_path, response.status_code)
+    
+    response.body_iterator = traced_body()
+    return response
+
 # Import and include routers
-from api.routes import chat, embed, projects
+from api.routes import chat, embed, metrics as metrics_routes, projects
 
 app.include_router(chat.router, prefix="/api", tags=["chat"])
 app.include_router(embed.router, prefix="/api", tags=["embed"])
 app.include_router(projects.router, prefix="/api", tags=["projects"])
+app.include_router(metrics_routes.router, tags=["metrics"])
 
 @app.get("/")
 async def root():
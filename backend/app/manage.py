@@ -0,0 +1,92 @@
+"""
+Maintenance commands for the chatbot backend.
+
+Run from the app directory:
+    python manage.py compact [--dry-run]
+    python manage.py migrate-projects [--json PATH]
+    python manage.py ingest PATH [--workers N]
+    python manage.py dedup [--domain NAME]
+"""
+import argparse
+import json
+import os
+
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+from core import registry
+from core.bm25 import close_bm25_index
+from core.dedup import close_dedup_index
+
+def compact(args):
+    """Remove orphaned and duplicated project vectors."""
+    from core.projects import compact_project_vectors
+
+    print(json.dumps(compact_project_vectors(dry_run=args.dry_run), indent=2))
+
+def migrate_projects(args):
+    """Copy projects from the JSON file into the configured project store."""
+    from db.projects import PROJECTS_FILE, get_project_store, migrate_json_projects
+
+    count = migrate_json_projects(get_project_store(), args.json or PROJECTS_FILE)
+    print(f"Migrated {count} projects")
+
+def ingest(args):
+    """Bulk-ingest a directory, zip or tar archive and print a throughput summary."""
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    from core.bulk_ingest import ingest_source
+
+    metadata = json.loads(args.metadata) if args.metadata else None
+    executor = ProcessPoolExecutor(max_workers=args.workers, mp_context=multiprocessing.get_context("spawn"))
+    with executor:
+        summary = ingest_source(args.path, executor, args.workers, metadata=metadata)
+    print(json.dumps(summary, indent=2))
+    print(
+        f"Ingested {summary['ingested']} of {summary['files']} files ({summary['skipped']} unchanged, "
+        f"{summary['failed']} failed), {summary['chunks']} chunks in {summary['seconds']:.1f} s: "
+        f"{summary['docs_per_second']} docs/s, {summary['chunks_per_second']} chunks/s"
+    )
+
+def dedup(args):
+    """Link duplicate chunks stored before the dedup index recorded them."""
+    from core.embeddings import deduplicate_stored_chunks
+    from core.tenants import normalize_domain
+
+    print(json.dumps(deduplicate_stored_chunks(domain=normalize_domain(args.domain)), indent=2))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    compact_parser = subparsers.add_parser("compact", help="Remove orphaned and duplicated project vectors")
+    compact_parser.add_argument("--dry-run", action="store_true", help="Only report what would be removed")
+    compact_parser.set_defaults(func=compact)
+
+    migrate_parser = subparsers.add_parser("migrate-projects", help="Copy projects from the JSON file into the project store")
+    migrate_parser.add_argument("--json", help="Path to the JSON projects file")
+    migrate_parser.set_defaults(func=migrate_projects)
+
+    ingest_parser = subparsers.add_parser("ingest", help="Bulk-ingest a directory, zip or tar archive")
+    ingest_parser.add_argument("path", help="Directory or archive to ingest")
+    ingest_parser.add_argument("--workers", type=int, default=os.cpu_count() or 2, help="Worker processes for parsing and embedding")
+    ingest_parser.add_argument("--metadata", help="JSON metadata added to every document")
+    ingest_parser.set_defaults(func=ingest)
+
+    dedup_parser = subparsers.add_parser("dedup", help="Link duplicate chunks already in the vector store")
+    dedup_parser.add_argument("--domain", help="Domain to deduplicate (default: the default domain)")
+    dedup_parser.set_defaults(func=dedup)
+
+    args = parser.parse_args()
+    try:
+        args.func(args)
+    finally:
+        close_bm25_index()
+        close_dedup_index()
+        registry.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Storage, ingest time, query latency and result diversity with and without chunk dedup.
+
+Builds a synthetic corpus where every document starts with one of a few
+shared boilerplate headers and a fraction of documents are republished as
+near-copies with a few words changed. The corpus is indexed twice, into a
+domain with dedup disabled and into one with it enabled, and for each the
+benchmark reports vectors stored, disk used, ingest time, retrieval p50/p95
+and how many distinct texts the top RETRIEVAL_K chunks hold.
+
+Usage:
+    python benchmarks/bench_dedup.py --documents 300 --copies 0.2
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import run_suite
+
+def make_corpus(args):
+    """Build (doc id, text) pairs: documents with shared headers, plus near-copies of some of them."""
+    rng = random.Random(args.seed)
+    headers = run_suite.make_documents(args.headers, 120, args.seed + 1)
+    documents = [
+        (f"document-{i}", f"{rng.choice(headers)}\n\n{text}")
+        for i, text in enumerate(run_suite.make_documents(args.documents, args.words, args.seed))
+    ]
+    for doc_id, text in rng.sample(documents, int(len(documents) * args.copies)):
+        words = text.split(" ")
+        for _ in range(max(1, len(words) // 500)):
+            words[rng.randrange(len(words))] = "revised"
+        documents.append((f"{doc_id}-copy", " ".join(words)))
+    return documents
+
+def directory_size(path):
+    """Total size of the files under a directory in MB."""
+    return sum(
+        os.path.getsize(os.path.join(root, name)) for root, _, files in os.walk(path) for name in files
+    ) / (1024 * 1024)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=300, help="Synthetic documents")
+    parser.add_argument("--words", type=int, default=400, help="Words per synthetic document, besides the header")
+    parser.add_argument("--headers", type=int, default=3, help="Distinct boilerplate headers")
+    parser.add_argument("--copies", type=float, default=0.2, help="Fraction of documents republished as near-copies")
+    parser.add_argument("--queries", type=int, default=100, help="Questions")
+    parser.add_argument("--embedding-model", default=run_suite.DEFAULT_EMBEDDING_MODEL,
+                        help=f'Locally cached sentence-transformers model, or "{run_suite.HASHING_MODEL}"')
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    args = parser.parse_args()
+
+    data_directory = tempfile.mkdtemp(prefix="bench_dedup_")
+    run_suite.configure_environment(data_directory, args)
+    from core import embeddings
+    from core.chat_chain import RETRIEVAL_K
+    from core.dedup import content_hash
+    from core.retrieval import retrieve_with_scores
+    from core.tenants import domain_directory
+
+    corpus = make_corpus(args)
+    queries = run_suite.make_queries(args.queries, args.seed)
+    print(f"{len(corpus)} documents, {args.headers} shared headers, {len(corpus) - args.documents} near-copies")
+
+    for domain, enabled in (("plain", False), ("dedup", True)):
+        embeddings.DEDUP_ENABLED = enabled
+        start_time = time.perf_counter()
+        for doc_id, text in corpus:
+            embeddings.embed_document(text=text, metadata={"source": "bench", "domain": domain}, doc_id=doc_id)
+        ingest_seconds = time.perf_counter() - start_time
+
+        timings = []
+        distinct = []
+        for query in queries:
+            start_time = time.perf_counter()
+            results = retrieve_with_scores(query, RETRIEVAL_K, domain=domain)
+            timings.append(time.perf_counter() - start_time)
+            distinct.append(len({content_hash(doc.page_content) for doc, _ in results}))
+
+        # Save the keyword index so it counts towards disk use
+        embeddings.get_keyword_index(domain).save()
+        stats = embeddings.get_domain_dedup_index(domain).stats()
+        print(
+            f"dedup {'on ' if enabled else 'off'}: {embeddings.get_vectorstore(domain)._collection.count():6d} vectors "
+            f"({stats['linked_chunks']} linked: {stats['exact_duplicates']} exact, {stats['near_duplicates']} near)  "
+            f"disk {directory_size(domain_directory(domain)):6.1f} MB  ingest {ingest_seconds:5.1f} s  "
+            f"retrieval p50 {np.percentile(timings, 50) * 1000:5.1f} ms  p95 {np.percentile(timings, 95) * 1000:5.1f} ms  "
+            f"distinct texts in top {RETRIEVAL_K} {np.mean(distinct):.2f}"
+        )
+
+    run_suite.close_backend()
+    shutil.rmtree(data_directory, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
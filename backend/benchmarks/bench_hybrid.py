@@ -0,0 +1,120 @@
+"""
+Recall and latency of vector, BM25 and hybrid retrieval on a synthetic corpus.
+
+Each synthetic project gets one chunk with a made-up name, technologies and
+a UUID. Queries ask for a project by ID, by name or by description, and a
+query counts as recalled when that project's chunk is in the top k.
+
+Usage:
+    python benchmarks/bench_hybrid.py --documents 2000 --queries 200
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import uuid
+
+# Keep the benchmark's data out of the real Chroma directory
+_data_directory = tempfile.mkdtemp(prefix="bench_hybrid_")
+os.environ["CHROMA_PERSIST_DIRECTORY"] = _data_directory
+os.environ["BM25_INDEX_PATH"] = os.path.join(_data_directory, "bm25_index.pkl")
+os.environ["EMBEDDING_CACHE_PATH"] = os.path.join(_data_directory, "embedding_cache.sqlite3")
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+
+from core import registry
+from core.bm25 import close_bm25_index
+from core.embeddings import add_chunks
+from core.retrieval import keyword_search, retrieve, vector_search
+
+ADJECTIVES = ["Silent", "Rapid", "Crimson", "Lunar", "Golden", "Hidden", "Iron", "Velvet", "Arctic", "Electric"]
+NOUNS = ["Falcon", "Harbor", "Compass", "Lantern", "Orchard", "Summit", "Canvas", "Beacon", "Meadow", "Forge"]
+TECHNOLOGIES = ["React", "FastAPI", "Node.js", "PostgreSQL", "Redis", "Docker", "Kubernetes", "TensorFlow", "Flutter", "Go"]
+DOMAINS = ["inventory tracking", "music recommendation", "weather alerts", "expense sharing", "recipe planning",
+           "fitness coaching", "document search", "chat moderation", "fleet routing", "language learning"]
+
+def make_corpus(size, rng):
+    """Build synthetic project chunks and the facts used to query them."""
+    corpus = []
+    for i in range(size):
+        name = f"{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {i}"
+        technologies = rng.sample(TECHNOLOGIES, 3)
+        domain = rng.choice(DOMAINS)
+        project_id = str(uuid.UUID(int=rng.getrandbits(128)))
+        text = (
+            f"Project: {name}\nID: {project_id}\n"
+            f"Description: An application for {domain} built by Arun.\n"
+            f"Technologies: {', '.join(technologies)}"
+        )
+        corpus.append({"chunk_id": f"bench:{i}:0", "text": text, "name": name,
+                       "project_id": project_id, "domain": domain, "technologies": technologies})
+    return corpus
+
+def make_queries(corpus, count, rng):
+    """Build (query type, query, expected chunk id) triples."""
+    queries = []
+    for _ in range(count):
+        item = rng.choice(corpus)
+        kind = rng.choice(["id", "name", "description"])
+        if kind == "id":
+            query = f"What is project {item['project_id']}?"
+        elif kind == "name":
+            query = f"Tell me about {item['name']}"
+        else:
+            query = f"{item['domain']} app using {item['technologies'][0]} and {item['technologies'][1]}"
+        queries.append((kind, query, item["chunk_id"]))
+    return queries
+
+def run(label, search, queries, k):
+    """Measure recall@k per query type and mean latency."""
+    hits = {}
+    totals = {}
+    timings = []
+    for kind, query, expected in queries:
+        start_time = time.perf_counter()
+        ids = search(query, k)
+        timings.append(time.perf_counter() - start_time)
+        totals[kind] = totals.get(kind, 0) + 1
+        hits[kind] = hits.get(kind, 0) + (expected in ids)
+
+    timings.sort()
+    recall = ", ".join(f"{kind} {hits[kind] / totals[kind]:.2f}" for kind in sorted(totals))
+    overall = sum(hits.values()) / len(queries)
+    print(f"{label:<8} recall@{k}: {overall:.2f} ({recall}); "
+          f"latency p50 {timings[len(timings) // 2] * 1000:.1f} ms, p95 {timings[int(len(timings) * 0.95)] * 1000:.1f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=2000, help="Synthetic corpus size")
+    parser.add_argument("--queries", type=int, default=200, help="Number of queries")
+    parser.add_argument("--k", type=int, default=5, help="Results per query")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    corpus = make_corpus(args.documents, rng)
+    queries = make_queries(corpus, args.queries, rng)
+
+    start_time = time.perf_counter()
+    for start in range(0, len(corpus), 500):
+        batch = corpus[start:start + 500]
+        add_chunks(
+            ids=[item["chunk_id"] for item in batch],
+            texts=[item["text"] for item in batch],
+            metadatas=[{"source": "bench"} for _ in batch]
+        )
+    print(f"Indexed {len(corpus)} chunks in {time.perf_counter() - start_time:.1f} s")
+
+    run("vector", lambda q, k: [chunk_id for chunk_id, _, _ in vector_search(q, k)], queries, args.k)
+    run("bm25", lambda q, k: [chunk_id for chunk_id, _ in keyword_search(q, k)], queries, args.k)
+    run("hybrid", lambda q, k: [doc.id for doc in retrieve(q, k, mode="hybrid")], queries, args.k)
+
+    close_bm25_index()
+    registry.shutdown()
+    shutil.rmtree(_data_directory, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Concurrent generations through a new OllamaLLM per request vs. the shared pooled client.
+
+Runs against the mock Ollama server in benchmarks/mock_ollama.py, so no
+model is needed. A share of the prompts are repeats, as when several users
+ask the same question at once. Reports wall time, latency percentiles, the
+generations the server actually ran, the most it ran at once and the HTTP
+connections it saw.
+
+Usage:
+    python benchmarks/bench_llm_client.py --requests 64 --concurrency 16 --duplicates 0.5
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+import urllib.request
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from langchain_ollama import OllamaLLM
+
+from core import llm_client
+from mock_ollama import MockOllamaServer
+
+def mock_request(url, path, method="GET"):
+    """Call a mock server endpoint."""
+    request = urllib.request.Request(url + path, method=method)
+    with urllib.request.urlopen(request) as response:
+        return json.loads(response.read())
+
+def make_prompts(count, duplicates):
+    """Get prompts of which about `duplicates` of them repeat the one before, so repeats are in flight together."""
+    unique = max(1, round(count * (1 - duplicates)))
+    return [f"Question {i * unique // count}: what has Arun built?" for i in range(count)]
+
+async def run(get_llm, prompts, concurrency):
+    """Send the prompts with at most `concurrency` in flight and return each latency."""
+    gate = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(prompt):
+        async with gate:
+            start_time = time.perf_counter()
+            await get_llm().ainvoke(prompt)
+            latencies.append(time.perf_counter() - start_time)
+
+    await asyncio.gather(*(one(prompt) for prompt in prompts))
+    return latencies
+
+def report(name, wall, latencies, stats):
+    """Print one variant's results."""
+    latencies = sorted(latencies)
+    p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+    print(f"{name:<22} wall {wall:6.2f} s  p50 {statistics.median(latencies) * 1000:7.1f} ms  "
+          f"p95 {p95 * 1000:7.1f} ms  generations {stats['generations']:4d}  "
+          f"max parallel {stats['max_active']:3d}  connections {stats['connections']:4d}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=64, help="Generations requested")
+    parser.add_argument("--concurrency", type=int, default=16, help="Requests in flight at once")
+    parser.add_argument("--duplicates", type=float, default=0.5, help="Share of prompts that repeat another")
+    parser.add_argument("--token-ms", type=float, default=5.0, help="Mock milliseconds per token")
+    parser.add_argument("--port", type=int, default=11435, help="Mock server port")
+    args = parser.parse_args()
+
+    prompts = make_prompts(args.requests, args.duplicates)
+    with MockOllamaServer(port=args.port, token_ms=args.token_ms) as url:
+        print(f"{args.requests} requests, {args.concurrency} in flight, {args.duplicates:.0%} duplicates, "
+              f"OLLAMA_MAX_PARALLEL={llm_client.OLLAMA_MAX_PARALLEL}")
+
+        variants = [
+            ("new client per request", lambda: OllamaLLM(model="mistral", base_url=url)),
+            ("shared pooled client", lambda: llm_client.get_llm(base_url=url)),
+        ]
+        for name, get_llm in variants:
+            mock_request(url, "/mock/reset", method="POST")
+            start_time = time.perf_counter()
+            latencies = asyncio.run(run(get_llm, prompts, args.concurrency))
+            wall = time.perf_counter() - start_time
+            report(name, wall, latencies, mock_request(url, "/mock/stats"))
+
+if __name__ == "__main__":
+    main()
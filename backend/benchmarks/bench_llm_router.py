@@ -0,0 +1,81 @@
+"""
+LLM routing across several backends, checked against local mock Ollama servers.
+
+Starts a fast and a slow primary backend and a fast fallback backend, then
+runs three bursts of requests through the router:
+  1. routing: most requests should go to the fast backend;
+  2. fallback: with an SLO both primaries breach, requests should move to the fallback;
+  3. shedding: with a short queue, the excess should be refused with a Retry-After.
+
+Usage:
+    python benchmarks/bench_llm_router.py --requests 48 --concurrency 24
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from core.llm_router import LLMOverloadedError, LLMRouter
+from mock_ollama import MockOllamaServer
+
+async def burst(router, requests, concurrency):
+    """Send requests through the router and return (completed, refused, Retry-After values, wall seconds)."""
+    gate = asyncio.Semaphore(concurrency)
+    refused = []
+    completed = 0
+
+    async def one(i):
+        nonlocal completed
+        async with gate:
+            try:
+                lease = router.acquire()
+            except LLMOverloadedError as e:
+                refused.append(e.retry_after)
+                return
+            with lease as llm:
+                await llm.ainvoke(f"Question {i}: what has Arun built?")
+            completed += 1
+
+    start_time = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    return completed, refused, time.perf_counter() - start_time
+
+def report(title, router, completed, refused, wall):
+    """Print a burst's outcome and the requests each backend took."""
+    print(f"\n{title}: {completed} completed, {len(refused)} refused in {wall:.2f} s"
+          + (f" (Retry-After {min(refused)}-{max(refused)} s)" if refused else ""))
+    for backend in router.stats()["backends"]:
+        role = "fallback" if backend["fallback"] else "primary"
+        print(f"  {role:<8} {backend['backend']:<40} routed {backend['routed']:4d}  "
+              f"p95 {backend['p95_ms']:7.1f} ms  breaches SLO: {backend['breaches_slo']}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=48, help="Requests per burst")
+    parser.add_argument("--concurrency", type=int, default=24, help="Requests in flight at once")
+    parser.add_argument("--port", type=int, default=11440, help="First mock server port")
+    args = parser.parse_args()
+
+    fast = MockOllamaServer(port=args.port, token_ms=2, tokens=16)
+    slow = MockOllamaServer(port=args.port + 1, token_ms=20, tokens=16)
+    small = MockOllamaServer(port=args.port + 2, token_ms=1, tokens=16)
+    with fast as fast_url, slow as slow_url, small as small_url:
+        primaries = f"mistral@{fast_url},mistral@{slow_url}"
+        fallbacks = f"phi3:mini@{small_url}"
+
+        router = LLMRouter(primaries, fallbacks, slo_ms=0, max_queue=args.requests)
+        report("1. routing by queue depth and latency", router, *asyncio.run(burst(router, args.requests, args.concurrency)))
+
+        # Both primaries already took far longer than 1 ms, so both breach this SLO
+        router = LLMRouter(primaries, fallbacks, slo_ms=1, max_queue=args.requests)
+        report("2. fallback on p95 SLO breach", router, *asyncio.run(burst(router, args.requests, args.concurrency)))
+
+        router = LLMRouter(primaries, "", slo_ms=0, max_queue=1)
+        report("3. load shedding with a queue of 1", router, *asyncio.run(burst(router, args.requests, args.concurrency)))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Parse time of generated PDF and DOCX files: loaders on the calling thread vs. the parser pool.
+
+PDFs and DOCX files are written with the standard library only, so no
+sample documents are needed. Checks that the pool returns the same pages
+in the same order as PyPDFLoader, then reports the time for each.
+
+Usage:
+    python benchmarks/bench_parsing.py --pages 400 --files 4
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+import zipfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+
+from core import parsing
+from core.embeddings import get_document_loader
+
+LINES_PER_PAGE = 40
+
+def write_pdf(path, pages):
+    """Write a PDF with one page of numbered text lines per page."""
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # page tree, filled in once the page objects are numbered
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    page_ids = []
+    for page in range(pages):
+        lines = [f"Page {page} line {line}: synthetic text for parser benchmarks." for line in range(LINES_PER_PAGE)]
+        stream = "BT /F1 10 Tf 12 TL 40 780 Td " + " ".join(f"({text}) '" for text in lines) + " ET"
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream.encode()))
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % len(objects)
+        )
+        page_ids.append(len(objects))
+    kids = " ".join(f"{page_id} 0 R" for page_id in page_ids)
+    objects[1] = f"<< /Type /Pages /Kids [{kids}] /Count {pages} >>".encode()
+
+    output = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(output))
+        output += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(output)
+    output += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    output += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    output += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    with open(path, "wb") as f:
+        f.write(output)
+
+def write_docx(path, paragraphs):
+    """Write a minimal DOCX with numbered paragraphs."""
+    body = "".join(
+        f"<w:p><w:r><w:t>Paragraph {i}: synthetic text for parser benchmarks.</w:t></w:r></w:p>"
+        for i in range(paragraphs)
+    )
+    with zipfile.ZipFile(path, "w") as docx:
+        docx.writestr("[Content_Types].xml", (
+            '<?xml version="1.0" encoding="UTF-8"?>'
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/word/document.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+            '</Types>'
+        ))
+        docx.writestr("_rels/.rels", (
+            '<?xml version="1.0" encoding="UTF-8"?>'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Id="rId1" Target="word/document.xml" '
+            'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"/>'
+            '</Relationships>'
+        ))
+        docx.writestr("word/document.xml", (
+            '<?xml version="1.0" encoding="UTF-8"?>'
+            '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+            f'<w:body>{body}</w:body></w:document>'
+        ))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=400, help="Pages per PDF")
+    parser.add_argument("--files", type=int, default=4, help="Files of each type")
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="bench_parsing_")
+    try:
+        files = []
+        for i in range(args.files):
+            files.append(os.path.join(directory, f"doc{i}.pdf"))
+            write_pdf(files[-1], args.pages)
+            files.append(os.path.join(directory, f"doc{i}.docx"))
+            write_docx(files[-1], args.pages * LINES_PER_PAGE)
+
+        start_time = time.perf_counter()
+        expected = {path: [doc.page_content for doc in get_document_loader(path).lazy_load()] for path in files}
+        inline_time = time.perf_counter() - start_time
+
+        # Start the workers before timing, as the server keeps them running
+        list(parsing.parse_document(files[0]))
+        start_time = time.perf_counter()
+        parsed = {path: [doc.page_content for doc in parsing.parse_document(path)] for path in files}
+        pool_time = time.perf_counter() - start_time
+
+        mismatched = [os.path.basename(path) for path in files if parsed[path] != expected[path]]
+        print(f"{args.files} PDFs of {args.pages} pages and {args.files} DOCX files, "
+              f"{parsing.PARSER_WORKERS} workers on {os.cpu_count()} CPUs")
+        print(f"calling thread: {inline_time:.2f} s")
+        print(f"parser pool:    {pool_time:.2f} s ({inline_time / pool_time:.1f}x)")
+        print("pages match and are in order" if not mismatched else f"mismatched: {', '.join(mismatched)}")
+    finally:
+        parsing.shutdown()
+        shutil.rmtree(directory, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
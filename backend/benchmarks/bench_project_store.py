@@ -0,0 +1,86 @@
+"""
+Project store benchmark: JSON file vs. SQLite at 10k-100k projects.
+
+Measures bulk load, single inserts, lookups by ID, batched lookups and
+paginated listing filtered by status. JSON lookups re-read the whole file,
+so they are sampled less.
+
+Usage:
+    python benchmarks/bench_project_store.py --sizes 10000 100000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+
+from db.projects import JSONProjectStore, SQLiteProjectStore
+
+STATUSES = ["active", "completed", "planned", "archived"]
+
+def make_project(i):
+    """Build a synthetic project record."""
+    return {
+        "id": str(uuid.uuid4()),
+        "name": f"Project {i}",
+        "description": f"Synthetic project number {i} used for benchmarking.",
+        "status": STATUSES[i % len(STATUSES)],
+        "technologies": ["Python", "FastAPI", "React"][: 1 + i % 3],
+        "start_date": "2024-01-01",
+        "end_date": None,
+        "repo_url": None,
+        "notes": None,
+        "created_at": "2024-01-01T00:00:00",
+        "updated_at": "2024-01-01T00:00:00",
+    }
+
+def timed(func, repeat):
+    """Return the mean time of func in milliseconds."""
+    start_time = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start_time) / repeat * 1000
+
+def bench_store(name, store, projects, samples):
+    """Run every measurement against one store."""
+    ids = [p["id"] for p in projects]
+
+    start_time = time.perf_counter()
+    store.upsert_many(projects)
+    load_time = time.perf_counter() - start_time
+
+    results = {
+        "bulk load (s)": load_time,
+        "insert one (ms)": timed(lambda: store.upsert(make_project(random.randrange(10 ** 6))), samples),
+        "get by id (ms)": timed(lambda: store.get(random.choice(ids)), samples),
+        "get_many 20 ids (ms)": timed(lambda: store.get_many(random.sample(ids, 20)), samples),
+        "list status page of 50 (ms)": timed(
+            lambda: store.list(status=random.choice(STATUSES), limit=50, offset=random.randrange(len(ids) // 8)),
+            samples
+        ),
+    }
+
+    print(f"  {name}:")
+    for label, value in results.items():
+        print(f"    {label:<30} {value:10.3f}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000], help="Numbers of projects")
+    parser.add_argument("--samples", type=int, default=200, help="Operations sampled per SQLite measurement")
+    parser.add_argument("--json-samples", type=int, default=5, help="Operations sampled per JSON measurement")
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        projects = [make_project(i) for i in range(size)]
+        print(f"{size} projects")
+        with tempfile.TemporaryDirectory() as directory:
+            bench_store("json", JSONProjectStore(os.path.join(directory, "projects.json")), projects, args.json_samples)
+            bench_store("sqlite", SQLiteProjectStore(os.path.join(directory, "projects.sqlite3")), projects, args.samples)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Startup and per-request cost of getting the vector store.
+
+Compares building the embedding model and Chroma client on every call
+(the old behaviour of get_vectorstore) with fetching them from the registry.
+
+Usage:
+    python benchmarks/bench_registry.py --requests 20
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+
+from langchain_huggingface import HuggingFaceEmbeddings
+from langchain_community.vectorstores import Chroma
+
+from core import registry
+
+MODEL_NAME = "all-MiniLM-L6-v2"
+COLLECTION_NAME = "bench_registry"
+
+def rebuild_per_call(persist_directory):
+    """Build a fresh embedding model and Chroma store, as every request used to."""
+    embeddings = HuggingFaceEmbeddings(model_name=MODEL_NAME)
+    return Chroma(
+        persist_directory=persist_directory,
+        embedding_function=embeddings,
+        collection_name=COLLECTION_NAME
+    )
+
+def from_registry(persist_directory):
+    """Fetch the shared embedding model and Chroma store from the registry."""
+    return registry.get_vectorstore(COLLECTION_NAME, MODEL_NAME, persist_directory)
+
+def measure(label, get_store, persist_directory, requests):
+    """Time the first call and the following per-request calls, including one query."""
+    start_time = time.perf_counter()
+    get_store(persist_directory).similarity_search("warm up", k=1)
+    startup = time.perf_counter() - start_time
+
+    timings = []
+    for _ in range(requests):
+        start_time = time.perf_counter()
+        get_store(persist_directory).similarity_search("What has Arun built?", k=1)
+        timings.append(time.perf_counter() - start_time)
+
+    timings.sort()
+    print(f"{label}:")
+    print(f"  first call: {startup * 1000:.1f} ms")
+    print(f"  per request: mean {sum(timings) / len(timings) * 1000:.1f} ms, "
+          f"p50 {timings[len(timings) // 2] * 1000:.1f} ms, max {timings[-1] * 1000:.1f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20, help="Number of simulated requests")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as persist_directory:
+        # Seed the collection so the query does real work
+        from_registry(persist_directory).add_texts(["Arun built a RAG chatbot with FastAPI and React."])
+        registry.shutdown()
+
+        measure("Rebuilt per call (before)", rebuild_per_call, persist_directory, args.requests)
+        measure("Registry (after)", from_registry, persist_directory, args.requests)
+        registry.shutdown()
+
+if __name__ == "__main__":
+    main()
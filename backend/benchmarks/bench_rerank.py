@@ -0,0 +1,95 @@
+"""
+Latency and prompt size of chat context with and without cross-encoder reranking.
+
+Indexes the synthetic corpus from run_suite.py, then for each question
+retrieves context the way the chat endpoint does:
+  - retrieval only: the top RETRIEVAL_K chunks
+  - reranked (cold): RERANK_CANDIDATES chunks scored by the cross-encoder
+  - reranked (cached): the same questions again, served from the score cache
+and reports p50/p95 latency, the chunks kept and the estimated context tokens
+that would go into the prompt.
+
+The cross-encoder must be in the local Hugging Face cache.
+
+Usage:
+    python benchmarks/bench_rerank.py --documents 300 --queries 50 --candidates 30 --min-score 0.1
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import run_suite
+
+def run(label, get_context, queries):
+    """Build the context of every query and print latency and size."""
+    from core.context import assemble_context, estimate_tokens
+
+    timings = []
+    chunks = []
+    tokens = []
+    for query in queries:
+        start_time = time.perf_counter()
+        scored_docs, similarities = get_context(query)
+        timings.append(time.perf_counter() - start_time)
+        docs, context = assemble_context(scored_docs, similarities=similarities)
+        chunks.append(len(docs))
+        tokens.append(estimate_tokens(context))
+    print(f"{label:<18} p50 {np.percentile(timings, 50) * 1000:7.1f} ms  p95 {np.percentile(timings, 95) * 1000:7.1f} ms  "
+          f"chunks {np.mean(chunks):4.1f}  context tokens {np.mean(tokens):7.1f}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=300, help="Synthetic documents")
+    parser.add_argument("--words", type=int, default=400, help="Words per synthetic document")
+    parser.add_argument("--queries", type=int, default=50, help="Questions")
+    parser.add_argument("--candidates", type=int, default=None, help="Chunks reranked (default RERANK_CANDIDATES)")
+    parser.add_argument("--min-score", type=float, default=None, help="Relevance cutoff (default RERANK_MIN_SCORE)")
+    parser.add_argument("--embedding-model", default=run_suite.DEFAULT_EMBEDDING_MODEL,
+                        help=f'Locally cached sentence-transformers model, or "{run_suite.HASHING_MODEL}"')
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    args = parser.parse_args()
+
+    data_directory = tempfile.mkdtemp(prefix="bench_rerank_")
+    run_suite.configure_environment(data_directory, args)
+    from core.chat_chain import RETRIEVAL_K
+    from core.embeddings import embed_document
+    from core.rerank import reranker, resolve_options
+    from core.retrieval import retrieve_with_similarities
+
+    options = resolve_options({"candidates": args.candidates, "min_score": args.min_score})
+    start_time = time.perf_counter()
+    for i, text in enumerate(run_suite.make_documents(args.documents, args.words, args.seed)):
+        embed_document(text=text, metadata={"source": "bench"}, doc_id=f"bench-document-{i}")
+    print(f"Indexed {args.documents} documents in {time.perf_counter() - start_time:.1f} s; "
+          f"reranking {options['candidates']} candidates with {reranker.model_name}, cutoff {options['min_score']}")
+
+    def reranked(query):
+        candidates, similarities = retrieve_with_similarities(query, max(RETRIEVAL_K, options["candidates"]))
+        scored_docs = reranker.rerank(query, candidates, RETRIEVAL_K, options["min_score"])
+        if scored_docs is None:
+            return candidates[:RETRIEVAL_K], similarities
+        return scored_docs, None
+
+    queries = run_suite.make_queries(args.queries, args.seed)
+    # Load the models before timing
+    reranked("warm up")
+
+    run("retrieval only", lambda query: retrieve_with_similarities(query, RETRIEVAL_K), queries)
+    run("reranked (cold)", reranked, queries)
+    run("reranked (cached)", reranked, queries)
+    stats = reranker.stats()
+    print(f"Scored {stats['scored']} pairs, {stats['below_cutoff']} candidates below the cutoff, "
+          f"cache hit rate {stats['cache_hit_rate']:.0%}")
+
+    run_suite.close_backend()
+    shutil.rmtree(data_directory, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
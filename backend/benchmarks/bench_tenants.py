@@ -0,0 +1,92 @@
+"""
+Retrieval cost per tenant: one shared collection vs. a collection per domain.
+
+Indexes one large tenant and several small ones twice: all together in the
+default collection (how everything was stored before domains), and each in
+its own domain. Then times retrieval of chat context for questions to a
+small tenant in both layouts, and finally cycles questions over every
+domain with only --max-loaded domains kept open, reporting evictions and
+peak RSS.
+
+Usage:
+    python benchmarks/bench_tenants.py --large 2000 --small 50 --tenants 8 --max-loaded 2
+"""
+import argparse
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import run_suite
+
+def run(label, search, queries):
+    """Time every query and print p50/p95."""
+    timings = []
+    for query in queries:
+        start_time = time.perf_counter()
+        search(query)
+        timings.append(time.perf_counter() - start_time)
+    print(f"{label:<36} p50 {np.percentile(timings, 50) * 1000:7.1f} ms  p95 {np.percentile(timings, 95) * 1000:7.1f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--large", type=int, default=2000, help="Documents of the large tenant")
+    parser.add_argument("--small", type=int, default=50, help="Documents of each small tenant")
+    parser.add_argument("--tenants", type=int, default=8, help="Small tenants")
+    parser.add_argument("--words", type=int, default=200, help="Words per synthetic document")
+    parser.add_argument("--queries", type=int, default=100, help="Questions per measurement")
+    parser.add_argument("--max-loaded", type=int, default=2, help="Domains kept open for the last measurement")
+    parser.add_argument("--embedding-model", default=run_suite.DEFAULT_EMBEDDING_MODEL,
+                        help=f'Locally cached sentence-transformers model, or "{run_suite.HASHING_MODEL}"')
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    args = parser.parse_args()
+
+    os.environ["TENANT_MIN_IDLE_SECONDS"] = "0"
+    data_directory = tempfile.mkdtemp(prefix="bench_tenants_")
+    run_suite.configure_environment(data_directory, args)
+    from core.chat_chain import RETRIEVAL_K
+    from core.embeddings import embed_document
+    from core.retrieval import retrieve_with_scores
+    from core.tenants import loaded_domains
+
+    tenants = {"large": run_suite.make_documents(args.large, args.words, args.seed)}
+    for i in range(args.tenants):
+        tenants[f"small-{i}"] = run_suite.make_documents(args.small, args.words, args.seed + i + 1)
+
+    # Keep every domain open while indexing
+    loaded_domains.max_loaded = len(tenants)
+    start_time = time.perf_counter()
+    for domain, documents in tenants.items():
+        for i, text in enumerate(documents):
+            embed_document(text=text, metadata={"source": "bench", "tenant": domain}, doc_id=f"{domain}:{i}")
+            embed_document(text=text, metadata={"source": "bench", "domain": domain}, doc_id=f"{domain}:{i}")
+    total = sum(len(documents) for documents in tenants.values())
+    print(f"Indexed {total} documents in both layouts in {time.perf_counter() - start_time:.1f} s")
+
+    queries = run_suite.make_queries(args.queries, args.seed)
+    run(f"shared collection ({total} documents)", lambda query: retrieve_with_scores(query, RETRIEVAL_K), queries)
+    run(f"domain small-0 ({args.small} documents)",
+        lambda query: retrieve_with_scores(query, RETRIEVAL_K, domain="small-0"), queries)
+    run(f"domain large ({args.large} documents)",
+        lambda query: retrieve_with_scores(query, RETRIEVAL_K, domain="large"), queries)
+
+    loaded_domains.max_loaded = args.max_loaded
+    domains = list(tenants)
+    assigned = {query: domains[i % len(domains)] for i, query in enumerate(queries)}
+    run(f"cycling {len(domains)} domains, {args.max_loaded} open",
+        lambda query: retrieve_with_scores(query, RETRIEVAL_K, domain=assigned[query]), queries)
+    stats = loaded_domains.stats()
+    print(f"Opened {stats['opened']} times, evicted {stats['evicted']}, {len(stats['loaded'])} open now; "
+          f"peak RSS {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MB")
+
+    run_suite.close_backend()
+    shutil.rmtree(data_directory, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
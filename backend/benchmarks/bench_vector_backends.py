@@ -0,0 +1,119 @@
+"""
+Chroma vs. the in-process NumPy index: query latency, memory and startup time.
+
+Uses random unit vectors, so no embedding model is needed. Each backend
+runs in its own process so peak RSS is measured separately:
+  - build: time to write all vectors, --batch-size at a time as ingestion does
+  - startup: time to reopen the persisted collection and answer one query
+  - query p50/p95 with and without a metadata filter
+  - peak RSS of the process after querying
+
+Usage:
+    python benchmarks/bench_vector_backends.py --vectors 50000 --queries 200 --batch-size 64
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+
+DIMENSION = 384
+VARIANTS = {
+    "chroma": {},
+    "numpy": {"ivf_lists": 0, "quantization": "none"},
+    "numpy-int8": {"ivf_lists": 0, "quantization": "int8"},
+    "numpy-ivf": {"ivf_lists": 256, "ivf_probes": 16, "ivf_min_size": 0, "quantization": "none"},
+}
+
+def make_data(count, seed=0):
+    """Random unit vectors with a status column."""
+    rng = np.random.default_rng(seed)
+    vectors = rng.normal(size=(count, DIMENSION)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    ids = [f"chunk:{i}" for i in range(count)]
+    metadatas = [{"source": "bench", "status": ["active", "completed", "planned"][i % 3]} for i in range(count)]
+    return ids, vectors, metadatas
+
+def open_collection(variant, directory):
+    """Open (or create) the collection for a backend variant."""
+    if variant == "chroma":
+        import chromadb
+        client = chromadb.PersistentClient(path=directory)
+        return client.get_or_create_collection("bench")
+
+    from core.numpy_store import NumpyCollection
+    return NumpyCollection(os.path.join(directory, "bench"), "bench", **VARIANTS[variant])
+
+def percentile_ms(timings, percentile):
+    """Percentile of a list of seconds, in milliseconds."""
+    return float(np.percentile(timings, percentile) * 1000)
+
+def run_variant(variant, count, queries, batch_size):
+    """Build, reopen and query one backend; print the results as JSON."""
+    ids, vectors, metadatas = make_data(count)
+    query_vectors = make_data(queries, seed=1)[1]
+
+    with tempfile.TemporaryDirectory() as directory:
+        collection = open_collection(variant, directory)
+        start_time = time.perf_counter()
+        for start in range(0, count, batch_size):
+            collection.upsert(
+                ids=ids[start:start + batch_size],
+                embeddings=vectors[start:start + batch_size].tolist() if variant == "chroma" else vectors[start:start + batch_size],
+                documents=ids[start:start + batch_size],
+                metadatas=metadatas[start:start + batch_size]
+            )
+        build_time = time.perf_counter() - start_time
+        del collection
+
+        start_time = time.perf_counter()
+        collection = open_collection(variant, directory)
+        collection.query(query_embeddings=[query_vectors[0].tolist()], n_results=5)
+        startup_time = time.perf_counter() - start_time
+
+        results = {"backend": variant, "vectors": count, "build_s": build_time, "startup_s": startup_time}
+        for label, where in (("query", None), ("filtered_query", {"status": "active"})):
+            timings = []
+            for vector in query_vectors:
+                start_time = time.perf_counter()
+                collection.query(query_embeddings=[vector.tolist()], n_results=5, where=where)
+                timings.append(time.perf_counter() - start_time)
+            results[f"{label}_p50_ms"] = percentile_ms(timings, 50)
+            results[f"{label}_p95_ms"] = percentile_ms(timings, 95)
+
+        # ru_maxrss is in kilobytes on Linux
+        results["peak_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        print(json.dumps(results))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vectors", type=int, default=50000, help="Collection size")
+    parser.add_argument("--queries", type=int, default=200, help="Queries per measurement")
+    parser.add_argument("--batch-size", type=int, default=64, help="Vectors written per upsert")
+    parser.add_argument("--backends", nargs="+", default=list(VARIANTS), choices=list(VARIANTS))
+    parser.add_argument("--run", choices=list(VARIANTS), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        run_variant(args.run, args.vectors, args.queries, args.batch_size)
+        return
+
+    for backend in args.backends:
+        output = subprocess.run(
+            [sys.executable, __file__, "--run", backend, "--vectors", str(args.vectors), "--queries", str(args.queries),
+             "--batch-size", str(args.batch_size)],
+            capture_output=True,
+            text=True,
+            check=True
+        ).stdout
+        print(output.strip().splitlines()[-1])
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Load test for /api/chat against a running backend.
+
+Measures one request on its own, then fires concurrent chat requests and
+reports per-request latency, total wall time and the speedup over running
+them one after another. If the chat path blocked the event loop, the server
+would serve the requests one at a time and the speedup would stay near 1.
+
+Usage:
+    python benchmarks/load_chat.py --url http://localhost:8000 --concurrency 8 --requests 16
+"""
+import argparse
+import json
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+QUESTIONS = [
+    "What projects has Arun built?",
+    "Which technologies does Arun use most?",
+    "Tell me about Arun's RAG chatbot.",
+    "What is Arun working on right now?",
+]
+
+def send_chat(url, path, question):
+    """Send one chat request and return its (start, end) time."""
+    body = json.dumps({"messages": [{"role": "user", "content": question}]}).encode()
+    request = urllib.request.Request(
+        url.rstrip("/") + path,
+        data=body,
+        headers={"Content-Type": "application/json"}
+    )
+    start_time = time.perf_counter()
+    with urllib.request.urlopen(request) as response:
+        response.read()
+    return start_time, time.perf_counter()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000", help="Backend base URL")
+    parser.add_argument("--path", default="/api/chat", help="Chat endpoint path")
+    parser.add_argument("--concurrency", type=int, default=8, help="Requests in flight at once")
+    parser.add_argument("--requests", type=int, default=16, help="Total number of requests")
+    args = parser.parse_args()
+
+    questions = [QUESTIONS[i % len(QUESTIONS)] for i in range(args.requests)]
+
+    # Baseline: a single request with nothing else in flight
+    start, end = send_chat(args.url, args.path, QUESTIONS[0])
+    baseline = end - start
+
+    wall_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        intervals = list(pool.map(lambda q: send_chat(args.url, args.path, q), questions))
+    wall_time = time.perf_counter() - wall_start
+
+    latencies = sorted(end - start for start, end in intervals)
+    print(f"Requests: {len(latencies)} at concurrency {args.concurrency}")
+    print(f"Wall time: {wall_time:.2f} s")
+    print(f"Sum of latencies: {sum(latencies):.2f} s")
+    print(f"Latency p50 {latencies[len(latencies) // 2]:.2f} s, max {latencies[-1]:.2f} s")
+    print(f"Single request: {baseline:.2f} s")
+    print(f"Speedup over serial ({len(latencies)} x single / wall time): {len(latencies) * baseline / wall_time:.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""
+Mock Ollama server for testing and benchmarking the LLM client layer without a model.
+
+Implements the parts of the Ollama HTTP API the backend uses (/api/generate,
+streaming and not, /api/tags, /api/ps, /api/version) with configurable load
+time and per-token latency. Models stay loaded for the request's keep_alive
+(5 minutes by default, like Ollama), so cold loads show up in latencies.
+GET /mock/stats reports generations, loads, the most generations running at
+once and the number of distinct client connections seen; POST /mock/reset
+clears them.
+
+Usage:
+    python benchmarks/mock_ollama.py --port 11435 --token-ms 20 --load-ms 2000
+    OLLAMA_HOST=http://localhost:11435 uvicorn main:app
+"""
+import argparse
+import asyncio
+import json
+import re
+import threading
+import time
+from datetime import datetime, timezone
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+DEFAULT_KEEP_ALIVE_SECONDS = 300
+
+def parse_duration(value):
+    """Convert an Ollama keep_alive (seconds, or a duration like "30m") to seconds; negative means forever."""
+    if value is None:
+        return DEFAULT_KEEP_ALIVE_SECONDS
+    if isinstance(value, (int, float)):
+        return float(value)
+    match = re.fullmatch(r"(-?\d+(?:\.\d+)?)(ms|s|m|h)?", str(value).strip())
+    if not match:
+        return DEFAULT_KEEP_ALIVE_SECONDS
+    scale = {"ms": 0.001, "s": 1, "m": 60, "h": 3600, None: 1}[match.group(2)]
+    return float(match.group(1)) * scale
+
+def create_app(token_ms=20.0, load_ms=0.0, tokens=32):
+    """Create the mock server app. Answers are `tokens` words long and echo the end of the prompt."""
+    app = FastAPI(title="Mock Ollama")
+    state = {
+        "generations": 0,
+        "loads": 0,
+        "active": 0,
+        "max_active": 0,
+        "connections": set(),
+        "loaded_until": {},
+        "keep_alive": [],
+    }
+
+    async def load_model(model, keep_alive):
+        """Wait for the model to load unless it is still loaded, then keep it loaded for keep_alive."""
+        now = time.monotonic()
+        if state["loaded_until"].get(model, 0) < now:
+            state["loads"] += 1
+            await asyncio.sleep(load_ms / 1000)
+        seconds = parse_duration(keep_alive)
+        state["keep_alive"] = (state["keep_alive"] + [keep_alive])[-10:]
+        state["loaded_until"][model] = float("inf") if seconds < 0 else time.monotonic() + seconds
+
+    def answer_words(prompt):
+        """Get the words of the answer to a prompt."""
+        echo = prompt.split()[-4:] or ["empty"]
+        return [f"{echo[i % len(echo)]}{i}" for i in range(tokens)]
+
+    def part(model, text, done, **extra):
+        """Format one response object."""
+        return dict(
+            model=model,
+            created_at=datetime.now(timezone.utc).isoformat(),
+            response=text,
+            done=done,
+            **extra
+        )
+
+    @app.middleware("http")
+    async def track_connections(request: Request, call_next):
+        if request.client:
+            state["connections"].add((request.client.host, request.client.port))
+        return await call_next(request)
+
+    @app.post("/api/generate")
+    async def generate(request: Request):
+        body = await request.json()
+        model = body.get("model", "mistral")
+        prompt = body.get("prompt") or ""
+        stream = body.get("stream", True)
+        await load_model(model, body.get("keep_alive"))
+
+        # An empty prompt only loads the model
+        if not prompt:
+            return part(model, "", True, done_reason="load")
+
+        async def run():
+            state["generations"] += 1
+            state["active"] += 1
+            state["max_active"] = max(state["max_active"], state["active"])
+            start_time = time.perf_counter_ns()
+            try:
+                for i, word in enumerate(answer_words(prompt)):
+                    await asyncio.sleep(token_ms / 1000)
+                    yield (" " if i else "") + word
+            finally:
+                state["active"] -= 1
+            yield dict(done_reason="stop", total_duration=time.perf_counter_ns() - start_time, eval_count=tokens)
+
+        if not stream:
+            text = []
+            async for item in run():
+                if isinstance(item, dict):
+                    return part(model, "".join(text), True, **item)
+                text.append(item)
+
+        async def lines():
+            async for item in run():
+                if isinstance(item, dict):
+                    yield json.dumps(part(model, "", True, **item)) + "\n"
+                else:
+                    yield json.dumps(part(model, item, False)) + "\n"
+
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+    @app.get("/api/tags")
+    async def tags():
+        return {"models": [{"name": "mistral:latest", "model": "mistral:latest", "size": 0}]}
+
+    @app.get("/api/ps")
+    async def ps():
+        now = time.monotonic()
+        return {"models": [{"name": model, "model": model} for model, until in state["loaded_until"].items() if until >= now]}
+
+    @app.get("/api/version")
+    async def version():
+        return {"version": "0.0.0-mock"}
+
+    @app.get("/mock/stats")
+    async def stats():
+        return {
+            "generations": state["generations"],
+            "loads": state["loads"],
+            "active": state["active"],
+            "max_active": state["max_active"],
+            "connections": len(state["connections"]),
+            "recent_keep_alive": state["keep_alive"],
+        }
+
+    @app.post("/mock/reset")
+    async def reset():
+        state.update(generations=0, loads=0, max_active=0, connections=set(), keep_alive=[])
+        return {"message": "reset"}
+
+    return app
+
+class MockOllamaServer:
+    """Runs the mock server on a background thread, for benchmarks: `with MockOllamaServer(port=11435) as url: ...`."""
+
+    def __init__(self, port=11435, **app_options):
+        config = uvicorn.Config(create_app(**app_options), host="127.0.0.1", port=port, log_level="warning")
+        self.server = uvicorn.Server(config)
+        self.url = f"http://127.0.0.1:{port}"
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        while not self.server.started:
+            time.sleep(0.01)
+        return self.url
+
+    def __exit__(self, *exc_info):
+        self.server.should_exit = True
+        self.thread.join()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=11435, help="Port to listen on")
+    parser.add_argument("--token-ms", type=float, default=20.0, help="Milliseconds per generated token")
+    parser.add_argument("--load-ms", type=float, default=0.0, help="Milliseconds to load a model that is not loaded")
+    parser.add_argument("--tokens", type=int, default=32, help="Tokens per answer")
+    args = parser.parse_args()
+
+    app = create_app(token_ms=args.token_ms, load_ms=args.load_ms, tokens=args.tokens)
+    uvicorn.run(app, host="127.0.0.1", port=args.port)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,420 @@
+"""
+Offline benchmark suite for ingestion, retrieval and chat, with JSON output for comparing commits.
+
+Builds a synthetic corpus of projects and documents in a temporary
+directory, then measures at each concurrency level:
+  - embed_document: ingesting the synthetic documents into an empty collection
+  - search_projects: project search with the vector store filter
+  - retriever: hybrid (or RETRIEVAL_MODE) retrieval of chat context
+  - chat: POST /api/chat through the real app, with the mock Ollama server
+    in benchmarks/mock_ollama.py as a deterministic LLM
+
+Each benchmark and concurrency level runs in its own process, so the
+reported peak RSS is that run's alone. Results (throughput, p50/p95/p99
+latency, peak RSS) are printed as a table and written as JSON; pass an
+earlier JSON file with --compare to see what changed.
+
+Nothing is downloaded. --embedding-model takes a sentence-transformers model
+that is already in the local Hugging Face cache (a small one by default), or
+"hashing" for a built-in token-hashing embedder that needs no model at all.
+
+Usage:
+    python benchmarks/run_suite.py --documents 200 --projects 200 --concurrency 1 4 16 --output before.json
+    python benchmarks/run_suite.py --embedding-model hashing --compare before.json --output after.json
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import re
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+BENCHMARK_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+APP_DIRECTORY = os.path.join(BENCHMARK_DIRECTORY, "..", "app")
+
+BENCHMARKS = ["embed_document", "search_projects", "retriever", "chat"]
+
+DEFAULT_EMBEDDING_MODEL = "sentence-transformers/paraphrase-MiniLM-L3-v2"
+HASHING_MODEL = "hashing"
+HASHING_DIMENSION = 384
+
+ADJECTIVES = ["Silent", "Rapid", "Crimson", "Lunar", "Golden", "Hidden", "Iron", "Velvet", "Arctic", "Electric"]
+NOUNS = ["Falcon", "Harbor", "Compass", "Lantern", "Orchard", "Summit", "Canvas", "Beacon", "Meadow", "Forge"]
+TECHNOLOGIES = ["React", "FastAPI", "Node.js", "PostgreSQL", "Redis", "Docker", "Kubernetes", "TensorFlow", "Flutter", "Go"]
+DOMAINS = ["inventory tracking", "music recommendation", "weather alerts", "expense sharing", "recipe planning",
+           "fitness coaching", "document search", "chat moderation", "fleet routing", "language learning"]
+STATUSES = ["active", "completed", "planned"]
+FILLER = ["the", "service", "handles", "requests", "from", "users", "and", "stores", "results", "in", "a",
+          "database", "with", "caching", "for", "faster", "responses", "while", "background", "workers",
+          "process", "uploads", "reports", "metrics", "deployment", "runs", "on", "containers"]
+
+def project_name(i, rng):
+    """Get a made-up project name."""
+    return f"{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {i}"
+
+def make_projects(count, seed):
+    """Build synthetic project records."""
+    rng = random.Random(seed)
+    projects = []
+    for i in range(count):
+        projects.append({
+            "id": f"bench-project-{i}",
+            "name": project_name(i, rng),
+            "description": f"An application for {rng.choice(DOMAINS)} built by Arun.",
+            "status": rng.choice(STATUSES),
+            "technologies": rng.sample(TECHNOLOGIES, 3),
+            "start_date": f"202{rng.randrange(5)}-0{rng.randrange(1, 10)}-01",
+        })
+    return projects
+
+def make_documents(count, words, seed):
+    """Build synthetic documents of about `words` words: sentences about projects padded with filler."""
+    rng = random.Random(seed)
+    documents = []
+    for i in range(count):
+        sentences = []
+        length = 0
+        while length < words:
+            sentence = (
+                f"{project_name(rng.randrange(count), rng)} is a {rng.choice(DOMAINS)} project using "
+                f"{rng.choice(TECHNOLOGIES)} and {rng.choice(TECHNOLOGIES)}; "
+                + " ".join(rng.choice(FILLER) for _ in range(rng.randrange(8, 20))) + "."
+            )
+            sentences.append(sentence)
+            length += len(sentence.split())
+        documents.append(" ".join(sentences))
+    return documents
+
+def make_queries(count, seed):
+    """Build questions about the synthetic corpus; each concurrency level gets its own seed, so none repeat."""
+    rng = random.Random(seed)
+    templates = [
+        lambda: f"Which projects use {rng.choice(TECHNOLOGIES)} for {rng.choice(DOMAINS)}?",
+        lambda: f"Tell me about {rng.choice(ADJECTIVES)} {rng.choice(NOUNS)}",
+        lambda: f"What has Arun built with {rng.choice(TECHNOLOGIES)} and {rng.choice(TECHNOLOGIES)}?",
+        lambda: f"Is there a {rng.choice(DOMAINS)} app that is {rng.choice(STATUSES)}?",
+    ]
+    return [f"{rng.choice(templates)()} ({i})" for i in range(count)]
+
+class HashingEmbeddings(Embeddings):
+    """
+    Deterministic embeddings that hash each token into a fixed-size vector, so
+    queries and chunks sharing words are close. Needs no model, for runs where
+    the embedding model's own cost should be left out.
+    """
+
+    def _embed(self, text):
+        vector = np.zeros(HASHING_DIMENSION, dtype=np.float32)
+        for token in re.findall(r"[a-z0-9]+", text.lower()):
+            digest = hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest()
+            bucket = int.from_bytes(digest[:4], "little") % HASHING_DIMENSION
+            vector[bucket] += 1.0 if digest[4] & 1 else -1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts):
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text):
+        return self._embed(text)
+
+def configure_environment(data_directory, args, ollama_url=None):
+    """Point the backend at the benchmark's data directory and models; must run before importing it."""
+    os.environ.update({
+        "CHROMA_PERSIST_DIRECTORY": data_directory,
+        "BM25_INDEX_PATH": os.path.join(data_directory, "bm25_index.pkl"),
+        "PROJECTS_DB": os.path.join(data_directory, "projects.sqlite3"),
+        "PROJECT_STORE_BACKEND": "sqlite",
+        "EMBEDDING_MODEL_NAME": args.embedding_model,
+        # Caches would turn later measurements into lookups
+        "EMBEDDING_CACHE_MAX_ENTRIES": "0",
+        "RESPONSE_CACHE_MAX_ENTRIES": "0",
+        "HF_HUB_OFFLINE": "1",
+        "TRANSFORMERS_OFFLINE": "1",
+    })
+    if ollama_url:
+        os.environ.update({"OLLAMA_HOST": ollama_url, "OLLAMA_BACKENDS": f"mistral@{ollama_url}"})
+    sys.path.insert(0, APP_DIRECTORY)
+    sys.path.insert(0, BENCHMARK_DIRECTORY)
+
+    if args.embedding_model == HASHING_MODEL:
+        from core import registry
+        from core.embedding_service import BatchingEmbeddings
+        # Seed the registry's model cache so every vector store uses the hashing embedder
+        registry._embeddings[HASHING_MODEL] = BatchingEmbeddings(HashingEmbeddings(), model_name=HASHING_MODEL)
+
+def measure(operation, items, concurrency):
+    """Run operation(item) for every item with `concurrency` threads; return (wall seconds, per-call seconds)."""
+    def timed(item):
+        start_time = time.perf_counter()
+        operation(item)
+        return time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = list(pool.map(timed, items))
+    return time.perf_counter() - start_time, latencies
+
+def summarize(benchmark, concurrency, wall, latencies):
+    """Build a result row from wall time and per-operation latencies."""
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        "benchmark": benchmark,
+        "concurrency": concurrency,
+        "operations": len(latencies),
+        "wall_s": round(wall, 3),
+        "throughput_per_s": round(len(latencies) / wall, 2),
+        "p50_ms": round(float(np.percentile(latencies_ms, 50)), 2),
+        "p95_ms": round(float(np.percentile(latencies_ms, 95)), 2),
+        "p99_ms": round(float(np.percentile(latencies_ms, 99)), 2),
+        # ru_maxrss is in kilobytes on Linux
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+def close_backend():
+    """Flush and release what the backend opened, so the next run can reopen the directory."""
+    from core import registry
+    from core.bm25 import close_bm25_index
+    close_bm25_index()
+    registry.shutdown()
+
+def run_prepare(args):
+    """Build the shared corpus: projects through store_project, documents through embed_document."""
+    configure_environment(args.data_directory, args)
+    from core.embeddings import embed_document
+    from core.projects import store_project
+
+    start_time = time.perf_counter()
+    for project in make_projects(args.projects, args.seed):
+        store_project(project)
+    for i, text in enumerate(make_documents(args.documents, args.words, args.seed)):
+        embed_document(text=text, metadata={"source": "bench"}, doc_id=f"bench-document-{i}")
+    build_time = time.perf_counter() - start_time
+
+    from core.embeddings import get_vectorstore
+    chunks = get_vectorstore()._collection.count()
+    close_backend()
+    return {"projects": args.projects, "documents": args.documents, "chunks": chunks, "build_s": round(build_time, 3)}
+
+def run_embed_document(args):
+    """Ingest the synthetic documents into a fresh directory."""
+    configure_environment(args.data_directory, args)
+    from core.embeddings import embed_document
+
+    documents = list(enumerate(make_documents(args.documents, args.words, args.seed)))
+    # Load the model before timing
+    embed_document(text="warm up", metadata={"source": "warmup"}, doc_id="warmup")
+    wall, latencies = measure(
+        lambda item: embed_document(text=item[1], metadata={"source": "bench"}, doc_id=f"bench-document-{item[0]}"),
+        documents,
+        args.concurrency_level
+    )
+    result = summarize("embed_document", args.concurrency_level, wall, latencies)
+    close_backend()
+    return result
+
+def run_search_projects(args):
+    """Search the shared corpus's projects."""
+    configure_environment(args.data_directory, args)
+    from core.projects import search_projects
+
+    queries = make_queries(args.queries, args.seed + args.concurrency_level)
+    search_projects("warm up", top_k=5)
+    wall, latencies = measure(lambda query: search_projects(query, top_k=5), queries, args.concurrency_level)
+    result = summarize("search_projects", args.concurrency_level, wall, latencies)
+    close_backend()
+    return result
+
+def run_retriever(args):
+    """Retrieve chat context from the shared corpus, as the chat endpoint does."""
+    configure_environment(args.data_directory, args)
+    from core.chat_chain import RETRIEVAL_K
+    from core.retrieval import retrieve_with_scores
+
+    queries = make_queries(args.queries, args.seed + args.concurrency_level)
+    retrieve_with_scores("warm up", RETRIEVAL_K)
+    wall, latencies = measure(lambda query: retrieve_with_scores(query, RETRIEVAL_K), queries, args.concurrency_level)
+    result = summarize("retriever", args.concurrency_level, wall, latencies)
+    close_backend()
+    return result
+
+def run_chat(args):
+    """Send chat requests to the app over HTTP, with the mock Ollama server as the LLM."""
+    import asyncio
+
+    import httpx
+    import uvicorn
+
+    from mock_ollama import MockOllamaServer
+
+    mock_port, app_port = args.port, args.port + 1
+    with MockOllamaServer(port=mock_port, token_ms=args.llm_token_ms, tokens=args.llm_tokens) as ollama_url:
+        configure_environment(args.data_directory, args, ollama_url)
+        from main import app
+
+        server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=app_port, log_level="warning"))
+        app_url = f"http://127.0.0.1:{app_port}"
+
+        async def run():
+            serving = asyncio.create_task(server.serve())
+            while not server.started:
+                await asyncio.sleep(0.01)
+
+            gate = asyncio.Semaphore(args.concurrency_level)
+            async with httpx.AsyncClient(base_url=app_url, timeout=300) as client:
+                async def one(question):
+                    async with gate:
+                        start_time = time.perf_counter()
+                        response = await client.post(
+                            "/api/chat", json={"messages": [{"role": "user", "content": question}]}
+                        )
+                        response.raise_for_status()
+                        return time.perf_counter() - start_time
+
+                await one("warm up")
+                queries = make_queries(args.queries, args.seed + args.concurrency_level)
+                start_time = time.perf_counter()
+                latencies = await asyncio.gather(*(one(question) for question in queries))
+                wall = time.perf_counter() - start_time
+
+            server.should_exit = True
+            await serving
+            return wall, latencies
+
+        wall, latencies = asyncio.run(run())
+    return summarize("chat", args.concurrency_level, wall, list(latencies))
+
+RUNNERS = {
+    "prepare": run_prepare,
+    "embed_document": run_embed_document,
+    "search_projects": run_search_projects,
+    "retriever": run_retriever,
+    "chat": run_chat,
+}
+
+def run_in_subprocess(name, args, data_directory, concurrency=1):
+    """Run one benchmark in a fresh process and return the JSON it prints last."""
+    command = [
+        sys.executable, os.path.abspath(__file__), "--run", name,
+        "--data-directory", data_directory, "--concurrency-level", str(concurrency),
+        "--documents", str(args.documents), "--words", str(args.words), "--projects", str(args.projects),
+        "--queries", str(args.queries), "--seed", str(args.seed), "--embedding-model", args.embedding_model,
+        "--llm-token-ms", str(args.llm_token_ms), "--llm-tokens", str(args.llm_tokens), "--port", str(args.port),
+    ]
+    completed = subprocess.run(command, capture_output=True, text=True)
+    if completed.returncode != 0:
+        raise RuntimeError(f"{name} at concurrency {concurrency} failed:\n{completed.stderr}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+def git_commit():
+    """Get the current commit, if the suite runs from a git checkout."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BENCHMARK_DIRECTORY, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def print_table(results, baseline=None):
+    """Print results, with the change from a baseline run's matching rows if given."""
+    previous = {(row["benchmark"], row["concurrency"]): row for row in (baseline or {}).get("results", [])}
+
+    def change(row, key):
+        before = previous.get((row["benchmark"], row["concurrency"]), {}).get(key)
+        return f" ({(row[key] - before) / before:+.0%})" if before else ""
+
+    for row in results:
+        print(f"{row['benchmark']:<16} c={row['concurrency']:<3} "
+              f"{row['throughput_per_s']:8.1f}/s{change(row, 'throughput_per_s'):<8} "
+              f"p50 {row['p50_ms']:8.1f} ms  p95 {row['p95_ms']:8.1f} ms{change(row, 'p95_ms'):<8} "
+              f"p99 {row['p99_ms']:8.1f} ms  peak RSS {row['peak_rss_mb']:7.1f} MB", file=sys.stderr)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--benchmarks", nargs="+", default=BENCHMARKS, choices=BENCHMARKS)
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 4, 16], help="Concurrency levels")
+    parser.add_argument("--documents", type=int, default=200, help="Synthetic documents")
+    parser.add_argument("--words", type=int, default=400, help="Words per synthetic document")
+    parser.add_argument("--projects", type=int, default=200, help="Synthetic projects")
+    parser.add_argument("--queries", type=int, default=100, help="Queries or chat requests per concurrency level")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    parser.add_argument("--embedding-model", default=DEFAULT_EMBEDDING_MODEL,
+                        help=f'Locally cached sentence-transformers model, or "{HASHING_MODEL}"')
+    parser.add_argument("--llm-token-ms", type=float, default=2.0, help="Mock LLM milliseconds per token")
+    parser.add_argument("--llm-tokens", type=int, default=32, help="Mock LLM tokens per answer")
+    parser.add_argument("--port", type=int, default=11460, help="Mock Ollama port; the app uses the next one")
+    parser.add_argument("--output", help="Write the JSON results here instead of stdout")
+    parser.add_argument("--compare", help="Earlier JSON results to compare against")
+    parser.add_argument("--run", choices=list(RUNNERS), help=argparse.SUPPRESS)
+    parser.add_argument("--data-directory", help=argparse.SUPPRESS)
+    parser.add_argument("--concurrency-level", type=int, default=1, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        print(json.dumps(RUNNERS[args.run](args)))
+        return
+
+    root = tempfile.mkdtemp(prefix="bench_suite_")
+    try:
+        corpus_directory = os.path.join(root, "corpus")
+        corpus = None
+        if any(name != "embed_document" for name in args.benchmarks):
+            corpus = run_in_subprocess("prepare", args, corpus_directory)
+            print(f"Corpus: {corpus['projects']} projects and {corpus['documents']} documents "
+                  f"in {corpus['chunks']} chunks, built in {corpus['build_s']:.1f} s", file=sys.stderr)
+
+        results = []
+        for name in args.benchmarks:
+            for concurrency in args.concurrency:
+                if name == "embed_document":
+                    # Each level ingests into an empty collection
+                    data_directory = os.path.join(root, f"ingest-{concurrency}")
+                else:
+                    data_directory = corpus_directory
+                results.append(run_in_subprocess(name, args, data_directory, concurrency))
+                if name == "embed_document":
+                    shutil.rmtree(data_directory, ignore_errors=True)
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_table(results, baseline)
+
+    report = {
+        "commit": git_commit(),
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "config": {
+            "documents": args.documents,
+            "words": args.words,
+            "projects": args.projects,
+            "queries": args.queries,
+            "seed": args.seed,
+            "embedding_model": args.embedding_model,
+            "llm_token_ms": args.llm_token_ms,
+            "llm_tokens": args.llm_tokens,
+        },
+        "corpus": corpus,
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -48,6 +48,7 @@ function App() {
   const [messages, setMessages] = useState([]);
   const [input, setInput] = useState('');
   const [isLoading, setIsLoading] = useState(false);
+  const [sessionId, setSessionId] = useState(null);
   const messagesEndRef = useRef(null);
   const isMobile = useMediaQuery('(max-width:600px)');
   
@@ -68,12 +69,20 @@ function App() {
     setIsLoading(true);
     
     try {
-      // Format the messages as the API expects
-      const apiMessages = [...messages, userMessage];
-      
-      const response = await axios.post('/api/chat', {
-        messages: apiMessages,
-      });
+      // The server keeps the conversation, so only the new message is sent
+      let response;
+      try {
+        response = await axios.post('/api/chat', {
+          message: input,
+          session_id: sessionId,
+        });
+      } catch (error) {
+        if (!sessionId || error.response?.status !== 404) throw error;
+        // The session expired or was evicted: start a new one
+        setSessionId(null);
+        response = await axios.post('/api/chat', { message: input });
+      }
+      setSessionId(response.data.session_id);
       
       const assistantMessage = { 
         role: 'assistant', 